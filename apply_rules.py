@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Apply declarative rule files (see rule_files.py) to the site in one pass
+"""
+from batch_runner import build_parser, find_html_files, run_or_watch
+from rewrite_engine import describe_findings
+from rule_files import DEFAULT_RULE_CACHE, RULES_DIR, RuleSetTransforms
+
+def main():
+    parser = build_parser(__doc__)
+    parser.add_argument('-r', '--rules', action='append',
+                        help=f'rule file or directory, repeatable (default: {RULES_DIR})')
+    parser.add_argument('--rule-cache', default=DEFAULT_RULE_CACHE,
+                        help=f'cache of analysed rule sets (default: {DEFAULT_RULE_CACHE})')
+    args = parser.parse_args()
+    files = args.files or find_html_files()
+
+    transforms = RuleSetTransforms(args.rules or [RULES_DIR], cache=args.rule_cache)
+    try:
+        findings = transforms.prepare(files)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Error loading rules: {e}")
+    if findings:
+        print("Rule analysis:")
+        describe_findings(findings)
+        print()
+
+    run_or_watch(transforms, args, files=files,
+                 updated='✓ Updated: {}',
+                 found='Found {} HTML files to update')
+
+if __name__ == '__main__':
+    main()
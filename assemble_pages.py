@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Assemble pages from shared partials, re-rendering only what changed
+
+A page marks each shared region with a pair of comments, and everything
+between them is rendered from partials/<name>.html:
+
+    <!-- partial: navbar -->
+    ...rendered here, at the marker's indentation...
+    <!-- /partial: navbar -->
+
+Marker attributes (<!-- partial: menu current="Loan" -->) and the page's
+own file name ({{ page }}) fill {{ name }} placeholders in the partial, and
+a partial can pull in another with {{> name }}. Everything outside the
+markers is the page's own body and is never touched.
+
+.assemble-cache.json records which partials (and their hashes) each page
+was rendered from. A run reads and re-renders only the pages that were
+edited or that use a partial that changed; rendered partials are cached
+per worker, so a change to the navbar renders it once per process.
+
+To move a region the pages already share into a partial:
+
+    assemble_pages.py --adopt navbar        (or search_box)
+
+writes partials/navbar.html from the copy most pages share exactly (unless
+it exists) and wraps the copies that render back byte for byte in markers,
+leaving their text as it is. Pages whose copy differs are listed, with
+whitespace-only differences reported as such, and left alone; --force
+adopts them anyway, replacing their copy with the partial. The mobile menu
+isn't adoptable: update_navigation.py renders it from nav_manifest.py.
+"""
+import functools
+import json
+import os
+import re
+import textwrap
+from collections import Counter
+
+from batch_runner import build_parser, find_html_files, run_batch
+from incremental_cache import content_hash, stat_key
+from page_index import scan_regions
+from page_io import atomic_write_bytes, read_page, write_page
+
+PARTIALS_DIR = 'partials'
+
+ASSEMBLE_CACHE = '.assemble-cache.json'
+
+CACHE_FORMAT = 1
+
+# page_index regions --adopt can turn into partials (not mobile_menu, which
+# nav_manifest.py owns)
+ADOPTABLE = ('navbar', 'search_box')
+
+MARKER = re.compile(
+    r'^(?P<indent>[ \t]*)<!-- partial: (?P<name>[\w-]+)(?P<params>(?: [\w-]+="[^"]*")*) -->\n'
+    r'.*?'
+    r'^[ \t]*<!-- /partial: (?P=name) -->',
+    re.DOTALL | re.MULTILINE
+)
+
+PARAM = re.compile(r'([\w-]+)="([^"]*)"')
+
+INCLUDE = re.compile(r'^(?P<indent>[ \t]*)\{\{> *(?P<name>[\w-]+) *\}\}[ \t]*$', re.MULTILINE)
+
+VARIABLE = re.compile(r'\{\{ *([\w-]+) *\}\}')
+
+
+def load_partials(directory=PARTIALS_DIR):
+    """{name: source} for every partial"""
+    partials = {}
+    if os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.html'):
+                with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+                    partials[filename[:-len('.html')]] = f.read()
+    return partials
+
+
+def partial_hashes(partials):
+    return {name: content_hash(source.encode('utf-8')) for name, source in partials.items()}
+
+
+def dependencies(name, partials, stack=()):
+    """The partials rendering name reads: itself and everything it includes"""
+    if name in stack:
+        raise ValueError(f"partial {name} includes itself ({' -> '.join(stack + (name,))})")
+    if name not in partials:
+        raise ValueError(f"no partial named {name} in {PARTIALS_DIR}/")
+    found = {name}
+    for match in INCLUDE.finditer(partials[name]):
+        found |= dependencies(match.group('name'), partials, stack + (name,))
+    return found
+
+
+@functools.lru_cache(maxsize=1024)
+def render_cached(name, params, partials):
+    """render() for hashable arguments"""
+    values = dict(params)
+
+    def include(match):
+        body = render_cached(match.group('name'), params, partials)
+        return textwrap.indent(body, match.group('indent'))
+
+    def variable(match):
+        if match.group(1) not in values:
+            raise ValueError(f"partial {name} uses {{{{ {match.group(1)} }}}} but the marker doesn't set it")
+        return values[match.group(1)]
+
+    source = partials[name].rstrip('\n')
+    return VARIABLE.sub(variable, INCLUDE.sub(include, source))
+
+
+class Partials:
+    """The loaded partials, hashable so renders can be cached per process"""
+
+    def __init__(self, sources):
+        self.sources = dict(sources)
+        self.key = content_hash(json.dumps(self.sources, sort_keys=True).encode('utf-8'))
+
+    def __getitem__(self, name):
+        return self.sources[name]
+
+    def __contains__(self, name):
+        return name in self.sources
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, Partials) and other.key == self.key
+
+
+def render(name, params, partials):
+    """
+    A partial's text with its includes and placeholders filled in.
+
+    Only the params the partial uses are part of the cache key, so a
+    partial without placeholders renders once however many pages use it.
+    """
+    used = set()
+    for dependency in dependencies(name, partials.sources):
+        used.update(VARIABLE.findall(partials[dependency]))
+    params = tuple(sorted((key, value) for key, value in params.items() if key in used))
+    return render_cached(name, params, partials)
+
+
+def page_markers(content, page):
+    """(name, params) for each marker pair in a page"""
+    return [(m.group('name'), dict(PARAM.findall(m.group('params')), page=page))
+            for m in MARKER.finditer(content)]
+
+
+def page_dependencies(content, page, partials):
+    """Names of every partial a page is rendered from"""
+    found = set()
+    for name, _ in page_markers(content, page):
+        found |= dependencies(name, partials.sources)
+    return sorted(found)
+
+
+def assemble(content, page, partials):
+    """content with every marked region re-rendered from its partial"""
+    def fill(match):
+        indent = match.group('indent')
+        params = dict(PARAM.findall(match.group('params')), page=page)
+        body = textwrap.indent(render(match.group('name'), params, partials), indent)
+        opening = match.group(0).split('\n', 1)[0]
+        return f"{opening}\n{body}\n{indent}<!-- /partial: {match.group('name')} -->"
+    return MARKER.sub(fill, content)
+
+
+class PageAssembly:
+    """Per-file transforms for run_batch(): assemble each page from partials"""
+
+    def __init__(self, partials):
+        self.partials = partials
+
+    def __call__(self, filepath):
+        return [functools.partial(assemble, page=os.path.basename(filepath), partials=self.partials)]
+
+
+def load_cache(path=ASSEMBLE_CACHE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('format') == CACHE_FORMAT:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'format': CACHE_FORMAT, 'version': None, 'pages': {}}
+
+
+def save_cache(cache, path=ASSEMBLE_CACHE):
+    atomic_write_bytes(path, json.dumps(cache, indent=1, sort_keys=True).encode('utf-8'))
+
+
+def assembler_version():
+    """Hash of this script, so changing how pages render rebuilds them all"""
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return content_hash(f.read())
+
+
+def stale_pages(files, cache, hashes):
+    """The files that were edited, or use a partial that changed, since they were assembled"""
+    stale = []
+    for filepath in files:
+        entry = cache['pages'].get(filepath)
+        try:
+            stat = stat_key(os.stat(filepath))
+        except OSError:
+            continue
+        if (entry is None or entry['stat'] != stat
+                or any(hashes.get(name) != digest for name, digest in entry['partials'].items())):
+            stale.append(filepath)
+    return stale
+
+
+def normalize(markup):
+    """Markup with whitespace differences between tags ignored"""
+    markup = re.sub(r'\s+(/?>)', r'\1', re.sub(r'>\s+<', '><', markup))
+    return re.sub(r'\s+', ' ', markup).strip()
+
+
+def region_copies(files, region):
+    """{page: (line start, start, end)} of each page's first copy of a page_index region"""
+    copies = {}
+    for filepath in files:
+        content = read_page(filepath)
+        if f'<!-- partial: {region}' in content:
+            continue
+        ranges = scan_regions(content)[region]
+        if ranges:
+            start, end = ranges[0]
+            copies[filepath] = (content.rfind('\n', 0, start) + 1, start, end)
+    return copies
+
+
+def adopt(files, region, force=False, directory=PARTIALS_DIR):
+    """Turn a region the pages share into a partial and mark it in each page"""
+    copies = region_copies(files, region)
+    if not copies:
+        print(f"- No unmarked {region} regions found")
+        return
+    texts = {}
+    for filepath, (line_start, start, end) in copies.items():
+        content = read_page(filepath)
+        texts[filepath] = textwrap.dedent(content[line_start:end])
+
+    path = os.path.join(directory, f'{region}.html')
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            partial = f.read()
+    else:
+        # Exact copies only: normalize() would let a reflowed copy stand in
+        # for the rest, and the render would then reflow every page
+        partial, _ = Counter(text.rstrip('\n') for text in texts.values()).most_common(1)[0]
+        partial += '\n'
+        os.makedirs(directory, exist_ok=True)
+        atomic_write_bytes(path, partial.encode('utf-8'))
+        print(f"✓ Wrote {path}")
+
+    partials = Partials(load_partials(directory))
+    for filepath, (line_start, start, end) in sorted(copies.items()):
+        content = read_page(filepath)
+        indent = content[line_start:start] if not content[line_start:start].strip() else ''
+        marked = (f"{content[:line_start]}{indent}<!-- partial: {region} -->\n"
+                  f"{content[line_start:end]}\n{indent}<!-- /partial: {region} -->{content[end:]}")
+        try:
+            unchanged = assemble(marked, os.path.basename(filepath), partials) == marked
+        except ValueError:
+            unchanged = False
+        if not unchanged and not force:
+            if normalize(texts[filepath]) == normalize(partial):
+                print(f"- Differs from {path} in whitespace only, not adopted: {filepath}")
+            else:
+                print(f"- Differs from {path}, not adopted: {filepath}")
+            continue
+        write_page(filepath, marked, content)
+        print(f"✓ Marked {region}: {filepath}")
+
+
+def main():
+    parser = build_parser(__doc__)
+    parser.add_argument('--adopt', choices=ADOPTABLE, help='turn this shared region into a partial first')
+    parser.add_argument('--force', action='store_true', help='with --adopt, also adopt pages whose copy differs')
+    parser.add_argument('--all', action='store_true', help='re-render every page, not just stale ones')
+    args = parser.parse_args()
+    if args.adopt and args.dry_run:
+        raise SystemExit("--adopt can't be combined with --dry-run")
+    files = args.files or find_html_files()
+
+    if args.adopt:
+        adopt(files, args.adopt, args.force)
+
+    partials = Partials(load_partials())
+    hashes = partial_hashes(partials.sources)
+    cache = load_cache()
+    version = assembler_version()
+    if cache['version'] != version or args.all:
+        cache = {'format': CACHE_FORMAT, 'version': version, 'pages': {}}
+
+    stale = stale_pages(files, cache, hashes)
+    print(f"{len(partials.sources)} partials, {len(stale)}/{len(files)} pages to assemble")
+    if not stale:
+        return
+
+    # Staleness is tracked per partial above; the generic cache can't see partials
+    run_batch(PageAssembly(partials), files=stale, workers=args.workers, cache=None,
+              profile=args.profile, dry_run=args.dry_run,
+              updated='✓ Assembled: {}')
+    if args.dry_run:
+        return
+
+    for filepath in stale:
+        content = read_page(filepath)
+        page = os.path.basename(filepath)
+        try:
+            names = page_dependencies(content, page, partials)
+            assembled = assemble(content, page, partials) == content
+        except ValueError:
+            assembled = False
+        if not assembled:
+            # Its error was reported by run_batch; try again next run
+            cache['pages'].pop(filepath, None)
+            continue
+        cache['pages'][filepath] = {'stat': stat_key(os.stat(filepath)),
+                                    'partials': {name: hashes[name] for name in names}}
+    save_cache(cache)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Audit what each page costs to load, and fail if a page is over budget
+
+One parallel pass over the pages measures, per page:
+
+    html_bytes          the HTML document itself
+    total_bytes         the document plus the local stylesheets, scripts and
+                        images it references (third-party files can't be
+                        measured offline, so they are only counted)
+    gzip_bytes          estimated transfer size of the document and its
+                        local stylesheets and scripts, gzipped
+    inline_css_bytes    contents of its <style> blocks
+    duplicate_css_bytes the part of that CSS whose rules also appear inline
+                        on another page (candidates for extract_css.py)
+    inline_js_bytes     contents of its inline JavaScript <script> blocks
+    blocking_scripts    synchronous third-party <script src> tags (no async,
+                        defer or type=module), named in the report
+    blocking_styles     stylesheets that block rendering
+    image_bytes         local images referenced by <img> (the 1x srcset
+                        candidate where there is one); icon links aren't
+                        counted, as browsers fetch one icon and cache it
+
+The results go to a JSON file and a table sorted by --sort. Budgets come
+from page-budgets.json: "default" limits apply to every page, "pages" can
+override them per page, and --budget METRIC=LIMIT overrides the defaults
+for a run. Any page over a budget fails the run.
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from batch_runner import find_html_files
+from extract_css import rule_key, split_css
+from minify import JS_TYPES, SCRIPT_TYPE
+
+AUDIT_FORMAT = 1
+
+DEFAULT_OUTPUT = 'page_audit.json'
+
+BUDGET_FILE = 'page-budgets.json'
+
+METRICS = ('total_bytes', 'html_bytes', 'gzip_bytes', 'inline_css_bytes', 'duplicate_css_bytes',
+           'inline_js_bytes', 'blocking_scripts', 'blocking_styles', 'image_bytes')
+
+# Table headings, in METRICS order
+HEADINGS = ('total', 'html', 'gzip', 'css', 'dup css', 'js', 'sync 3p', 'css links', 'images')
+
+# Names for well-known third-party scripts in the report
+THIRD_PARTY = {
+    'tailwind': re.compile(r'cdn\.tailwindcss\.com'),
+    'chart.js': re.compile(r'/chart\.js'),
+    'marked': re.compile(r'/marked'),
+    'jspdf-autotable': re.compile(r'/jspdf-autotable/'),
+    'jspdf': re.compile(r'/jspdf/'),
+}
+
+STYLE_BLOCK = re.compile(r'<style\b[^>]*>(.*?)</style\s*>', re.DOTALL | re.IGNORECASE)
+
+SCRIPT_BLOCK = re.compile(r'<script\b([^>]*)>(.*?)</script\s*>', re.DOTALL | re.IGNORECASE)
+
+STYLESHEET_LINK = re.compile(r'<link\b[^>]*\brel="stylesheet"[^>]*>', re.IGNORECASE)
+
+IMG_TAG = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+
+ATTRIBUTE = re.compile(r'\s([\w-]+)(?:\s*=\s*"([^"]*)")?')
+
+REMOTE = re.compile(r'[a-z][a-z0-9+.-]*:|//', re.IGNORECASE)
+
+
+def local_path(url):
+    """The local file a src/href refers to, or None if it is remote"""
+    if not url or REMOTE.match(url):
+        return None
+    path = os.path.normpath(url.split('?')[0].split('#')[0].lstrip('/'))
+    return path if os.path.isfile(path) else None
+
+
+@lru_cache(maxsize=None)
+def file_cost(path):
+    """(size, gzipped size) of a local file, once per worker"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return len(data), len(gzip.compress(data, compresslevel=6, mtime=0))
+
+
+def third_party_name(src):
+    """Report name for a third-party script"""
+    for name, pattern in THIRD_PARTY.items():
+        if pattern.search(src):
+            return name
+    return src
+
+
+def audit_page(filepath):
+    """
+    Measure one page. Returns its report row, with 'css_rules' listing the
+    (rule key, bytes) of its inline CSS for the duplicate count, or 'error'.
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        content = data.decode('utf-8')
+        row = {'page': filepath, 'html_bytes': len(data), 'blocking': []}
+        text_bytes = len(data)
+        text_gzip = len(gzip.compress(data, compresslevel=6, mtime=0))
+        image_bytes = 0
+        seen = set()
+
+        css_rules = []
+        inline_css = 0
+        for match in STYLE_BLOCK.finditer(content):
+            css = match.group(1)
+            inline_css += len(css.encode('utf-8'))
+            items, _ = split_css(css)
+            css_rules.extend((rule_key(item['body']), len(item['raw'].encode('utf-8'))) for item in items)
+
+        inline_js = 0
+        for match in SCRIPT_BLOCK.finditer(content):
+            attributes = dict(ATTRIBUTE.findall(match.group(1)))
+            src = attributes.get('src')
+            if src is None:
+                kind = SCRIPT_TYPE.search(match.group(1))
+                if (kind.group(1).lower() if kind else '') in JS_TYPES:
+                    inline_js += len(match.group(2).encode('utf-8'))
+                continue
+            path = local_path(src)
+            if path:
+                if path not in seen:
+                    seen.add(path)
+                    size, packed = file_cost(path)
+                    text_bytes += size
+                    text_gzip += packed
+            elif not ({'async', 'defer'} & set(attributes) or attributes.get('type') == 'module'):
+                row['blocking'].append(third_party_name(src))
+
+        blocking_styles = 0
+        for match in STYLESHEET_LINK.finditer(content):
+            attributes = dict(ATTRIBUTE.findall(match.group(0)))
+            if attributes.get('media', 'all') in ('all', 'screen'):
+                blocking_styles += 1
+            path = local_path(attributes.get('href'))
+            if path and path not in seen:
+                seen.add(path)
+                size, packed = file_cost(path)
+                text_bytes += size
+                text_gzip += packed
+
+        for match in IMG_TAG.finditer(content):
+            attributes = dict(ATTRIBUTE.findall(match.group(0)))
+            srcset = attributes.get('srcset', '').split(',')[0].split()
+            path = local_path(srcset[0] if srcset else attributes.get('src'))
+            if path and path not in seen:
+                seen.add(path)
+                image_bytes += os.path.getsize(path)
+
+        row.update({
+            'total_bytes': text_bytes + image_bytes,
+            'gzip_bytes': text_gzip,
+            'inline_css_bytes': inline_css,
+            'inline_js_bytes': inline_js,
+            'blocking_scripts': len(row['blocking']),
+            'blocking_styles': blocking_styles,
+            'image_bytes': image_bytes,
+            'css_rules': css_rules,
+        })
+        return row
+    except Exception as e:
+        return {'page': filepath, 'error': str(e)}
+
+
+def audit_pages(files, workers=None):
+    """audit_page() rows for files, in order, with duplicate_css_bytes filled in"""
+    if workers == 1 or len(files) <= 1:
+        rows = [audit_page(filepath) for filepath in files]
+    else:
+        chunksize = max(1, len(files) // ((workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(audit_page, files, chunksize=chunksize))
+
+    pages_with = {}
+    for row in rows:
+        for key in {key for key, _ in row.get('css_rules', ())}:
+            pages_with[key] = pages_with.get(key, 0) + 1
+    for row in rows:
+        if 'error' not in row:
+            row['duplicate_css_bytes'] = sum(size for key, size in row.pop('css_rules') if pages_with[key] > 1)
+    return rows
+
+
+def load_budgets(path, overrides=()):
+    """{'default': {metric: limit}, 'pages': {page: {metric: limit}}}"""
+    budgets = {'default': {}, 'pages': {}}
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)
+        budgets['default'].update(loaded.get('default', {}))
+        budgets['pages'].update(loaded.get('pages', {}))
+    for override in overrides:
+        metric, _, limit = override.partition('=')
+        if metric not in METRICS or not limit.isdigit():
+            raise SystemExit(f"Bad budget {override!r}: use METRIC=LIMIT with one of {', '.join(METRICS)}")
+        budgets['default'][metric] = int(limit)
+    for limits in [budgets['default']] + list(budgets['pages'].values()):
+        unknown = set(limits) - set(METRICS)
+        if unknown:
+            raise SystemExit(f"Unknown budget metric: {', '.join(sorted(unknown))}")
+    return budgets
+
+
+def over_budget(rows, budgets):
+    """[(page, metric, value, limit)] for every budget a page exceeds"""
+    failures = []
+    for row in rows:
+        if 'error' in row:
+            continue
+        limits = dict(budgets['default'], **budgets['pages'].get(row['page'], {}))
+        for metric in METRICS:
+            if metric in limits and row[metric] > limits[metric]:
+                failures.append((row['page'], metric, row[metric], limits[metric]))
+    return failures
+
+
+def print_table(rows, sort):
+    """The rows as a table, largest first by the sort metric"""
+    width = max([len('page')] + [len(row['page']) for row in rows])
+    print(f"{'page':<{width}}  " + '  '.join(f"{heading:>9}" for heading in HEADINGS))
+    for row in sorted(rows, key=lambda row: (-row[sort], row['page'])):
+        print(f"{row['page']:<{width}}  " + '  '.join(f"{row[metric]:>9}" for metric in METRICS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: one per CPU, 1 = no pool)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f'JSON report (default: {DEFAULT_OUTPUT})')
+    parser.add_argument('--budgets', default=BUDGET_FILE, help=f'budget file (default: {BUDGET_FILE})')
+    parser.add_argument('--budget', action='append', default=[], metavar='METRIC=LIMIT',
+                        help='default budget for this run (repeatable)')
+    parser.add_argument('--sort', default='total_bytes', choices=METRICS, help='table order (default: total_bytes)')
+    parser.add_argument('files', nargs='*', help='HTML files to audit (default: all in the current directory)')
+    args = parser.parse_args()
+
+    budgets = load_budgets(args.budgets, args.budget)
+    rows = audit_pages(args.files or find_html_files(), args.workers)
+    for row in rows:
+        if 'error' in row:
+            print(f"Error auditing {row['page']}: {row['error']}")
+    rows = [row for row in rows if 'error' not in row]
+
+    print_table(rows, args.sort)
+    failures = over_budget(rows, budgets)
+    totals = {metric: sum(row[metric] for row in rows) for metric in METRICS}
+    report = {
+        'format': AUDIT_FORMAT,
+        'pages': rows,
+        'totals': totals,
+        'budgets': budgets,
+        'failures': [dict(zip(('page', 'metric', 'value', 'limit'), failure)) for failure in failures],
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+
+    blocking = sorted({name for row in rows for name in row['blocking']})
+    print(f"\nAudited {len(rows)} pages: {totals['total_bytes']} bytes, {totals['gzip_bytes']} gzipped text bytes")
+    if blocking:
+        print(f"Synchronous third-party scripts: {', '.join(blocking)}")
+    print(f"Wrote {args.output}")
+    if failures:
+        print(f"\n{len(failures)} over budget:")
+        for page, metric, value, limit in failures:
+            print(f"  {page}: {metric} {value} > {limit}")
+        raise SystemExit(1)
+    print("✓ All pages within budget")
+
+
+if __name__ == '__main__':
+    main()
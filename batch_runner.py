@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Shared batch runner for the HTML rewrite scripts
+
+Each script hands run_batch() a list of transform functions (content in,
+content out), or a function mapping a file path to such a list. Files are
+processed across a process pool and reported in sorted order with the usual
+✓ / - lines. Reads and writes go through page_io, so pages are only rewritten
+when they change, and atomically.
+
+When every transform is region-scoped (page_index.scoped), only the indexed
+regions of each page are decoded and rewritten, and the region index is kept
+up to date alongside the cache manifest.
+
+With --watch a script keeps running after its pass and re-applies its
+transforms to each page as it is saved (see watch_batch()).
+"""
+import argparse
+import difflib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from file_watcher import batches, open_watcher
+
+from incremental_cache import (DEFAULT_MANIFEST, clean_hash, content_hash,
+                               is_clean_by_stat, load_manifest, record,
+                               save_manifest, stat_key, transform_set_version)
+from page_index import (DEFAULT_INDEX, apply_in_regions, load_index, lookup,
+                        region_ranges, save_index, scan_regions, shift_regions,
+                        store)
+from page_io import (atomic_write_bytes, decode_page, has_trigger, open_page,
+                     trigger_regex, write_page)
+from rewrite_engine import (PROFILING, collect_stats, enable_profiling,
+                            merge_stats, print_profile, print_rule_counts,
+                            transform_triggers)
+
+
+def find_html_files(directory='.', exclude=()):
+    """List the HTML files in a directory, sorted, minus any excluded names"""
+    return sorted(
+        f for f in os.listdir(directory)
+        if f.endswith('.html') and f not in exclude
+    )
+
+
+def apply_transforms(content, transforms):
+    """Run content through each transform in order"""
+    for transform in transforms:
+        content = transform(content)
+    return content
+
+
+def is_scoped(transforms):
+    """True if transforms is a list of region-scoped transforms"""
+    return not callable(transforms) and all(hasattr(t, 'regions') for t in transforms)
+
+
+def uses_index(transforms):
+    """
+    True if a run of transforms may want the region index: scoped ones, or
+    a per-file callable, whose lists are only known file by file.
+    """
+    return callable(transforms) or is_scoped(transforms)
+
+
+def apply_scoped(data, regions, transforms):
+    """
+    Run scoped transforms over their regions of the page bytes.
+
+    Returns (new_data, regions) with the regions moved to match new_data.
+    """
+    for transform in transforms:
+        ranges = region_ranges(regions, transform.regions)
+        data, edits = apply_in_regions(data, ranges, transform.inner)
+        if edits:
+            regions = shift_regions(regions, edits) or scan_regions(data)
+    return data, regions
+
+
+def file_result(filepath, changed=False, error=None, record=None, regions=None,
+                diff=None, skipped=False):
+    """
+    One file's outcome, sent back to the parent process for reporting.
+
+    record is (stat, hash, clean) for the cache manifest, or None; regions is
+    the file's region index after the run, if it was scanned; diff is the
+    unified diff and (added, removed) line counts of a dry run; stats is the
+    file's rule profile when profiling.
+    """
+    return {'filepath': filepath, 'changed': changed, 'error': error, 'record': record,
+            'regions': regions, 'diff': diff, 'skipped': skipped, 'stats': None}
+
+
+def page_diff(filepath, original, content):
+    """Unified diff of a page and (added, removed) line counts"""
+    lines = list(difflib.unified_diff(original.splitlines(keepends=True),
+                                      content.splitlines(keepends=True),
+                                      f"a/{filepath}", f"b/{filepath}"))
+    added = sum(1 for line in lines[2:] if line.startswith('+'))
+    removed = sum(1 for line in lines[2:] if line.startswith('-'))
+    return ''.join(line if line.endswith('\n') else line + '\n\\ No newline at end of file\n'
+                   for line in lines), (added, removed)
+
+
+def process_file(filepath, transforms, known_clean=None, regions=None, dry_run=False):
+    """
+    Process a single HTML file and return its file_result().
+
+    known_clean is the content hash the file had when it was last recorded
+    clean; a file still matching it is skipped without running any transform.
+    regions are the file's indexed regions, if known, for scoped transforms.
+    With dry_run the file is never written; the result carries its diff.
+    A per-file callable is resolved first, so its scoped lists use regions.
+    """
+    if callable(transforms):
+        transforms = transforms(filepath)
+    if is_scoped(transforms):
+        result = process_file_regions(filepath, transforms, known_clean, regions, dry_run)
+    else:
+        result = process_file_contents(filepath, transforms, known_clean, dry_run)
+    if PROFILING['enabled']:
+        result['stats'] = collect_stats(reset=True, one_file=True)
+    return result
+
+
+@lru_cache(maxsize=None)
+def compiled_triggers(triggers):
+    """Bytes regex for a tuple of trigger strings, once per process"""
+    return trigger_regex(triggers)
+
+
+def process_file_contents(filepath, transforms, known_clean, dry_run):
+    """Body of process_file() for whole-page transforms"""
+    try:
+        triggers = transform_triggers(transforms)
+        regex = compiled_triggers(tuple(triggers)) if triggers is not None else None
+
+        with open_page(filepath) as data:
+            digest = content_hash(data)
+            if digest == known_clean or not has_trigger(data, regex):
+                return file_result(filepath, record=(stat_key(os.stat(filepath)), digest, True))
+            original = decode_page(data)
+
+        content = apply_transforms(original, transforms)
+        if content == original:
+            return file_result(filepath, record=(stat_key(os.stat(filepath)), digest, True))
+        if dry_run:
+            return file_result(filepath, changed=True, diff=page_diff(filepath, original, content))
+
+        written = write_page(filepath, content)
+        # Only clean if a second run would leave the new content alone
+        clean = apply_transforms(content, transforms) == content
+        return file_result(filepath, changed=True,
+                           record=(stat_key(os.stat(filepath)), content_hash(written), clean))
+    except Exception as e:
+        return file_result(filepath, error=e)
+
+
+def process_file_regions(filepath, transforms, known_clean, regions, dry_run):
+    """Body of process_file() for scoped transforms"""
+    try:
+        triggers = transform_triggers(transforms)
+        regex = compiled_triggers(tuple(triggers)) if triggers is not None else None
+
+        with open_page(filepath) as data:
+            digest = content_hash(data)
+            if digest == known_clean or not has_trigger(data, regex):
+                return file_result(filepath, record=(stat_key(os.stat(filepath)), digest, True),
+                                   regions=regions)
+            data = bytes(data)
+
+        if regions is None:
+            regions = scan_regions(data)
+        content, new_regions = apply_scoped(data, regions, transforms)
+        if content == data:
+            return file_result(filepath, record=(stat_key(os.stat(filepath)), digest, True),
+                               regions=regions)
+        if dry_run:
+            diff = page_diff(filepath, decode_page(data), decode_page(content))
+            return file_result(filepath, changed=True, regions=regions, diff=diff)
+
+        atomic_write_bytes(filepath, content)
+        # Only clean if a second run would leave the new content alone
+        clean = apply_scoped(content, new_regions, transforms)[0] == content
+        return file_result(filepath, changed=True, regions=new_regions,
+                           record=(stat_key(os.stat(filepath)), content_hash(content), clean))
+    except Exception as e:
+        return file_result(filepath, error=e)
+
+
+def parse_args(description=None, argv=None):
+    """Parse the options every batch script accepts"""
+    return build_parser(description).parse_args(argv)
+
+
+def build_parser(description=None):
+    """The option parser behind parse_args(), for scripts that add their own"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: one per CPU, 1 = no pool)')
+    parser.add_argument('--cache', default=DEFAULT_MANIFEST,
+                        help=f'manifest of already-clean pages (default: {DEFAULT_MANIFEST})')
+    parser.add_argument('--no-cache', dest='cache', action='store_const', const=None,
+                        help='process every file even if it is recorded clean')
+    parser.add_argument('--index', default=DEFAULT_INDEX,
+                        help=f'region index used by scoped transforms (default: {DEFAULT_INDEX})')
+    parser.add_argument('--no-index', dest='index', action='store_const', const=None,
+                        help='scan page regions from scratch on every run')
+    parser.add_argument('--profile', action='store_true',
+                        help='print per-rule substitution counts and timings at the end')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='print a unified diff of every change instead of writing it')
+    parser.add_argument('--watch', action='store_true',
+                        help='after the pass, keep re-applying the transforms to pages as they are saved')
+    parser.add_argument('--poll', action='store_true',
+                        help='watch by polling instead of inotify')
+    parser.add_argument('files', nargs='*',
+                        help='HTML files to process (default: all in the current directory)')
+    return parser
+
+
+def iter_results(files, transforms, workers, manifest=None, version=None, index=None,
+                 dry_run=False):
+    """
+    Yield file_result() dicts in file order, in-process or via a pool.
+
+    With a manifest, files whose stat shows them still clean are answered
+    here without being read or sent to a worker. With a region index, the
+    workers get each file's regions instead of scanning for them.
+    """
+    todo = []
+    known = {}
+    for filepath in files:
+        if manifest is not None and is_clean_by_stat(manifest, filepath, version):
+            continue
+        todo.append(filepath)
+        if manifest is not None:
+            known[filepath] = clean_hash(manifest, filepath, version)
+    hashes = [known.get(filepath) for filepath in todo]
+    regions = [lookup(index, filepath) if index is not None else None for filepath in todo]
+    args = (todo, [transforms] * len(todo), hashes, regions, [dry_run] * len(todo))
+
+    if workers == 1 or len(todo) <= 1:
+        results = map(process_file, *args)
+        pool = None
+    else:
+        chunksize = max(1, len(todo) // ((workers or os.cpu_count() or 1) * 4))
+        initializer = enable_profiling if PROFILING['enabled'] else None
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=initializer)
+        results = pool.map(process_file, *args, chunksize=chunksize)
+
+    try:
+        pending = set(todo)
+        for filepath in files:
+            if filepath in pending:
+                yield next(results)
+            else:
+                yield file_result(filepath, skipped=True)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def run_batch(transforms, files=None, workers=None, exclude=(), cache=None,
+              index=DEFAULT_INDEX, profile=False, dry_run=False,
+              updated='✓ Updated: {}', unchanged=None, found=None):
+    """
+    Apply transforms to every file and print a per-file report.
+
+    cache is the path of the incremental manifest, or None to process every
+    file. index is the region index for scoped transforms, or None to always
+    scan. profile prints the per-rule profile table at the end. dry_run
+    streams a unified diff per changed file to stdout instead of writing,
+    leaves the manifest and index alone, and ends with change counts.
+    updated/unchanged/found are format strings; unchanged and found are only
+    printed when given. Returns the number of files updated (or that would
+    be, in a dry run).
+    """
+    if dry_run:
+        return run_dry(transforms, files, workers, exclude, cache, index, found)
+
+    if files is None:
+        files = find_html_files(exclude=exclude)
+    else:
+        files = sorted(f for f in files if f not in exclude)
+
+    if found:
+        print(found.format(len(files)))
+
+    if profile:
+        enable_profiling()
+    totals = {}
+
+    manifest = load_manifest(cache) if cache else None
+    version = transform_set_version(transforms) if cache else None
+    regions_index = load_index(index) if index and uses_index(transforms) else None
+
+    updated_count = 0
+    skipped = 0
+    results = iter_results(files, transforms, workers, manifest, version, regions_index)
+    for result in results:
+        filepath = result['filepath']
+        if result['stats']:
+            merge_stats(totals, result['stats'])
+        if result['error'] is not None:
+            print(f"Error processing {filepath}: {result['error']}")
+        elif result['changed']:
+            print(updated.format(filepath))
+            updated_count += 1
+        elif unchanged:
+            print(unchanged.format(filepath))
+
+        if result['skipped']:
+            skipped += 1
+        elif manifest is not None and result['record'] is not None:
+            record(manifest, filepath, version, *result['record'])
+        if regions_index is not None and result['regions'] is not None:
+            store(regions_index, filepath, result['regions'])
+
+    if manifest is not None:
+        save_manifest(cache, manifest)
+    if regions_index is not None:
+        save_index(index, regions_index)
+
+    print(f"\nCompleted: {updated_count}/{len(files)} files updated")
+    if skipped:
+        print(f"Skipped {skipped} unchanged files (cache: {cache})")
+    if profile:
+        print_profile(totals)
+    return updated_count
+
+
+def run_dry(transforms, files, workers, exclude, cache, index, found):
+    """
+    run_batch(dry_run=True): stream each file's diff as its result arrives.
+
+    Only the per-file line counts are kept for the summary, never the diffs.
+    The manifest and index are read to skip clean pages but never saved.
+    """
+    if files is None:
+        files = find_html_files(exclude=exclude)
+    else:
+        files = sorted(f for f in files if f not in exclude)
+
+    if found:
+        print(found.format(len(files)))
+
+    # The rule counts come from the profiler
+    enable_profiling()
+    totals = {}
+
+    manifest = load_manifest(cache) if cache else None
+    version = transform_set_version(transforms) if cache else None
+    regions_index = load_index(index) if index and uses_index(transforms) else None
+
+    counts = []
+    errors = 0
+    results = iter_results(files, transforms, workers, manifest, version, regions_index,
+                           dry_run=True)
+    for result in results:
+        if result['stats']:
+            merge_stats(totals, result['stats'])
+        if result['error'] is not None:
+            print(f"Error processing {result['filepath']}: {result['error']}")
+            errors += 1
+        elif result['changed']:
+            diff, (added, removed) = result['diff']
+            sys.stdout.write(diff)
+            sys.stdout.flush()
+            counts.append((result['filepath'], added, removed))
+
+    print(f"\nDry run: {len(counts)}/{len(files)} files would change, nothing was written")
+    if counts:
+        width = max(len(filepath) for filepath, _, _ in counts)
+        print(f"\n{'File':<{width}} {'+Lines':>7} {'-Lines':>7}")
+        print("-" * (width + 16))
+        for filepath, added, removed in counts:
+            print(f"{filepath:<{width}} {added:>7} {removed:>7}")
+        print(f"{'Total':<{width}} {sum(c[1] for c in counts):>7} {sum(c[2] for c in counts):>7}")
+    print_rule_counts(totals)
+    if errors:
+        print(f"\n{errors} files failed")
+    return len(counts)
+
+
+# Fewer changed files than this are rewritten in-process in watch mode:
+# starting a pool costs more than it saves
+WATCH_POOL_MIN = 8
+
+
+def watch_batch(transforms, files=None, workers=None, exclude=(), cache=None,
+                index=DEFAULT_INDEX, polling=False, updated='✓ Updated: {}', unchanged=None):
+    """
+    Re-apply transforms to pages as they are saved, until interrupted.
+
+    Watches the current directory (inotify, or polling if unavailable or
+    polling is set) and runs run_batch() on each debounced batch of changed
+    HTML files, limited to files if given. The transforms stay compiled in
+    this process between batches. A page's stat is remembered after each
+    pass, so the events for our own writes (and saves that change nothing
+    on disk) are recognised and ignored instead of looping.
+    """
+    watched = set(files) if files is not None else None
+    seen = {}
+
+    def remember(names):
+        for name in names:
+            try:
+                seen[name] = stat_key(os.stat(name))
+            except OSError:
+                seen.pop(name, None)
+
+    remember(files if files is not None else find_html_files(exclude=exclude))
+    watcher = open_watcher('.', polling)
+    print(f"\nWatching for changes ({watcher.kind}), Ctrl-C to stop")
+    try:
+        for names in batches(watcher):
+            changed = []
+            for name in sorted(names):
+                if not name.endswith('.html') or name in exclude:
+                    continue
+                if watched is not None and name not in watched:
+                    continue
+                try:
+                    stat = stat_key(os.stat(name))
+                except OSError:
+                    seen.pop(name, None)
+                    continue
+                if seen.get(name) != stat:
+                    changed.append(name)
+            if not changed:
+                continue
+
+            start = time.perf_counter()
+            run_batch(transforms, files=changed, workers=workers if len(changed) >= WATCH_POOL_MIN else 1,
+                      cache=cache, index=index, updated=updated, unchanged=unchanged)
+            remember(changed)
+            print(f"Watch pass took {(time.perf_counter() - start) * 1000:.0f} ms")
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    finally:
+        watcher.close()
+
+
+def run_or_watch(transforms, args, files=None, exclude=(), **report):
+    """
+    run_batch() with a script's parsed options, then watch_batch() if --watch
+    was given. files is the script's default file list; exclude applies to
+    both the run and the watch.
+    """
+    if args.watch and args.dry_run:
+        raise SystemExit("--watch can't be combined with --dry-run")
+    files = args.files or files
+    count = run_batch(transforms, files=files, workers=args.workers, exclude=exclude, cache=args.cache,
+                      index=args.index, profile=args.profile, dry_run=args.dry_run, **report)
+    if args.watch:
+        watch_batch(transforms, files=files, workers=args.workers, exclude=exclude, cache=args.cache,
+                    index=args.index, polling=args.poll, updated=report.get('updated', '✓ Updated: {}'),
+                    unchanged=report.get('unchanged'))
+    return count
+
+
+def main_for(transforms, description=None, argv=None, files=None, exclude=(), **report):
+    """
+    Entry point shared by the scripts: parse options, then run_batch()
+    (and watch_batch() with --watch).
+
+    files is the script's default file list, used when none are given;
+    exclude names files never to touch, in the run or the watch.
+    """
+    args = parse_args(description, argv)
+    return run_or_watch(transforms, args, files=files, exclude=exclude, **report)
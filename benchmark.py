@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Benchmark the rewrite scripts on synthetic page corpora
+
+Builds corpora of 100, 1k, 10k or 100k pages from the calculator pages in
+this directory, with legacy colors, chart palettes and menu markup mixed back
+in at random so the transforms have real work to do. Then, for each corpus
+and workload, it measures:
+
+    transform  - the transforms alone, on pages already read into memory
+    cold       - the full batch run (read, rewrite, atomic write), no cache
+    warm       - a second cached run over the already-rewritten corpus
+
+Each measurement runs in its own process and reports files/s, MB/s and peak
+RSS (of the largest process: the run itself or one of its workers). Results
+are written as JSON so runs on two commits can be compared with --compare.
+A measurement that fails is recorded with its error and the rest still run;
+the results are written and the script exits non-zero.
+
+Corpora are cached in .bench/ and are big: about 7 GB at 100k pages.
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+BENCH_FORMAT = 1
+
+DEFAULT_SIZES = (100, 1000)
+
+DEFAULT_OUTPUT = 'bench_output.json'
+
+CORPUS_DIR = os.path.join(HERE, '.bench')
+
+# workload: (module, transform list names) or (module, per-file callable name);
+# a class named there is instantiated to get the callable
+WORKLOADS = {
+    'update_theme': ('update_theme', ['update_colors', 'update_chart_colors', 'add_smooth_scroll']),
+    'fix_all_chart_colors': ('fix_all_chart_colors', ['update_chart_colors']),
+    'update_design': ('update_design', ['update_colors', 'update_search_icon_to_box',
+                                        'remove_category_emojis', 'update_mobile_responsive']),
+    'fix_buttons': ('fix_buttons', ['fix_buttons']),
+    'fix_labels': ('fix_labels', ['fix_labels']),
+    'update_navigation': ('update_navigation', 'PageMenus'),
+    'pipeline': ('pipeline', 'theme_transforms'),
+}
+
+MODES = ('transform', 'cold', 'warm')
+
+# Current markup and the older variants it replaced; each page gets a random
+# mix, so every workload finds something to rewrite on most pages
+LEGACY_VARIANTS = [
+    ('#2C5F6F', ('#2563EB', '#3B82F6')),
+    ('#5FA8D3', ('#60A5FA', '#93C5FD')),
+    ('#6B9080', ('#10B981', '#34D399')),
+    ('#E89B6F', ('#F59E0B',)),
+    ('#F4A460', ('#EF4444', '#FBBF24')),
+    ('#1F4A56', ('#1E40AF',)),
+    ('#F8F9FA', ('#F9FAFB',)),
+    ('#6B7280', ('#8B8589',)),
+    ('#E5E7EB', ('#E2E8F0',)),
+    ('rgba(44, 95, 111', ('rgba(37, 99, 235',)),
+    ('linear-gradient(135deg, #E89B6F 0%, #F4A460 100%)',
+     ('linear-gradient(135deg, #2C5F6F 0%, #2C5F6F 100%)',)),
+    ('<a href="pace-calculator.html" class="mobile-menu-item">Pace Calculator</a>',
+     ('<a href="#" class="mobile-menu-item placeholder">Pace Calculator</a>',)),
+    ('<a href="inflation-calculator.html" class="mobile-menu-item">Inflation Calculator</a>',
+     ('<a href="#" class="mobile-menu-item placeholder">Inflation Calculator</a>',)),
+    ('<div class="category-header">Financial</div>', ('<div class="category-header">💰 Financial</div>',)),
+]
+
+
+def template_pages(directory=HERE):
+    """The site's own pages, as (name, text), to build corpora from"""
+    pages = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.html'):
+            with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+                pages.append((filename, f.read()))
+    return pages
+
+
+def legacy_page(text, rng):
+    """A template page with a random subset of markup rolled back"""
+    for current, older in LEGACY_VARIANTS:
+        if current in text and rng.random() < 0.5:
+            text = text.replace(current, rng.choice(older))
+    return text
+
+
+def corpus_stamp(templates, size, seed):
+    """Identifies a corpus: its size, seed and the templates' content"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(LEGACY_VARIANTS).encode())
+    for name, text in templates:
+        digest.update(name.encode() + b'\0' + text.encode('utf-8'))
+    return f"{size} {seed} {digest.hexdigest()}"
+
+
+def build_corpus(size, seed=0, root=CORPUS_DIR):
+    """Generate (or reuse) a corpus of size pages; returns its directory"""
+    templates = template_pages()
+    directory = os.path.join(root, f'corpus-{size}-{seed}')
+    stamp_path = os.path.join(directory, '.stamp')
+    stamp = corpus_stamp(templates, size, seed)
+    try:
+        with open(stamp_path, 'r', encoding='utf-8') as f:
+            if f.read() == stamp:
+                return directory
+    except OSError:
+        pass
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    rng = random.Random(seed)
+    for i in range(size):
+        name, text = templates[i % len(templates)]
+        filename = f"{name[:-len('.html')]}-{i:06d}.html"
+        with open(os.path.join(directory, filename), 'w', encoding='utf-8') as f:
+            f.write(legacy_page(text, rng))
+    with open(stamp_path, 'w', encoding='utf-8') as f:
+        f.write(stamp)
+    return directory
+
+
+def corpus_files(directory):
+    """The corpus pages, sorted"""
+    return sorted(f for f in os.listdir(directory) if f.endswith('.html'))
+
+
+def workload_transforms(name):
+    """Import a workload's module and return its transforms"""
+    module_name, names = WORKLOADS[name]
+    module = importlib.import_module(module_name)
+    if isinstance(names, str):
+        transforms = getattr(module, names)
+        return transforms() if isinstance(transforms, type) else transforms
+    return [getattr(module, attr) for attr in names]
+
+
+def time_transforms(name, directory):
+    """Child: apply a workload to every page in memory; returns (seconds, bytes)"""
+    from batch_runner import apply_transforms
+    transforms = workload_transforms(name)
+    elapsed = 0.0
+    total = 0
+    for filename in corpus_files(directory):
+        with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+            content = f.read()
+        total += len(content.encode('utf-8'))
+        page_transforms = transforms(filename) if callable(transforms) else transforms
+        started = time.perf_counter()
+        apply_transforms(content, page_transforms)
+        elapsed += time.perf_counter() - started
+    return elapsed, total
+
+
+def time_batch(name, directory, workers, cache):
+    """Child: run a workload through run_batch() in directory; returns (seconds, bytes)"""
+    from batch_runner import run_batch
+    os.chdir(directory)
+    transforms = workload_transforms(name)
+    total = sum(os.path.getsize(f) for f in corpus_files('.'))
+    with open(os.devnull, 'w') as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            started = time.perf_counter()
+            run_batch(transforms, workers=workers, cache=cache)
+            elapsed = time.perf_counter() - started
+        finally:
+            sys.stdout = stdout
+    return elapsed, total
+
+
+def child_main(argv):
+    """Entry point of a measurement process; prints one JSON line"""
+    mode, name, directory, workers = argv[0], argv[1], argv[2], int(argv[3]) or None
+    sys.path.insert(0, HERE)
+    if mode == 'transform':
+        seconds, total = time_transforms(name, directory)
+    else:
+        # 'prime' is the cached first run that a 'warm' measurement follows
+        cache = '.rewrite-cache.json' if mode in ('prime', 'warm') else None
+        seconds, total = time_batch(name, directory, workers, cache)
+    print(json.dumps({'seconds': seconds, 'bytes': total}))
+
+
+def peak_rss_kb(rusage):
+    """ru_maxrss in KB (it is bytes on macOS)"""
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss // 1024
+    return rusage.ru_maxrss
+
+
+def measure(mode, name, directory, workers):
+    """Run one measurement in a fresh process; returns its result dict"""
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, name, directory, str(workers or 0)],
+        stdout=subprocess.PIPE)
+    output = proc.stdout.read()
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise RuntimeError(f"{mode} {name} failed with exit code {proc.returncode}")
+    result = json.loads(output)
+    result['peak_rss_kb'] = peak_rss_kb(rusage)
+    return result
+
+
+def scratch_copy(directory, root=CORPUS_DIR):
+    """Fresh copy of a corpus for a run that rewrites it"""
+    scratch = os.path.join(root, 'scratch')
+    shutil.rmtree(scratch, ignore_errors=True)
+    shutil.copytree(directory, scratch)
+    return scratch
+
+
+def run_benchmarks(sizes, workloads, modes, workers=None, seed=0):
+    """
+    Run every (size, workload, mode) combination; returns result rows.
+
+    A measurement that fails gets a row with its 'error' instead of timings.
+    """
+    rows = []
+    for size in sizes:
+        directory = build_corpus(size, seed)
+        pages = len(corpus_files(directory))
+        for name in workloads:
+            for mode in modes:
+                row = {'workload': name, 'mode': mode, 'pages': pages}
+                try:
+                    if mode == 'transform':
+                        result = measure(mode, name, directory, workers)
+                    else:
+                        scratch = scratch_copy(directory)
+                        if mode == 'warm':
+                            measure('prime', name, scratch, workers)
+                        result = measure(mode, name, scratch, workers)
+                except (RuntimeError, ValueError) as e:
+                    # Keep going: the other rows are still worth writing out
+                    row['error'] = str(e)
+                    rows.append(row)
+                    print(f"- {name:<22} {mode:<9} {pages:>7} pages  failed: {e}")
+                    continue
+                seconds = max(result['seconds'], 1e-9)
+                row.update({
+                    'bytes': result['bytes'],
+                    'seconds': round(result['seconds'], 6),
+                    'files_per_s': round(pages / seconds, 1),
+                    'mb_per_s': round(result['bytes'] / seconds / 1e6, 2),
+                    'peak_rss_kb': result['peak_rss_kb'],
+                })
+                rows.append(row)
+                print(f"✓ {name:<22} {mode:<9} {pages:>7} pages  {row['seconds']:>9.3f}s  "
+                      f"{row['files_per_s']:>10.1f} files/s  {row['mb_per_s']:>8.2f} MB/s  "
+                      f"{row['peak_rss_kb'] / 1024:>7.1f} MB RSS")
+    shutil.rmtree(os.path.join(CORPUS_DIR, 'scratch'), ignore_errors=True)
+    return rows
+
+
+def git_commit():
+    """Current commit, if this is a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_rows):
+    """Print files/s of this run relative to an earlier results file"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    before = {(r['workload'], r['mode'], r['pages']): r for r in old['results']}
+    print(f"\nCompared with {old_path} ({(old.get('commit') or 'unknown')[:10]}):")
+    for row in new_rows:
+        previous = before.get((row['workload'], row['mode'], row['pages']))
+        if previous and 'error' not in previous and 'error' not in row:
+            ratio = row['files_per_s'] / max(previous['files_per_s'], 1e-9)
+            print(f"  {row['workload']:<22} {row['mode']:<9} {row['pages']:>7} pages  {ratio:>6.2f}x")
+
+
+def parse_list(value, choices=None):
+    """Comma-separated option value; 'all' means every choice"""
+    if choices is not None and value == 'all':
+        return list(choices)
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    if choices is not None:
+        unknown = [item for item in items if item not in choices]
+        if unknown:
+            raise SystemExit(f"Unknown: {', '.join(unknown)} (choose from {', '.join(choices)})")
+    return items
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child_main(sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='corpus sizes in pages, e.g. 100,1000,10000,100000')
+    parser.add_argument('--workloads', default='all',
+                        help=f"comma-separated, or all: {', '.join(WORKLOADS)}")
+    parser.add_argument('--modes', default='all', help=f"comma-separated, or all: {', '.join(MODES)}")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes for batch runs (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=0, help='corpus generator seed')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help=f'results file (default: {DEFAULT_OUTPUT})')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in parse_list(args.sizes)]
+    workloads = parse_list(args.workloads, WORKLOADS)
+    modes = parse_list(args.modes, MODES)
+
+    rows = run_benchmarks(sizes, workloads, modes, args.workers, args.seed)
+    report = {
+        'format': BENCH_FORMAT,
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': args.workers,
+        'seed': args.seed,
+        'results': rows,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+        f.write('\n')
+    print(f"\nWrote {len(rows)} results to {args.output}")
+    if args.compare:
+        compare(args.compare, rows)
+    failed = sum(1 for row in rows if 'error' in row)
+    if failed:
+        raise SystemExit(f"Error: {failed} of {len(rows)} measurements failed")
+
+
+if __name__ == '__main__':
+    main()
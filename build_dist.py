@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Write a minified, precompressed copy of the site to dist/
+
+Every file Netlify would publish from the repo root is copied to dist/ with
+HTML, CSS and JS minified (see minify.py), and text files get .gz and .br
+siblings next to them. Files are built across a process pool, and only
+files whose content changed since the last build (or whose build code
+changed) are rebuilt; dist/ entries for deleted sources are removed.
+
+To deploy the result, point Netlify at it:
+
+    [build]
+      command = "python3 build_dist.py"
+      publish = "dist"
+
+.br files need the brotli package; without it only .gz files are written.
+Another output directory (-o) must be outside the repo: anything else under
+it would be taken for site files, here and by the other publish scans.
+"""
+import argparse
+import fnmatch
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from assemble_pages import PARTIALS_DIR
+from incremental_cache import content_hash, local_sources, stat_key
+from minify import MINIFIERS
+from page_io import atomic_write_bytes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST_DIR = 'dist'
+
+BUILD_MANIFEST = '.build-manifest.json'
+
+MANIFEST_FORMAT = 1
+
+# Never published: tooling, sources of the build itself, and local state
+EXCLUDE_DIRS = {'.git', 'node_modules', 'netlify', 'rules', '__pycache__', '.bench', DIST_DIR, PARTIALS_DIR}
+EXCLUDE_FILES = ['.*', '*.py', '*.pyc', '*.sh', '*.md', '*.toml', '*.jsonl', 'package.json',
+                 'package-lock.json', 'tailwind.config.json', 'bench_output.json', 'test-status.txt',
+                 'page-budgets.json', 'page_audit.json', 'finance-vectors.json']
+
+COMPRESSIBLE = ('.html', '.htm', '.css', '.js', '.json', '.svg', '.xml', '.txt', '.ico',
+                '.webmanifest', '.map')
+
+# Below this, compressed responses aren't worth the extra files
+MIN_COMPRESS_SIZE = 256
+
+
+def find_publish_files(root='.'):
+    """Relative paths of the files the site publishes, sorted"""
+    found = []
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in EXCLUDE_DIRS and not d.startswith('.'))
+        for filename in files:
+            if any(fnmatch.fnmatch(filename, pattern) for pattern in EXCLUDE_FILES):
+                continue
+            found.append(os.path.relpath(os.path.join(directory, filename), root))
+    return sorted(found)
+
+
+def build_version():
+    """Hash of the build code, so changing a minifier rebuilds everything"""
+    digest = ''
+    for path in local_sources():
+        with open(path, 'rb') as f:
+            digest = content_hash(digest.encode() + f.read())
+    return f"{digest}{'+br' if brotli else ''}"
+
+
+def compressed(data, suffix):
+    """data gzipped (deterministically) or brotli-compressed"""
+    if suffix == '.gz':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+
+def build_file(relpath, root, dist):
+    """
+    Minify and compress one file into dist.
+
+    Returns (relpath, outputs, source size, output size, error) where outputs
+    lists the dist paths written, relative to dist.
+    """
+    try:
+        with open(os.path.join(root, relpath), 'rb') as f:
+            data = f.read()
+        minifier = MINIFIERS.get(os.path.splitext(relpath)[1].lower())
+        output = data
+        if minifier:
+            try:
+                output = minifier(data.decode('utf-8')).encode('utf-8')
+            except (UnicodeDecodeError, ValueError):
+                output = data
+            if len(output) > len(data):
+                output = data
+
+        target = os.path.join(dist, relpath)
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        atomic_write_bytes(target, output)
+        outputs = [relpath]
+
+        suffixes = ['.gz', '.br'] if brotli else ['.gz']
+        if relpath.lower().endswith(COMPRESSIBLE) and len(output) >= MIN_COMPRESS_SIZE:
+            for suffix in suffixes:
+                packed = compressed(output, suffix)
+                if len(packed) < len(output):
+                    atomic_write_bytes(target + suffix, packed)
+                    outputs.append(relpath + suffix)
+        return relpath, outputs, len(data), len(output), None
+    except Exception as e:
+        return relpath, [], 0, 0, e
+
+
+def load_build_manifest(dist, version):
+    """The last build's manifest, or a fresh one if the build code changed"""
+    try:
+        with open(os.path.join(dist, BUILD_MANIFEST), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') == MANIFEST_FORMAT and manifest.get('version') == version:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'format': MANIFEST_FORMAT, 'version': version, 'files': {}}
+
+
+def is_current(manifest, relpath, root, dist):
+    """
+    True if relpath was built from its current content and its outputs
+    still exist. The stat is checked first; a changed stat falls back to
+    comparing the content hash. Returns (current, stat, digest).
+    """
+    entry = manifest['files'].get(relpath)
+    path = os.path.join(root, relpath)
+    stat = stat_key(os.stat(path))
+    if not entry or not all(os.path.exists(os.path.join(dist, out)) for out in entry['outputs']):
+        return False, stat, None
+    if entry['stat'] == stat:
+        return True, stat, entry['hash']
+    with open(path, 'rb') as f:
+        digest = content_hash(f.read())
+    return digest == entry['hash'], stat, digest
+
+
+def remove_outputs(dist, outputs):
+    """Delete dist files, and directories left empty"""
+    for out in outputs:
+        path = os.path.join(dist, out)
+        if os.path.exists(path):
+            os.remove(path)
+        directory = os.path.dirname(path)
+        while directory and os.path.abspath(directory) != os.path.abspath(dist) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+
+
+def build(root='.', dist=DIST_DIR, workers=None, force=False):
+    """
+    Bring dist up to date with root. Returns a summary dict with the counts
+    of built, unchanged, removed and failed files and the byte totals.
+    """
+    version = build_version()
+    manifest = load_build_manifest(dist, version)
+    if force:
+        manifest['files'] = {}
+
+    files = find_publish_files(root)
+    todo = []
+    stats = {}
+    for relpath in files:
+        current, stat, digest = is_current(manifest, relpath, root, dist)
+        if current:
+            manifest['files'][relpath]['stat'] = stat
+        else:
+            todo.append(relpath)
+            stats[relpath] = (stat, digest)
+
+    summary = {'built': 0, 'unchanged': len(files) - len(todo), 'removed': 0, 'failed': 0,
+               'source_bytes': 0, 'output_bytes': 0}
+    args = (todo, [root] * len(todo), [dist] * len(todo))
+    if workers == 1 or len(todo) <= 1:
+        results = map(build_file, *args)
+        pool = None
+    else:
+        chunksize = max(1, len(todo) // ((workers or os.cpu_count() or 1) * 4))
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(build_file, *args, chunksize=chunksize)
+
+    try:
+        for relpath, outputs, source_size, output_size, error in results:
+            if error is not None:
+                print(f"Error building {relpath}: {error}")
+                summary['failed'] += 1
+                continue
+            old = manifest['files'].get(relpath, {}).get('outputs', [])
+            remove_outputs(dist, [out for out in old if out not in outputs])
+            stat, digest = stats[relpath]
+            if digest is None:
+                with open(os.path.join(root, relpath), 'rb') as f:
+                    digest = content_hash(f.read())
+            manifest['files'][relpath] = {'stat': stat, 'hash': digest, 'outputs': outputs,
+                                          'sizes': [source_size, output_size]}
+            summary['built'] += 1
+            print(f"✓ Built {relpath}: {source_size} -> {output_size} bytes")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    published = set(files)
+    for relpath in sorted(set(manifest['files']) - published):
+        remove_outputs(dist, manifest['files'].pop(relpath)['outputs'])
+        summary['removed'] += 1
+        print(f"- Removed {relpath}")
+
+    for entry in manifest['files'].values():
+        summary['source_bytes'] += entry['sizes'][0]
+        summary['output_bytes'] += entry['sizes'][1]
+    os.makedirs(dist, exist_ok=True)
+    atomic_write_bytes(os.path.join(dist, BUILD_MANIFEST),
+                       json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: one per CPU, 1 = no pool)')
+    parser.add_argument('-o', '--output', default=DIST_DIR, help=f'output directory (default: {DIST_DIR})')
+    parser.add_argument('--force', action='store_true', help='rebuild every file')
+    args = parser.parse_args()
+
+    root = os.path.abspath('.')
+    output = os.path.abspath(args.output)
+    if os.path.commonpath([root, output]) == root and output != os.path.join(root, DIST_DIR):
+        raise SystemExit(f"Error: {args.output} is inside the site and would be published with it; "
+                         f"use {DIST_DIR}/ or a directory outside {root}")
+
+    if brotli is None:
+        print("Warning: brotli is not installed, writing .gz files only")
+    summary = build('.', args.output, args.workers, args.force)
+
+    saved = summary['source_bytes'] - summary['output_bytes']
+    percent = 100 * saved / summary['source_bytes'] if summary['source_bytes'] else 0
+    print(f"\nCompleted: {summary['built']} built, {summary['unchanged']} unchanged, "
+          f"{summary['removed']} removed, {summary['failed']} failed")
+    print(f"Minified: {summary['source_bytes']} -> {summary['output_bytes']} bytes ({percent:.1f}% smaller)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,887 @@
+#!/usr/bin/env python3
+"""
+Compile the Tailwind utilities the site uses into a static stylesheet
+
+Pages that load https://cdn.tailwindcss.com compile their CSS in the
+visitor's browser on every load. This script does the same job once, at
+build time: it scans every page and js/*.js for class names, generates CSS
+for the ones that are Tailwind utilities (with the preflight base styles the
+CDN also injects), minifies it into css/tailwind.<hash>.css and swaps the
+CDN <script> (and its inline tailwind.config) for a <link>.
+
+The CDN appends its <style> to the end of <head>, so the <link> goes there
+too and utilities keep winning over a page's own rules as before.
+
+The inline tailwind.config objects are saved to tailwind.config.json the
+first time, so later runs still know the theme after the scripts are gone.
+Only the theme keys the pages use are supported (colors and fontFamily,
+directly or under extend); utilities outside the generator's tables are
+left out, as Tailwind does with unknown classes.
+"""
+import glob
+import json
+import os
+import re
+
+from batch_runner import find_html_files, parse_args, run_batch
+from extract_css import CSS_DIR, remove_stale
+from incremental_cache import content_hash
+from minify import minify_css
+from page_io import atomic_write_bytes, read_page
+
+CONFIG_FILE = 'tailwind.config.json'
+
+SCRIPT_DIRS = ('js',)
+
+TAILWIND_LINK = '<link rel="stylesheet" href="{}">'
+
+TAILWIND_LINK_PATTERN = re.compile(r'[ \t]*<link rel="stylesheet" href="(css/tailwind\.[0-9a-f]+\.css)">[ \t]*\n?')
+
+CDN_PATTERN = re.compile(
+    r'(?:[ \t]*<!--[^>]*Tailwind[^>]*-->[ \t]*\n)?'
+    r'[ \t]*<script src="https://cdn\.tailwindcss\.com[^"]*"></script>[ \t]*\n?'
+    r'(?:\s*<script>\s*tailwind\.config\s*=(?P<config>.*?)</script>[ \t]*\n?)?',
+    re.DOTALL
+)
+
+# Tailwind's own content extractor: runs of characters that can't end a class
+CANDIDATE_PATTERN = re.compile(r'[^<>"\'`\s]*[^<>"\'`\s:]')
+
+SCREENS = {'sm': '640px', 'md': '768px', 'lg': '1024px', 'xl': '1280px', '2xl': '1536px'}
+
+PSEUDO_VARIANTS = {
+    'first': ':first-child', 'last': ':last-child', 'odd': ':nth-child(odd)', 'even': ':nth-child(even)',
+    'focus-within': ':focus-within', 'hover': ':hover', 'focus': ':focus',
+    'focus-visible': ':focus-visible', 'active': ':active', 'disabled': ':disabled',
+}
+
+VARIANT_ORDER = list(PSEUDO_VARIANTS) + ['group-hover']
+
+PALETTE = {
+    'slate': 'f8fafc f1f5f9 e2e8f0 cbd5e1 94a3b8 64748b 475569 334155 1e293b 0f172a 020617',
+    'gray': 'f9fafb f3f4f6 e5e7eb d1d5db 9ca3af 6b7280 4b5563 374151 1f2937 111827 030712',
+    'zinc': 'fafafa f4f4f5 e4e4e7 d4d4d8 a1a1aa 71717a 52525b 3f3f46 27272a 18181b 09090b',
+    'neutral': 'fafafa f5f5f5 e5e5e5 d4d4d4 a3a3a3 737373 525252 404040 262626 171717 0a0a0a',
+    'stone': 'fafaf9 f5f5f4 e7e5e4 d6d3d1 a8a29e 78716c 57534e 44403c 292524 1c1917 0c0a09',
+    'red': 'fef2f2 fee2e2 fecaca fca5a5 f87171 ef4444 dc2626 b91c1c 991b1b 7f1d1d 450a0a',
+    'orange': 'fff7ed ffedd5 fed7aa fdba74 fb923c f97316 ea580c c2410c 9a3412 7c2d12 431407',
+    'amber': 'fffbeb fef3c7 fde68a fcd34d fbbf24 f59e0b d97706 b45309 92400e 78350f 451a03',
+    'yellow': 'fefce8 fef9c3 fef08a fde047 facc15 eab308 ca8a04 a16207 854d0e 713f12 422006',
+    'lime': 'f7fee7 ecfccb d9f99d bef264 a3e635 84cc16 65a30d 4d7c0f 3f6212 365314 1a2e05',
+    'green': 'f0fdf4 dcfce7 bbf7d0 86efac 4ade80 22c55e 16a34a 15803d 166534 14532d 052e16',
+    'emerald': 'ecfdf5 d1fae5 a7f3d0 6ee7b7 34d399 10b981 059669 047857 065f46 064e3b 022c22',
+    'teal': 'f0fdfa ccfbf1 99f6e4 5eead4 2dd4bf 14b8a6 0d9488 0f766e 115e59 134e4a 042f2e',
+    'cyan': 'ecfeff cffafe a5f3fc 67e8f9 22d3ee 06b6d4 0891b2 0e7490 155e75 164e63 083344',
+    'sky': 'f0f9ff e0f2fe bae6fd 7dd3fc 38bdf8 0ea5e9 0284c7 0369a1 075985 0c4a6e 082f49',
+    'blue': 'eff6ff dbeafe bfdbfe 93c5fd 60a5fa 3b82f6 2563eb 1d4ed8 1e40af 1e3a8a 172554',
+    'indigo': 'eef2ff e0e7ff c7d2fe a5b4fc 818cf8 6366f1 4f46e5 4338ca 3730a3 312e81 1e1b4b',
+    'violet': 'f5f3ff ede9fe ddd6fe c4b5fd a78bfa 8b5cf6 7c3aed 6d28d9 5b21b6 4c1d95 2e1065',
+    'purple': 'faf5ff f3e8ff e9d5ff d8b4fe c084fc a855f7 9333ea 7e22ce 6b21a8 581c87 3b0764',
+    'fuchsia': 'fdf4ff fae8ff f5d0fe f0abfc e879f9 d946ef c026d3 a21caf 86198f 701a75 4a044e',
+    'pink': 'fdf2f8 fce7f3 fbcfe8 f9a8d4 f472b6 ec4899 db2777 be185d 9d174d 831843 500724',
+    'rose': 'fff1f2 ffe4e6 fecdd3 fda4af fb7185 f43f5e e11d48 be123c 9f1239 881337 4c0519',
+}
+
+SHADES = ('50', '100', '200', '300', '400', '500', '600', '700', '800', '900', '950')
+
+FONT_FAMILIES = {
+    'sans': ['ui-sans-serif', 'system-ui', 'sans-serif', '"Apple Color Emoji"', '"Segoe UI Emoji"',
+             '"Segoe UI Symbol"', '"Noto Color Emoji"'],
+    'serif': ['ui-serif', 'Georgia', 'Cambria', '"Times New Roman"', 'Times', 'serif'],
+    'mono': ['ui-monospace', 'SFMono-Regular', 'Menlo', 'Monaco', 'Consolas', '"Liberation Mono"',
+             '"Courier New"', 'monospace'],
+}
+
+PREFLIGHT = """
+*, ::before, ::after { box-sizing: border-box; border-width: 0; border-style: solid; border-color: #e5e7eb; }
+::before, ::after { --tw-content: ''; }
+html, :host { line-height: 1.5; -webkit-text-size-adjust: 100%; -moz-tab-size: 4; tab-size: 4;
+    font-family: FONT_SANS; font-feature-settings: normal; font-variation-settings: normal;
+    -webkit-tap-highlight-color: transparent; }
+body { margin: 0; line-height: inherit; }
+hr { height: 0; color: inherit; border-top-width: 1px; }
+abbr:where([title]) { -webkit-text-decoration: underline dotted; text-decoration: underline dotted; }
+h1, h2, h3, h4, h5, h6 { font-size: inherit; font-weight: inherit; }
+a { color: inherit; text-decoration: inherit; }
+b, strong { font-weight: bolder; }
+code, kbd, samp, pre { font-family: FONT_MONO; font-feature-settings: normal; font-variation-settings: normal; font-size: 1em; }
+small { font-size: 80%; }
+sub, sup { font-size: 75%; line-height: 0; position: relative; vertical-align: baseline; }
+sub { bottom: -0.25em; }
+sup { top: -0.5em; }
+table { text-indent: 0; border-color: inherit; border-collapse: collapse; }
+button, input, optgroup, select, textarea { font-family: inherit; font-feature-settings: inherit;
+    font-variation-settings: inherit; font-size: 100%; font-weight: inherit; line-height: inherit;
+    letter-spacing: inherit; color: inherit; margin: 0; padding: 0; }
+button, select { text-transform: none; }
+button, input:where([type='button']), input:where([type='reset']), input:where([type='submit']) {
+    -webkit-appearance: button; background-color: transparent; background-image: none; }
+:-moz-focusring { outline: auto; }
+:-moz-ui-invalid { box-shadow: none; }
+progress { vertical-align: baseline; }
+::-webkit-inner-spin-button, ::-webkit-outer-spin-button { height: auto; }
+[type='search'] { -webkit-appearance: textfield; outline-offset: -2px; }
+::-webkit-search-decoration { -webkit-appearance: none; }
+::-webkit-file-upload-button { -webkit-appearance: button; font: inherit; }
+summary { display: list-item; }
+blockquote, dl, dd, h1, h2, h3, h4, h5, h6, hr, figure, p, pre { margin: 0; }
+fieldset { margin: 0; padding: 0; }
+legend { padding: 0; }
+ol, ul, menu { list-style: none; margin: 0; padding: 0; }
+dialog { padding: 0; }
+textarea { resize: vertical; }
+input::placeholder, textarea::placeholder { opacity: 1; color: #9ca3af; }
+button, [role="button"] { cursor: pointer; }
+:disabled { cursor: default; }
+img, svg, video, canvas, audio, iframe, embed, object { display: block; vertical-align: middle; }
+img, video { max-width: 100%; height: auto; }
+[hidden]:where(:not([hidden="until-found"])) { display: none; }
+*, ::before, ::after { --tw-translate-x: 0; --tw-translate-y: 0; --tw-rotate: 0; --tw-skew-x: 0;
+    --tw-skew-y: 0; --tw-scale-x: 1; --tw-scale-y: 1; --tw-ring-offset-width: 0px;
+    --tw-ring-offset-color: #fff; --tw-ring-color: rgb(59 130 246 / 0.5);
+    --tw-ring-offset-shadow: 0 0 #0000; --tw-ring-shadow: 0 0 #0000; --tw-shadow: 0 0 #0000; }
+"""
+
+TRANSFORM = ('translate(var(--tw-translate-x), var(--tw-translate-y)) rotate(var(--tw-rotate)) '
+             'skewX(var(--tw-skew-x)) skewY(var(--tw-skew-y)) scaleX(var(--tw-scale-x)) scaleY(var(--tw-scale-y))')
+
+SHADOW = 'var(--tw-ring-offset-shadow, 0 0 #0000), var(--tw-ring-shadow, 0 0 #0000), var(--tw-shadow)'
+
+CHILDREN = ' > :not([hidden]) ~ :not([hidden])'
+
+
+def rem(quarters):
+    """Tailwind spacing step -> rem"""
+    return f'{quarters / 4:g}rem'
+
+
+SPACING = {'0': '0px', 'px': '1px'}
+SPACING.update((f'{n:g}', rem(n)) for n in (0.5, 1, 1.5, 2, 2.5, 3, 3.5, 4, 5, 6, 7, 8, 9, 10, 11, 12,
+                                            14, 16, 20, 24, 28, 32, 36, 40, 44, 48, 52, 56, 60, 64, 72, 80, 96))
+
+FRACTIONS = {f'{a}/{b}': f'{round(a / b * 100, 6):g}%' for b in (2, 3, 4, 5, 6, 12) for a in range(1, b)}
+FRACTIONS['full'] = '100%'
+
+INSET = dict(SPACING, auto='auto', **FRACTIONS)
+WIDTH = dict(SPACING, auto='auto', screen='100vw', min='min-content', max='max-content', fit='fit-content', **FRACTIONS)
+HEIGHT = dict(SPACING, auto='auto', screen='100vh', min='min-content', max='max-content', fit='fit-content', **FRACTIONS)
+MIN_WIDTH = dict(SPACING, full='100%', min='min-content', max='max-content', fit='fit-content')
+MIN_HEIGHT = dict(SPACING, full='100%', screen='100vh', min='min-content', max='max-content', fit='fit-content')
+MAX_HEIGHT = dict(SPACING, none='none', full='100%', screen='100vh', min='min-content', max='max-content', fit='fit-content')
+MAX_WIDTH = {
+    '0': '0rem', 'none': 'none', 'xs': '20rem', 'sm': '24rem', 'md': '28rem', 'lg': '32rem', 'xl': '36rem',
+    '2xl': '42rem', '3xl': '48rem', '4xl': '56rem', '5xl': '64rem', '6xl': '72rem', '7xl': '80rem',
+    'full': '100%', 'min': 'min-content', 'max': 'max-content', 'fit': 'fit-content', 'prose': '65ch',
+}
+MAX_WIDTH.update((f'screen-{name}', size) for name, size in SCREENS.items())
+MARGIN = dict(SPACING, auto='auto')
+
+Z_INDEX = {n: n for n in ('0', '10', '20', '30', '40', '50')}
+Z_INDEX['auto'] = 'auto'
+OPACITY = {str(n): f'{n / 100:g}' for n in (0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75,
+                                            80, 85, 90, 95, 100)}
+
+RADIUS = {'none': '0px', 'sm': '0.125rem', 'DEFAULT': '0.25rem', 'md': '0.375rem', 'lg': '0.5rem',
+          'xl': '0.75rem', '2xl': '1rem', '3xl': '1.5rem', 'full': '9999px'}
+BORDER_WIDTH = {'DEFAULT': '1px', '0': '0px', '2': '2px', '4': '4px', '8': '8px'}
+RING_WIDTH = {'DEFAULT': '3px', '0': '0px', '1': '1px', '2': '2px', '4': '4px', '8': '8px'}
+
+FONT_SIZE = {
+    'xs': ('0.75rem', '1rem'), 'sm': ('0.875rem', '1.25rem'), 'base': ('1rem', '1.5rem'),
+    'lg': ('1.125rem', '1.75rem'), 'xl': ('1.25rem', '1.75rem'), '2xl': ('1.5rem', '2rem'),
+    '3xl': ('1.875rem', '2.25rem'), '4xl': ('2.25rem', '2.5rem'), '5xl': ('3rem', '1'),
+    '6xl': ('3.75rem', '1'), '7xl': ('4.5rem', '1'), '8xl': ('6rem', '1'), '9xl': ('8rem', '1'),
+}
+FONT_WEIGHT = {'thin': '100', 'extralight': '200', 'light': '300', 'normal': '400', 'medium': '500',
+               'semibold': '600', 'bold': '700', 'extrabold': '800', 'black': '900'}
+LINE_HEIGHT = {'none': '1', 'tight': '1.25', 'snug': '1.375', 'normal': '1.5', 'relaxed': '1.625', 'loose': '2'}
+LINE_HEIGHT.update((str(n), rem(n)) for n in range(3, 11))
+TRACKING = {'tighter': '-0.05em', 'tight': '-0.025em', 'normal': '0em', 'wide': '0.025em',
+            'wider': '0.05em', 'widest': '0.1em'}
+
+SHADOWS = {
+    'sm': '0 1px 2px 0 rgb(0 0 0 / 0.05)',
+    'DEFAULT': '0 1px 3px 0 rgb(0 0 0 / 0.1), 0 1px 2px -1px rgb(0 0 0 / 0.1)',
+    'md': '0 4px 6px -1px rgb(0 0 0 / 0.1), 0 2px 4px -2px rgb(0 0 0 / 0.1)',
+    'lg': '0 10px 15px -3px rgb(0 0 0 / 0.1), 0 4px 6px -4px rgb(0 0 0 / 0.1)',
+    'xl': '0 20px 25px -5px rgb(0 0 0 / 0.1), 0 8px 10px -6px rgb(0 0 0 / 0.1)',
+    '2xl': '0 25px 50px -12px rgb(0 0 0 / 0.25)',
+    'inner': 'inset 0 2px 4px 0 rgb(0 0 0 / 0.05)',
+    'none': '0 0 #0000',
+}
+
+TRANSITIONS = {
+    'DEFAULT': 'color, background-color, border-color, text-decoration-color, fill, stroke, opacity, '
+               'box-shadow, transform, filter, backdrop-filter',
+    'all': 'all',
+    'colors': 'color, background-color, border-color, text-decoration-color, fill, stroke',
+    'opacity': 'opacity',
+    'shadow': 'box-shadow',
+    'transform': 'transform',
+}
+DURATIONS = {n: f'{n}ms' for n in ('0', '75', '100', '150', '200', '300', '500', '700', '1000')}
+EASINGS = {'linear': 'linear', 'in': 'cubic-bezier(0.4, 0, 1, 1)', 'out': 'cubic-bezier(0, 0, 0.2, 1)',
+           'in-out': 'cubic-bezier(0.4, 0, 0.2, 1)'}
+EASE = 'cubic-bezier(0.4, 0, 0.2, 1)'
+
+GRADIENT_DIRECTIONS = {'t': 'top', 'tr': 'top right', 'r': 'right', 'br': 'bottom right', 'b': 'bottom',
+                       'bl': 'bottom left', 'l': 'left', 'tl': 'top left'}
+
+SIDES = {'t': ('top',), 'r': ('right',), 'b': ('bottom',), 'l': ('left',),
+         'x': ('left', 'right'), 'y': ('top', 'bottom')}
+CORNERS = {'t': ('top-left', 'top-right'), 'r': ('top-right', 'bottom-right'),
+           'b': ('bottom-right', 'bottom-left'), 'l': ('top-left', 'bottom-left'),
+           'tl': ('top-left',), 'tr': ('top-right',), 'br': ('bottom-right',), 'bl': ('bottom-left',)}
+
+
+def static(**classes):
+    """Table of utilities with no value, 'name': 'prop: value; ...'"""
+    return {name.replace('_', '-'): [tuple(part.split(':', 1)) for part in decls.split('; ')]
+            for name, decls in classes.items()}
+
+
+STATIC = static(
+    sr_only='position:absolute; width:1px; height:1px; padding:0; margin:-1px; overflow:hidden; '
+            'clip:rect(0, 0, 0, 0); white-space:nowrap; border-width:0',
+    not_sr_only='position:static; width:auto; height:auto; padding:0; margin:0; overflow:visible; '
+                'clip:auto; white-space:normal',
+    pointer_events_none='pointer-events:none', pointer_events_auto='pointer-events:auto',
+    visible='visibility:visible', invisible='visibility:hidden', collapse='visibility:collapse',
+    static='position:static', fixed='position:fixed', absolute='position:absolute',
+    relative='position:relative', sticky='position:sticky',
+)
+
+DISPLAY = static(
+    block='display:block', inline_block='display:inline-block', inline='display:inline',
+    flex='display:flex', inline_flex='display:inline-flex', table='display:table',
+    table_row='display:table-row', table_cell='display:table-cell', grid='display:grid',
+    inline_grid='display:inline-grid', contents='display:contents', list_item='display:list-item',
+    hidden='display:none',
+)
+
+FLEX = static(
+    flex_1='flex:1 1 0%', flex_auto='flex:1 1 auto', flex_initial='flex:0 1 auto', flex_none='flex:none',
+    shrink='flex-shrink:1', shrink_0='flex-shrink:0', flex_shrink='flex-shrink:1', flex_shrink_0='flex-shrink:0',
+    grow='flex-grow:1', grow_0='flex-grow:0', flex_grow='flex-grow:1', flex_grow_0='flex-grow:0',
+)
+
+TRANSFORM_STATIC = static(transform=f'transform:{TRANSFORM}', transform_none='transform:none')
+
+INTERACTION = static(
+    cursor_auto='cursor:auto', cursor_default='cursor:default', cursor_pointer='cursor:pointer',
+    cursor_wait='cursor:wait', cursor_text='cursor:text', cursor_move='cursor:move',
+    cursor_not_allowed='cursor:not-allowed', select_none='user-select:none', select_text='user-select:text',
+    select_all='user-select:all', select_auto='user-select:auto', resize_none='resize:none',
+    resize_y='resize:vertical', resize_x='resize:horizontal', resize='resize:both',
+    list_none='list-style-type:none', list_disc='list-style-type:disc', list_decimal='list-style-type:decimal',
+    appearance_none='appearance:none',
+)
+
+LAYOUT = static(
+    flex_row='flex-direction:row', flex_row_reverse='flex-direction:row-reverse',
+    flex_col='flex-direction:column', flex_col_reverse='flex-direction:column-reverse',
+    flex_wrap='flex-wrap:wrap', flex_wrap_reverse='flex-wrap:wrap-reverse', flex_nowrap='flex-wrap:nowrap',
+    content_center='align-content:center', content_start='align-content:flex-start',
+    content_end='align-content:flex-end', content_between='align-content:space-between',
+    items_start='align-items:flex-start', items_end='align-items:flex-end', items_center='align-items:center',
+    items_baseline='align-items:baseline', items_stretch='align-items:stretch',
+    justify_start='justify-content:flex-start', justify_end='justify-content:flex-end',
+    justify_center='justify-content:center', justify_between='justify-content:space-between',
+    justify_around='justify-content:space-around', justify_evenly='justify-content:space-evenly',
+)
+
+SELF = static(
+    self_auto='align-self:auto', self_start='align-self:flex-start', self_end='align-self:flex-end',
+    self_center='align-self:center', self_stretch='align-self:stretch', self_baseline='align-self:baseline',
+)
+
+OVERFLOW = static(
+    overflow_auto='overflow:auto', overflow_hidden='overflow:hidden', overflow_visible='overflow:visible',
+    overflow_scroll='overflow:scroll', overflow_x_auto='overflow-x:auto', overflow_y_auto='overflow-y:auto',
+    overflow_x_hidden='overflow-x:hidden', overflow_y_hidden='overflow-y:hidden',
+    overflow_x_scroll='overflow-x:scroll', overflow_y_scroll='overflow-y:scroll',
+    truncate='overflow:hidden; text-overflow:ellipsis; white-space:nowrap',
+    text_ellipsis='text-overflow:ellipsis', text_clip='text-overflow:clip',
+    whitespace_normal='white-space:normal', whitespace_nowrap='white-space:nowrap',
+    whitespace_pre='white-space:pre', whitespace_pre_line='white-space:pre-line',
+    whitespace_pre_wrap='white-space:pre-wrap',
+    break_normal='overflow-wrap:normal; word-break:normal', break_words='overflow-wrap:break-word',
+    break_all='word-break:break-all',
+)
+
+BORDER_STYLE = static(
+    border_solid='border-style:solid', border_dashed='border-style:dashed', border_dotted='border-style:dotted',
+    border_double='border-style:double', border_none='border-style:none',
+)
+
+OBJECT_FIT = static(
+    object_contain='object-fit:contain', object_cover='object-fit:cover', object_fill='object-fit:fill',
+    object_none='object-fit:none',
+)
+
+TYPOGRAPHY = static(
+    text_left='text-align:left', text_center='text-align:center', text_right='text-align:right',
+    text_justify='text-align:justify', align_top='vertical-align:top', align_middle='vertical-align:middle',
+    align_bottom='vertical-align:bottom', align_baseline='vertical-align:baseline',
+)
+
+TEXT_STYLE = static(
+    uppercase='text-transform:uppercase', lowercase='text-transform:lowercase',
+    capitalize='text-transform:capitalize', normal_case='text-transform:none',
+    italic='font-style:italic', not_italic='font-style:normal',
+)
+
+DECORATION = static(
+    underline='text-decoration-line:underline', line_through='text-decoration-line:line-through',
+    no_underline='text-decoration-line:none',
+    antialiased='-webkit-font-smoothing:antialiased; -moz-osx-font-smoothing:grayscale',
+)
+
+OUTLINE = static(outline_none='outline:2px solid transparent; outline-offset:2px', outline='outline-style:solid',
+                 ring_inset='--tw-ring-inset:inset')
+
+TRANSITION_EASE = static(ease_linear='transition-timing-function:linear')
+
+
+def arbitrary(value):
+    """'[300px]' -> '300px' (underscores are spaces), else None"""
+    if len(value) > 2 and value[0] == '[' and value[-1] == ']':
+        return value[1:-1].replace('_', ' ')
+    return None
+
+
+def lookup(scale, value):
+    """A value from a theme scale, or an arbitrary [value]"""
+    return scale.get(value) or arbitrary(value)
+
+
+def hex_rgb(color):
+    """'#2c5f6f' -> (44, 95, 111), or None for anything that isn't hex"""
+    if not re.fullmatch(r'#(?:[0-9a-fA-F]{3}){1,2}', color):
+        return None
+    digits = color[1:]
+    if len(digits) == 3:
+        digits = ''.join(c * 2 for c in digits)
+    return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def with_alpha(color, alpha):
+    """A color at some opacity (hex only; other colors are left alone)"""
+    rgb = hex_rgb(color)
+    if rgb is None:
+        return color
+    return f'rgb({rgb[0]} {rgb[1]} {rgb[2]} / {alpha})'
+
+
+class Theme:
+    """The colors and font families utilities resolve against"""
+
+    def __init__(self, config=None):
+        self.colors = {'inherit': 'inherit', 'current': 'currentColor', 'transparent': 'transparent',
+                       'black': '#000', 'white': '#fff'}
+        for name, shades in PALETTE.items():
+            self.colors.update((f'{name}-{shade}', f'#{value}') for shade, value in zip(SHADES, shades.split()))
+        self.fonts = {name: ', '.join(family) for name, family in FONT_FAMILIES.items()}
+        self.unsupported = []
+
+        config = config or {}
+        theme = config.get('theme', {})
+        extend = theme.get('extend', {})
+        if 'colors' in theme:
+            self.colors = {k: v for k, v in self.colors.items() if k in ('inherit', 'current', 'transparent')}
+        for colors in (theme.get('colors', {}), extend.get('colors', {})):
+            self.add_colors(colors)
+        if 'fontFamily' in theme:
+            self.fonts = {}
+        for fonts in (theme.get('fontFamily', {}), extend.get('fontFamily', {})):
+            for name, family in fonts.items():
+                self.fonts[name] = family_css(family)
+        self.unsupported = sorted(set(theme) - {'extend', 'colors', 'fontFamily'}
+                                  | set(extend) - {'colors', 'fontFamily'})
+
+    def add_colors(self, colors, prefix=''):
+        """Flatten a nested colors object into 'name-shade' keys"""
+        for name, value in colors.items():
+            key = f'{prefix}-{name}' if prefix else str(name)
+            if isinstance(value, dict):
+                self.add_colors(value, key)
+            else:
+                self.colors[key[:-len('-DEFAULT')] if key.endswith('-DEFAULT') else key] = value
+
+    def color(self, value):
+        """A color utility's value ('gray-200', 'black/50', '[#123]'), or None"""
+        name, _, alpha = value.partition('/')
+        color = self.colors.get(name) or (arbitrary(name) if arbitrary(name) and
+                                          hex_rgb(arbitrary(name)) else None)
+        if color is None:
+            return None
+        if alpha:
+            alpha = lookup(OPACITY, alpha)
+            if alpha is None:
+                return None
+            return with_alpha(color, alpha)
+        return color
+
+
+def family_css(family):
+    """['Inter', 'system-ui'] -> 'Inter, system-ui', quoting names with spaces"""
+    if isinstance(family, str):
+        return family
+    return ', '.join(f'"{name}"' if ' ' in name and name[0] not in '"\'' else name for name in family)
+
+
+def sides(template, names, value):
+    """One declaration per side: sides('margin-{}', ('top',), '1rem')"""
+    return [(template.format(name), value) for name in names]
+
+
+def plugins(theme):
+    """
+    The utility plugins in Tailwind's core order, which is also the order
+    they appear in the stylesheet. Each entry is (prefix, resolve, options):
+    resolve maps the class's value (or 'DEFAULT' for a bare prefix; the
+    whole class for prefix None) to declarations, or None if it isn't one.
+    """
+    color = theme.color
+
+    def scaled(scale, *props):
+        return lambda value: [(prop, lookup(scale, value)) for prop in props] if lookup(scale, value) else None
+
+    def colored(*props):
+        return lambda value: [(prop, color(value)) for prop in props] if color(value) else None
+
+    def font_size(value):
+        size = FONT_SIZE.get(value)
+        if size:
+            return [('font-size', size[0]), ('line-height', size[1])]
+        size = arbitrary(value)
+        return [('font-size', size)] if size and not hex_rgb(size) else None
+
+    def font_family(value):
+        return [('font-family', theme.fonts[value])] if value in theme.fonts else None
+
+    def translate(axis):
+        return lambda value: ([(f'--tw-translate-{axis}', lookup(INSET, value)), ('transform', TRANSFORM)]
+                              if lookup(INSET, value) else None)
+
+    def grid_cols(value):
+        if value.isdigit():
+            return [('grid-template-columns', f'repeat({value}, minmax(0, 1fr))')]
+        return [('grid-template-columns', 'none')] if value == 'none' else None
+
+    def col_span(value):
+        if value.isdigit():
+            return [('grid-column', f'span {value} / span {value}')]
+        return [('grid-column', '1 / -1')] if value == 'full' else None
+
+    def shadow(value):
+        if value in SHADOWS:
+            return [('--tw-shadow', SHADOWS[value]), ('box-shadow', SHADOW)]
+        return None
+
+    def ring(value):
+        width = lookup(RING_WIDTH, value)
+        if width is None:
+            return None
+        return [('--tw-ring-offset-shadow',
+                 'var(--tw-ring-inset,) 0 0 0 var(--tw-ring-offset-width) var(--tw-ring-offset-color)'),
+                ('--tw-ring-shadow',
+                 f'var(--tw-ring-inset,) 0 0 0 calc({width} + var(--tw-ring-offset-width)) var(--tw-ring-color)'),
+                ('box-shadow', 'var(--tw-ring-offset-shadow), var(--tw-ring-shadow), var(--tw-shadow, 0 0 #0000)')]
+
+    def transition(value):
+        if value not in TRANSITIONS:
+            return [('transition-property', 'none')] if value == 'none' else None
+        return [('transition-property', TRANSITIONS[value]), ('transition-timing-function', EASE),
+                ('transition-duration', '150ms')]
+
+    def gradient(value):
+        if value.startswith('gradient-to-') and value[12:] in GRADIENT_DIRECTIONS:
+            direction = GRADIENT_DIRECTIONS[value[12:]]
+            return [('background-image', f'linear-gradient(to {direction}, var(--tw-gradient-stops))')]
+        return [('background-image', 'none')] if value == 'none' else None
+
+    def gradient_from(value):
+        c = color(value)
+        if c is None:
+            return None
+        return [('--tw-gradient-from', c), ('--tw-gradient-to', with_alpha(c, 0) if hex_rgb(c) else 'transparent'),
+                ('--tw-gradient-stops', 'var(--tw-gradient-from), var(--tw-gradient-to)')]
+
+    def gradient_via(value):
+        c = color(value)
+        if c is None:
+            return None
+        return [('--tw-gradient-to', with_alpha(c, 0) if hex_rgb(c) else 'transparent'),
+                ('--tw-gradient-stops', f'var(--tw-gradient-from), {c}, var(--tw-gradient-to)')]
+
+    def border_width(names):
+        return lambda value: sides('border-{}-width', names, lookup(BORDER_WIDTH, value)) \
+            if lookup(BORDER_WIDTH, value) else None
+
+    def radius(names):
+        return lambda value: sides('border-{}-radius', names, lookup(RADIUS, value)) \
+            if lookup(RADIUS, value) else None
+
+    def spacing_sides(template, scale, names):
+        return lambda value: sides(template, names, lookup(scale, value)) if lookup(scale, value) else None
+
+    def divide(axis):
+        start, end = ('top', 'bottom') if axis == 'y' else ('left', 'right')
+        return lambda value: ([(f'border-{start}-width', lookup(BORDER_WIDTH, value)), (f'border-{end}-width', '0px')]
+                              if lookup(BORDER_WIDTH, value) else None)
+
+    negative = {'negative': True}
+    children = {'children': True}
+    entries = [
+        (None, STATIC.get, {}),
+        ('inset', scaled(INSET, 'inset'), negative),
+        ('inset-x', scaled(INSET, 'left', 'right'), negative),
+        ('inset-y', scaled(INSET, 'top', 'bottom'), negative),
+    ]
+    entries += [(side, scaled(INSET, side), negative) for side in ('top', 'right', 'bottom', 'left')]
+    entries += [
+        ('z', scaled(Z_INDEX, 'z-index'), negative),
+        ('col-span', col_span, {}),
+        ('m', scaled(MARGIN, 'margin'), negative),
+    ]
+    entries += [(f'm{s}', spacing_sides('margin-{}', MARGIN, SIDES[s]), negative) for s in 'xytrbl']
+    entries += [
+        (None, DISPLAY.get, {}),
+        ('h', scaled(HEIGHT, 'height'), {}),
+        ('max-h', scaled(MAX_HEIGHT, 'max-height'), {}),
+        ('min-h', scaled(MIN_HEIGHT, 'min-height'), {}),
+        ('w', scaled(WIDTH, 'width'), {}),
+        ('min-w', scaled(MIN_WIDTH, 'min-width'), {}),
+        ('max-w', scaled(MAX_WIDTH, 'max-width'), {}),
+        (None, FLEX.get, {}),
+        ('basis', scaled(WIDTH, 'flex-basis'), {}),
+        ('translate-x', translate('x'), negative),
+        ('translate-y', translate('y'), negative),
+        (None, TRANSFORM_STATIC.get, {}),
+        (None, INTERACTION.get, {}),
+        ('grid-cols', grid_cols, {}),
+        (None, LAYOUT.get, {}),
+        ('gap', scaled(SPACING, 'gap'), {}),
+        ('gap-x', scaled(SPACING, 'column-gap'), {}),
+        ('gap-y', scaled(SPACING, 'row-gap'), {}),
+        ('space-x', scaled(SPACING, 'margin-left'), dict(negative, **children)),
+        ('space-y', scaled(SPACING, 'margin-top'), dict(negative, **children)),
+        ('divide-x', divide('x'), children),
+        ('divide-y', divide('y'), children),
+        ('divide', colored('border-color'), children),
+        (None, SELF.get, {}),
+        (None, OVERFLOW.get, {}),
+        ('rounded', scaled(RADIUS, 'border-radius'), {}),
+    ]
+    entries += [(f'rounded-{c}', radius(CORNERS[c]), {}) for c in ('t', 'r', 'b', 'l', 'tl', 'tr', 'br', 'bl')]
+    entries += [('border', scaled(BORDER_WIDTH, 'border-width'), {})]
+    entries += [(f'border-{s}', border_width(SIDES[s]), {}) for s in 'xytrbl']
+    entries += [
+        (None, BORDER_STYLE.get, {}),
+        ('border', colored('border-color'), {}),
+        ('bg', colored('background-color'), {}),
+        ('bg', gradient, {}),
+        ('from', gradient_from, {}),
+        ('via', gradient_via, {}),
+        ('to', colored('--tw-gradient-to'), {}),
+        (None, OBJECT_FIT.get, {}),
+        ('p', scaled(SPACING, 'padding'), {}),
+    ]
+    entries += [(f'p{s}', spacing_sides('padding-{}', SPACING, SIDES[s]), {}) for s in 'xytrbl']
+    entries += [
+        (None, TYPOGRAPHY.get, {}),
+        ('font', font_family, {}),
+        ('text', font_size, {}),
+        ('font', scaled(FONT_WEIGHT, 'font-weight'), {}),
+        (None, TEXT_STYLE.get, {}),
+        ('leading', scaled(LINE_HEIGHT, 'line-height'), {}),
+        ('tracking', scaled(TRACKING, 'letter-spacing'), negative),
+        ('text', colored('color'), {}),
+        (None, DECORATION.get, {}),
+        ('opacity', scaled(OPACITY, 'opacity'), {}),
+        ('shadow', shadow, {}),
+        (None, OUTLINE.get, {}),
+        ('ring', ring, {}),
+        ('ring', colored('--tw-ring-color'), {}),
+        ('ring-offset', scaled({k: k + 'px' for k in ('0', '1', '2', '4', '8')}, '--tw-ring-offset-width'), {}),
+        ('transition', transition, {}),
+        ('duration', scaled(DURATIONS, 'transition-duration'), {}),
+        ('ease', scaled(EASINGS, 'transition-timing-function'), {}),
+    ]
+    return entries
+
+
+def split_variants(name):
+    """'sm:hover:bg-x' -> (['sm', 'hover'], 'bg-x'), ignoring ':' inside [...]"""
+    parts = []
+    depth = 0
+    start = 0
+    for i, char in enumerate(name):
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+        elif char == ':' and depth == 0:
+            parts.append(name[start:i])
+            start = i + 1
+    return parts, name[start:]
+
+
+def escape_class(name):
+    """A class name as a CSS selector"""
+    escaped = []
+    for i, char in enumerate(name):
+        if i == 0 and char.isdigit():
+            escaped.append(f'\\{ord(char):x} ')
+        elif char.isascii() and (char.isalnum() or char in '-_'):
+            escaped.append(char)
+        else:
+            escaped.append('\\' + char)
+    return '.' + ''.join(escaped)
+
+
+def negate(value):
+    """Negative of a length, as Tailwind writes it"""
+    if value in ('0px', 'auto'):
+        return value
+    return value[1:] if value.startswith('-') else '-' + value
+
+
+def resolve(entries, body):
+    """(plugin index, declarations, options) for a utility, or None"""
+    negative = body.startswith('-')
+    if negative:
+        body = body[1:]
+    for index, (prefix, resolver, options) in enumerate(entries):
+        if negative and not options.get('negative'):
+            continue
+        if prefix is None:
+            decls = None if negative else resolver(body)
+        elif body == prefix:
+            decls = resolver('DEFAULT')
+        elif body.startswith(prefix + '-'):
+            decls = resolver(body[len(prefix) + 1:])
+        else:
+            continue
+        if decls:
+            if negative:
+                decls = [(prop, negate(value) if not prop.startswith('transform') else value)
+                         for prop, value in decls]
+            return index, decls, options
+    return None
+
+
+def generate(name, entries):
+    """
+    CSS rule for one candidate class, or None if it isn't a utility.
+
+    Returns (sort key, media query or None, rule text).
+    """
+    variants, body = split_variants(name)
+    important = body.startswith('!')
+    if important:
+        body = body[1:]
+    if name == 'container':
+        return None
+
+    media = None
+    pseudos = []
+    group = False
+    for variant in variants:
+        if variant in SCREENS and media is None and not pseudos:
+            media = variant
+        elif variant in PSEUDO_VARIANTS:
+            pseudos.append(variant)
+        elif variant == 'group-hover':
+            group = True
+        else:
+            return None
+
+    found = resolve(entries, body)
+    if found is None:
+        return None
+    index, decls, options = found
+
+    selector = escape_class(name) + ''.join(PSEUDO_VARIANTS[p] for p in pseudos)
+    if group:
+        selector = '.group:hover ' + selector
+    if options.get('children'):
+        selector += CHILDREN
+    suffix = ' !important' if important else ''
+    block = '; '.join(f'{prop.strip()}: {value.strip()}{suffix}' for prop, value in decls)
+    variant_rank = max([VARIANT_ORDER.index(p) + 1 for p in pseudos] + [len(VARIANT_ORDER) if group else 0])
+    screen_rank = list(SCREENS).index(media) + 1 if media else 0
+    return (screen_rank, variant_rank, index, name), media, f'{selector} {{ {block} }}'
+
+
+def container_css():
+    """The .container component"""
+    css = ['.container { width: 100% }']
+    for name, size in SCREENS.items():
+        css.append(f'@media (min-width: {size}) {{ .container {{ max-width: {size} }} }}')
+    return '\n'.join(css)
+
+
+def build_css(candidates, theme):
+    """
+    The stylesheet for a set of candidate class names.
+
+    Returns (css, utilities) where utilities is the sorted list of classes
+    that produced CSS.
+    """
+    entries = plugins(theme)
+    rules = []
+    for name in candidates:
+        rule = generate(name, entries)
+        if rule:
+            rules.append(rule)
+    rules.sort(key=lambda rule: rule[0])
+
+    sections = [PREFLIGHT.replace('FONT_SANS', theme.fonts.get('sans', 'sans-serif'))
+                         .replace('FONT_MONO', theme.fonts.get('mono', 'monospace'))]
+    if 'container' in candidates:
+        sections.append(container_css())
+    current = None
+    for _, media, text in rules:
+        if media != current:
+            if current:
+                sections.append('}')
+            if media:
+                sections.append(f'@media (min-width: {SCREENS[media]}) {{')
+            current = media
+        sections.append(text)
+    if current:
+        sections.append('}')
+    utilities = sorted(rule[0][3] for rule in rules)
+    return minify_css('\n'.join(sections)) + '\n', utilities
+
+
+def scan_candidates(files):
+    """Every token in files that could be a class name"""
+    candidates = set()
+    for filepath in files:
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+            candidates.update(CANDIDATE_PATTERN.findall(f.read()))
+    return candidates
+
+
+def parse_config(text):
+    """A tailwind.config object literal (JS) as a dict"""
+    text = text.strip().rstrip(';')
+    text = re.sub(r'^\s*//[^\n]*', '', text, flags=re.MULTILINE)
+    text = re.sub(r"'((?:\\.|[^'\\])*)'", lambda m: json.dumps(m.group(1)), text)
+    text = re.sub(r'([{,]\s*)([A-Za-z_$][\w$]*|\d+)\s*:', r'\1"\2":', text)
+    text = re.sub(r',(\s*[}\]])', r'\1', text)
+    return json.loads(text)
+
+
+def merge_config(base, extra, where):
+    """Merge two config dicts, refusing conflicting values"""
+    for key, value in extra.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            merge_config(base[key], value, where)
+        elif key in base and base[key] != value:
+            raise ValueError(f"{where}: tailwind.config sets {key!r} differently from {CONFIG_FILE}")
+        else:
+            base[key] = value
+    return base
+
+
+def load_config(pages):
+    """
+    The site's Tailwind config: CONFIG_FILE plus any inline tailwind.config
+    still on the pages. Returns (config, changed) where changed means the
+    pages added something CONFIG_FILE should record.
+    """
+    config = {}
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    before = json.dumps(config, sort_keys=True)
+    for filepath, content in pages.items():
+        for match in CDN_PATTERN.finditer(content):
+            if match.group('config'):
+                try:
+                    merge_config(config, parse_config(match.group('config')), filepath)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{filepath}: can't read tailwind.config: {e}") from None
+    return config, json.dumps(config, sort_keys=True) != before
+
+
+def content_files(directory='.'):
+    """Pages and scripts Tailwind classes are looked for in"""
+    files = find_html_files(directory)
+    for script_dir in SCRIPT_DIRS:
+        files.extend(sorted(glob.glob(os.path.join(directory, script_dir, '*.js'))))
+    return files
+
+
+class TailwindLink:
+    """Swap the Tailwind CDN script (or an older build's link) for href"""
+
+    triggers = ('cdn.tailwindcss.com', 'css/tailwind.')
+
+    def __init__(self, href):
+        self.href = href
+
+    def __call__(self, content):
+        content = CDN_PATTERN.sub('', content)
+        content = TAILWIND_LINK_PATTERN.sub('', content)
+        head_end = content.find('</head>')
+        if head_end < 0:
+            return content
+        line_start = content.rfind('\n', 0, head_end) + 1
+        indent = content[line_start:head_end]
+        if indent.strip():
+            line_start, indent = head_end, ''
+        link = TAILWIND_LINK.format(self.href)
+        return f"{content[:line_start]}{indent}    {link}\n{content[line_start:]}"
+
+
+def main():
+    args = parse_args(__doc__)
+    files = args.files or find_html_files()
+
+    pages = {}
+    for filepath in files:
+        content = read_page(filepath)
+        if CDN_PATTERN.search(content) or TAILWIND_LINK_PATTERN.search(content):
+            pages[filepath] = content
+    if not pages:
+        print("No pages use Tailwind")
+        return
+
+    try:
+        config, config_changed = load_config(pages)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Error loading Tailwind config: {e}")
+    theme = Theme(config)
+    if theme.unsupported:
+        print(f"Warning: ignoring unsupported theme keys {', '.join(theme.unsupported)}")
+
+    candidates = scan_candidates(content_files())
+    css, utilities = build_css(candidates, theme)
+    href = f"{CSS_DIR}/tailwind.{content_hash(css.encode('utf-8'))[:12]}.css"
+    print(f"Tailwind: {len(utilities)} utilities from {len(candidates)} candidates, "
+          f"{len(css.encode('utf-8'))} bytes in {href}")
+
+    if not args.dry_run:
+        os.makedirs(CSS_DIR, exist_ok=True)
+        if not os.path.exists(href):
+            atomic_write_bytes(href, css.encode('utf-8'))
+        if config_changed:
+            atomic_write_bytes(CONFIG_FILE, (json.dumps(config, indent=2) + '\n').encode('utf-8'))
+            print(f"✓ Saved the inline tailwind.config to {CONFIG_FILE}")
+
+    # The stylesheet depends on every page, so the per-page cache can't vouch for it
+    run_batch([TailwindLink(href)], files=sorted(pages), workers=args.workers, cache=None,
+              profile=args.profile, dry_run=args.dry_run,
+              updated='✓ Linked static Tailwind CSS: {}',
+              unchanged='- Already linked: {}')
+    if not args.dry_run:
+        remove_stale(href, 'tailwind', TAILWIND_LINK_PATTERN)
+
+
+if __name__ == '__main__':
+    main()
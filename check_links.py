@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Check that every internal link and asset reference resolves
+
+One parallel pass extracts the href, src and srcset references (and CSS
+url()s) from every published page and stylesheet. Each reference is then
+looked up in an index of the paths Netlify would serve: every published
+file, plus the extensionless /page form of each HTML page (which the
+sitemap uses) and the directory form of each index.html. Fragments are
+checked against the id attributes of the target page.
+
+Reported:
+    dangling   references that resolve to nothing (in production these
+               are hidden by the 404 -> /index.html redirect)
+    orphans    pages no other page links to
+    sitemap    <loc> entries that don't resolve, and pages missing from
+               sitemap.xml
+
+href="#" placeholders are counted but not treated as errors. The run fails
+if anything dangles or the sitemap lists a page that doesn't exist.
+"""
+import argparse
+import os
+import posixpath
+import re
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote, urlsplit
+
+from build_dist import find_publish_files
+
+SITEMAP = 'sitemap.xml'
+
+SITE_HOSTS = {'zencalcs.com', 'www.zencalcs.com'}
+
+# Published, but not meant to be linked or listed: fragments and drafts
+UNLISTED = {'ai-chat-snippet.html', 'body-fat-temp.html', 'macro-temp.html'}
+
+TAG = re.compile(r'<[a-zA-Z][^>]*>')
+
+REFERENCE = re.compile(r'\s(href|src|srcset|poster|action)\s*=\s*"([^"]*)"', re.IGNORECASE)
+
+ID_ATTRIBUTE = re.compile(r'\sid\s*=\s*"([^"]+)"', re.IGNORECASE)
+
+CSS_URL = re.compile(r'url\(\s*["\']?([^"\')]+)["\']?\s*\)')
+
+STYLE_BLOCK = re.compile(r'<style\b[^>]*>(.*?)</style\s*>', re.DOTALL | re.IGNORECASE)
+
+# Script bodies build markup in strings; comments aren't rendered
+HIDDEN = re.compile(r'(<script\b[^>]*>).*?(</script\s*>)|<!--.*?-->', re.DOTALL | re.IGNORECASE)
+
+LOC = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>')
+
+SKIPPED_SCHEMES = ('mailto:', 'tel:', 'javascript:', 'data:', 'sms:')
+
+
+def line_of(content, position):
+    return content.count('\n', 0, position) + 1
+
+
+def extract(path):
+    """
+    References in one page or stylesheet.
+
+    Returns {'path', 'refs': [(line, attribute, url)], 'ids', 'placeholders'}
+    or {'path', 'error'}.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        refs = []
+        placeholders = 0
+        if path.endswith('.css'):
+            refs.extend((line_of(content, m.start()), 'url()', m.group(1)) for m in CSS_URL.finditer(content))
+            return {'path': path, 'refs': refs, 'ids': [], 'placeholders': 0}
+
+        visible = HIDDEN.sub(lambda m: (m.group(1) or '') + '\n' * m.group(0).count('\n') + (m.group(2) or ''),
+                             content)
+        for tag in TAG.finditer(visible):
+            for match in REFERENCE.finditer(tag.group(0)):
+                attribute, value = match.group(1).lower(), match.group(2).strip()
+                line = line_of(visible, tag.start() + match.start(2))
+                if attribute == 'srcset':
+                    refs.extend((line, attribute, candidate.split()[0])
+                                for candidate in value.split(',') if candidate.strip())
+                elif value == '#':
+                    placeholders += 1
+                else:
+                    refs.append((line, attribute, value))
+        for block in STYLE_BLOCK.finditer(visible):
+            refs.extend((line_of(visible, block.start(1) + m.start()), 'url()', m.group(1))
+                        for m in CSS_URL.finditer(block.group(1)))
+        return {'path': path, 'refs': refs, 'ids': ID_ATTRIBUTE.findall(visible), 'placeholders': placeholders}
+    except Exception as e:
+        return {'path': path, 'error': str(e)}
+
+
+def build_index(files):
+    """{served path: file} for every way Netlify serves each published file"""
+    index = {}
+    for path in files:
+        served = '/' + path.replace(os.sep, '/')
+        index[served] = path
+        if served.endswith('.html'):
+            index[served[:-len('.html')]] = path
+            if posixpath.basename(served) == 'index.html':
+                directory = posixpath.dirname(served)
+                index[directory.rstrip('/') + '/'] = path
+                if directory != '/':
+                    index[directory] = path
+    return index
+
+
+def resolve(url, source):
+    """
+    (served path, fragment) a reference from source points at, or None if it
+    leaves the site (other hosts, mailto: and the like).
+    """
+    if url.lower().startswith(SKIPPED_SCHEMES):
+        return None
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc:
+        if parts.scheme not in ('http', 'https', '') or parts.netloc.lower() not in SITE_HOSTS:
+            return None
+    path = unquote(parts.path)
+    if not path:
+        path = '/' + source.replace(os.sep, '/')
+    elif not path.startswith('/'):
+        path = posixpath.join('/' + posixpath.dirname(source.replace(os.sep, '/')), path)
+    trailing = '/' if path.endswith('/') and path != '/' else ''
+    return posixpath.normpath(path) + trailing, parts.fragment
+
+
+def read_sitemap(path=SITEMAP):
+    """The <loc> URLs in a sitemap, with line numbers"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    return [(line_of(content, m.start(1)), m.group(1)) for m in LOC.finditer(content)]
+
+
+def check(files, workers=None, sitemap=SITEMAP):
+    """
+    Check the references of the given published files against each other.
+
+    Returns a report dict: dangling [(source, line, url, reason)], orphans,
+    sitemap_dead [(line, url)], sitemap_missing, placeholders {page: count},
+    references (the total checked).
+    """
+    index = build_index(files)
+    scanned = [path for path in files if path.endswith(('.html', '.css'))]
+    if workers == 1 or len(scanned) <= 1:
+        results = [extract(path) for path in scanned]
+    else:
+        chunksize = max(1, len(scanned) // ((workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(extract, scanned, chunksize=chunksize))
+
+    ids = {result['path']: set(result['ids']) for result in results if 'ids' in result}
+    report = {'dangling': [], 'orphans': [], 'sitemap_dead': [], 'sitemap_missing': [],
+              'placeholders': {}, 'references': 0, 'errors': []}
+    linked = set()
+    for result in results:
+        if 'error' in result:
+            report['errors'].append((result['path'], result['error']))
+            continue
+        source = result['path']
+        if result['placeholders']:
+            report['placeholders'][source] = result['placeholders']
+        for line, attribute, url in result['refs']:
+            target = resolve(url, source)
+            if target is None:
+                continue
+            report['references'] += 1
+            served, fragment = target
+            path = index.get(served)
+            if path is None:
+                report['dangling'].append((source, line, url, 'no such file'))
+                continue
+            if path != source and attribute == 'href':
+                linked.add(path)
+            if fragment and path in ids and fragment not in ids[path]:
+                report['dangling'].append((source, line, url, f'no id="{fragment}" in {path}'))
+
+    pages = [path for path in files if path.endswith('.html')]
+    report['orphans'] = [path for path in pages if path not in linked and path != 'index.html'
+                         and path not in UNLISTED]
+
+    listed = set()
+    for line, url in read_sitemap(sitemap):
+        target = resolve(url, '')
+        path = index.get(target[0]) if target else None
+        if path is None:
+            report['sitemap_dead'].append((line, url))
+        else:
+            listed.add(path)
+    if os.path.exists(sitemap):
+        report['sitemap_missing'] = [path for path in pages if path not in listed and path not in UNLISTED]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: one per CPU, 1 = no pool)')
+    parser.add_argument('--sitemap', default=SITEMAP, help=f'sitemap to compare (default: {SITEMAP})')
+    args = parser.parse_args()
+
+    files = find_publish_files()
+    report = check(files, args.workers, args.sitemap)
+
+    for path, error in report['errors']:
+        print(f"Error reading {path}: {error}")
+    for source, line, url, reason in report['dangling']:
+        print(f"{source}:{line}: {url} ({reason})")
+    for path in report['orphans']:
+        print(f"- Orphan (no page links to it): {path}")
+    for line, url in report['sitemap_dead']:
+        print(f"{args.sitemap}:{line}: {url} (no such page)")
+    for path in report['sitemap_missing']:
+        print(f"- Not in {args.sitemap}: {path}")
+
+    placeholders = sum(report['placeholders'].values())
+    print(f"\nChecked {report['references']} references in {len(files)} published files")
+    print(f"{len(report['dangling'])} dangling, {len(report['orphans'])} orphans, "
+          f"{len(report['sitemap_dead'])} dead and {len(report['sitemap_missing'])} missing sitemap entries, "
+          f"{placeholders} href=\"#\" placeholders on {len(report['placeholders'])} pages")
+    if report['dangling'] or report['sitemap_dead'] or report['errors']:
+        raise SystemExit(1)
+    print("✓ All references resolve")
+
+
+if __name__ == '__main__':
+    main()
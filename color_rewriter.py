@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Rewrite CSS/JS color literals through a palette, whatever their notation
+
+Every color token is parsed into an (r, g, b) key plus its alpha:
+    #RGB  #RGBA  #RRGGBB  #RRGGBBAA      (any case)
+    rgb(r, g, b)  rgba(r, g, b, a)       (any spacing, comma or / alpha)
+The palette is keyed on (r, g, b), so one entry covers every spelling of a
+color in a single scan with one dict lookup per token. A replaced token keeps
+its notation, case, spacing and alpha; only the color channels change.
+"""
+import re
+import time
+
+from rewrite_engine import PROFILING, REGISTRY
+
+COLOR_PATTERN = re.compile(
+    r'#(?P<hex>[0-9a-fA-F]{8}|[0-9a-fA-F]{6}|[0-9a-fA-F]{3,4})(?![\w-])'
+    r'|\b(?P<func>rgba?)\(\s*(?P<r>\d{1,3})(?:\s*,\s*|\s+)(?P<g>\d{1,3})(?:\s*,\s*|\s+)(?P<b>\d{1,3})'
+    r'\s*(?:[,/]\s*(?P<a>[\d.]+%?)\s*)?\)'
+)
+
+
+def parse_hex(color):
+    """'#2C5F6F' (or 3/4/8-digit forms) -> (r, g, b)"""
+    digits = color.lstrip('#')
+    if len(digits) in (3, 4):
+        digits = ''.join(c * 2 for c in digits)
+    return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def token_key(match):
+    """Canonical (r, g, b) of a COLOR_PATTERN match, or None if out of range"""
+    if match.group('hex'):
+        return parse_hex(match.group('hex'))
+    rgb = tuple(int(match.group(c)) for c in 'rgb')
+    return rgb if max(rgb) <= 255 else None
+
+
+def format_hex(match, rgb):
+    """New hex token in the old one's case and width, with its alpha digits"""
+    digits = match.group('hex')
+    lower = any(c in 'abcdef' for c in digits) and not any(c in 'ABCDEF' for c in digits)
+    color = ''.join(f'{c:02x}' if lower else f'{c:02X}' for c in rgb)
+    if len(digits) == 4:
+        color += digits[3] * 2
+    elif len(digits) == 8:
+        color += digits[6:]
+    return '#' + color
+
+
+def format_rgb(match, rgb):
+    """New rgb()/rgba() token: the old text with the three channels swapped"""
+    text = match.group(0)
+    base = match.start()
+    pieces = []
+    last = 0
+    for group, value in zip('rgb', rgb):
+        start, end = match.start(group) - base, match.end(group) - base
+        pieces.append(text[last:start])
+        pieces.append(str(value))
+        last = end
+    pieces.append(text[last:])
+    return ''.join(pieces)
+
+
+class ColorRewriter:
+    """
+    A palette of color replacements applied token by token.
+
+    Same interface as rewrite_engine.Rewriter (apply, triggers, profiling
+    stats), so it fits the batch runner and the profile/dry-run reports.
+    """
+
+    def __init__(self, palette, name=None):
+        self.name = name or 'colors'
+        self.palette = palette
+        self.table = {}
+        for old, new in palette.items():
+            key = parse_hex(old)
+            if key in self.table and self.table[key][1] != parse_hex(new):
+                raise ValueError(f"palette maps {old} twice")
+            self.table[key] = (old, parse_hex(new))
+        self.sources = list(dict.fromkeys(old for old, _ in self.table.values()))
+        self.triggers = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the profiling counters"""
+        self.calls = 0
+        self.stats = {old: [0, 0, 0.0] for old in self.sources}
+
+    def replace(self, match, hits=None):
+        """re.sub callback: the token rewritten, or unchanged"""
+        key = token_key(match)
+        entry = self.table.get(key)
+        if entry is None:
+            return match.group(0)
+        old, rgb = entry
+        if hits is not None:
+            hits[old] = hits.get(old, 0) + 1
+        if match.group('hex'):
+            return format_hex(match, rgb)
+        return format_rgb(match, rgb)
+
+    def apply(self, content):
+        """Rewrite every palette color in content"""
+        if PROFILING['enabled']:
+            return self.apply_profiled(content)
+        return COLOR_PATTERN.sub(self.replace, content)
+
+    def apply_profiled(self, content):
+        """apply(), counting hits per palette color; all colors share one scan"""
+        self.calls += 1
+        hits = {}
+        started = time.perf_counter()
+        content = COLOR_PATTERN.sub(lambda m: self.replace(m, hits), content)
+        elapsed = time.perf_counter() - started
+        for old, entry in self.stats.items():
+            count = hits.get(old, 0)
+            entry[0] += count
+            entry[1] += 1 if count else 0
+            entry[2] += elapsed
+        return content
+
+    def rule_stats(self):
+        """(rule, pass size, substitutions, files, seconds) per palette color"""
+        rows = []
+        for old in self.sources:
+            hits, files, seconds = self.stats[old]
+            rows.append((('color', old, self.palette[old]), len(self.sources), hits, files, seconds))
+        return rows
+
+    def __call__(self, content):
+        return self.apply(content)
+
+    def __repr__(self):
+        return f"<ColorRewriter {self.name}: {len(self.sources)} colors>"
+
+
+def compile_palette(palette, name=None):
+    """Build a ColorRewriter from {old hex: new hex} and register it"""
+    rewriter = ColorRewriter(palette, name)
+    REGISTRY.append(rewriter)
+    return rewriter
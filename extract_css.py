@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Move the CSS rules the pages share into one fingerprinted stylesheet
+
+Reads the first <style> block in each page's <head>, finds the largest set
+of rules common to a group of pages, writes them to css/site.<hash>.css and
+replaces the inline copies with a <link> just before the <style> block.
+Page-specific rules stay inline.
+
+The cascade is kept exactly: the shared file comes before everything left
+inline, so a shared rule is only dropped from a page if no rule ahead of it
+on that page (inline, or later in the shared file) sets the same property.
+Otherwise that page keeps its own inline copy. Pages that already link an
+older site.*.css are read as if its rules were inline, so re-running after
+editing the CSS or the pages just produces a new fingerprint.
+"""
+import functools
+import glob
+import os
+import re
+import textwrap
+
+from batch_runner import find_html_files, parse_args, run_batch
+from page_index import scan_regions
+from page_io import atomic_write_bytes, read_page
+from incremental_cache import content_hash
+
+CSS_DIR = 'css'
+
+SITE_CSS_LINK = '<link rel="stylesheet" href="css/site.{}.css">'
+
+SITE_CSS_PATTERN = re.compile(r'<link rel="stylesheet" href="(css/site\.[0-9a-f]+\.css)">[ \t]*\n?[ \t]*')
+
+# Only pages whose shared rules save at least this much are linked
+MIN_SAVING = 1024
+
+PROPERTY_PATTERN = re.compile(r'(?:^|[{;])\s*(-?-?[A-Za-z][\w-]*)\s*:')
+
+
+def split_css(css):
+    """
+    Split a stylesheet into top-level items.
+
+    Returns (items, tail): each item is {'raw', 'body'} where raw includes the
+    whitespace and comments before it and body is the rule itself (selector
+    and block, or an @-statement). tail is whatever follows the last item.
+    """
+    items = []
+    start = pos = 0
+    length = len(css)
+    while True:
+        # Skip whitespace and comments before the next item
+        while pos < length:
+            if css[pos].isspace():
+                pos += 1
+            elif css.startswith('/*', pos):
+                end = css.find('*/', pos + 2)
+                pos = length if end < 0 else end + 2
+            else:
+                break
+        if pos >= length:
+            return items, css[start:]
+
+        body_start = pos
+        depth = 0
+        quote = None
+        while pos < length:
+            char = css[pos]
+            if quote:
+                if char == '\\':
+                    pos += 1
+                elif char == quote:
+                    quote = None
+            elif char in '"\'':
+                quote = char
+            elif css.startswith('/*', pos):
+                end = css.find('*/', pos + 2)
+                pos = length if end < 0 else end + 1
+            elif char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth <= 0:
+                    pos += 1
+                    break
+            elif char == ';' and depth == 0:
+                pos += 1
+                break
+            pos += 1
+        items.append({'raw': css[start:pos], 'body': css[body_start:pos]})
+        start = pos
+
+
+def rule_key(body):
+    """Whitespace-insensitive identity of a rule"""
+    key = re.sub(r'\s+', ' ', body).strip()
+    return re.sub(r'\s*([{};])\s*', r'\1', key)
+
+
+def property_families(body):
+    """
+    Property families a rule may set, for the cascade check.
+
+    Families are coarse on purpose (margin-top and margin are both 'margin'),
+    and selectors that look like properties only make the check stricter.
+    """
+    families = set()
+    for name in PROPERTY_PATTERN.findall(body):
+        name = name.lower()
+        if not name.startswith('--'):
+            name = re.sub(r'^-\w+-', '', name).split('-')[0]
+        families.add(name)
+    return families
+
+
+def head_style(content):
+    """(start, end) of the first <style> element in <head>, or None"""
+    head_end = content.find('</head>')
+    for start, end in scan_regions(content)['style']:
+        if head_end < 0 or start < head_end:
+            return start, end
+    return None
+
+
+def style_inner(content, span):
+    """(open tag end, close tag start) offsets of a <style> element's text"""
+    start, end = span
+    return content.index('>', start) + 1, content.rindex('<', start, end)
+
+
+def read_site_css(href):
+    """Rules of a previously generated site stylesheet"""
+    with open(href, 'r', encoding='utf-8') as f:
+        return split_css(f.read())[0]
+
+
+def page_rules(content):
+    """
+    A page's rules in cascade order: any linked site.*.css, then its head
+    <style>. Each item is marked 'linked' if it comes from the stylesheet.
+    """
+    items = []
+    match = SITE_CSS_PATTERN.search(content)
+    if match:
+        items.extend(dict(item, linked=True) for item in read_site_css(match.group(1)))
+    span = head_style(content)
+    if span:
+        inner_start, inner_end = style_inner(content, span)
+        items.extend(dict(item, linked=False) for item in split_css(content[inner_start:inner_end])[0])
+    return items
+
+
+def choose_shared(pages):
+    """
+    Pick the pages to link and the rules they all share.
+
+    Starts from every page and drops, one at a time, the page whose removal
+    adds the most shared bytes, keeping the best total saving seen. Returns
+    (page set, [rule keys in stylesheet order]).
+    """
+    sizes = {}
+    keys = {}
+    for filepath, items in pages.items():
+        keys[filepath] = set()
+        for item in items:
+            key = rule_key(item['body'])
+            if not key.startswith('@import') and not key.startswith('@charset'):
+                keys[filepath].add(key)
+                sizes[key] = len(item['body'])
+
+    members = {f for f in pages if keys[f]}
+    counts = {}
+    for filepath in members:
+        for key in keys[filepath]:
+            counts[key] = counts.get(key, 0) + 1
+
+    best = (0, set(), set())
+    while len(members) >= 2:
+        shared = {key for key, count in counts.items() if count == len(members)}
+        saving = (len(members) - 1) * sum(sizes[key] for key in shared)
+        if saving > best[0]:
+            best = (saving, set(members), shared)
+
+        def gain(filepath):
+            # Bytes that become shared without this page; while that is
+            # nothing, drop the page least like the others
+            added = sum(sizes[key] for key, count in counts.items()
+                        if count == len(members) - 1 and key not in keys[filepath])
+            overlap = sum(sizes[key] * counts[key] for key in keys[filepath])
+            return added, -overlap
+
+        dropped = max(sorted(members), key=gain)
+        members.remove(dropped)
+        for key in keys[dropped]:
+            counts[key] -= 1
+
+    saving, members, shared = best
+    if saving < MIN_SAVING:
+        return set(), []
+    # Stylesheet order: as on the first linked page
+    first = pages[min(members)]
+    order = []
+    for item in first:
+        key = rule_key(item['body'])
+        if key in shared and key not in order:
+            order.append(key)
+    return members, order
+
+
+def droppable(items, order):
+    """
+    Indices of a page's items the shared stylesheet can replace.
+
+    A shared rule stays inline if a rule before it on the page sets the same
+    property family and would end up after it: an inline rule, or a shared
+    rule placed later in the stylesheet.
+    """
+    rank = {key: i for i, key in enumerate(order)}
+    keyed = [(rule_key(item['body']), property_families(item['body'])) for item in items]
+    dropped = {i for i, (key, _) in enumerate(keyed) if key in rank}
+    changed = True
+    while changed:
+        changed = False
+        for i in sorted(dropped):
+            key, families = keyed[i]
+            for j in range(i):
+                other_key, other_families = keyed[j]
+                if not families & other_families:
+                    continue
+                if j not in dropped or rank[other_key] > rank[key]:
+                    dropped.discard(i)
+                    changed = True
+                    break
+    return dropped
+
+
+def stylesheet_text(pages, members, order):
+    """The shared stylesheet, using each rule's text from the first page"""
+    texts = {}
+    for filepath in sorted(members):
+        for item in pages[filepath]:
+            key = rule_key(item['body'])
+            if key in order and key not in texts:
+                raw = item['raw'].lstrip('\n')
+                texts[key] = textwrap.dedent(raw).strip('\n')
+    return '\n\n'.join(texts[key] for key in order) + '\n'
+
+
+def plan_extraction(files):
+    """
+    Work out the shared stylesheet and each page's new head <style> text.
+
+    Returns (css_text or None, href or None, {filepath: page plan}) where a
+    page plan holds the new inline CSS and the stylesheet to link, if any.
+    """
+    pages = {filepath: page_rules(read_page(filepath)) for filepath in files}
+
+    members, order = choose_shared(pages)
+    while True:
+        dropped = {filepath: droppable(pages[filepath], order) for filepath in members}
+        used = {rule_key(pages[filepath][i]['body']) for filepath in members for i in dropped[filepath]}
+        if used.issuperset(order):
+            break
+        # Leave out rules every page has to keep inline anyway
+        order = [key for key in order if key in used]
+    css = stylesheet_text(pages, members, order) if order else None
+    href = f"{CSS_DIR}/site.{content_hash(css.encode('utf-8'))[:12]}.css" if css else None
+
+    plans = {}
+    for filepath, items in pages.items():
+        extracted = dropped.get(filepath, set())
+        kept = [item for i, item in enumerate(items) if i not in extracted]
+        if not any(item['linked'] for item in items) and not extracted:
+            continue
+        inline = ''.join(item['raw'] for item in kept)
+        plans[filepath] = {
+            'href': href if filepath in members else None,
+            'inline': inline,
+        }
+    return css, href, plans
+
+
+def rewrite_page(plan, content):
+    """
+    Apply a page plan: drop the old link, add the new one, reset <style>.
+
+    Idempotent, so a page already rewritten by the same plan is left alone.
+    """
+    match = SITE_CSS_PATTERN.search(content)
+    if match:
+        content = content[:match.start()] + content[match.end():]
+    span = head_style(content)
+    if span is None:
+        # Every rule was extracted last time: stand in an empty <style>
+        # where the old link was
+        at = match.start() if match else content.index('</head>')
+        content = f"{content[:at]}<style></style>{content[at:]}"
+        span = head_style(content)
+
+    start, end = span
+    inner_start, inner_end = style_inner(content, span)
+    line_start = content.rfind('\n', 0, start) + 1
+    indent = content[line_start:start] if not content[line_start:start].strip() else ''
+
+    inline = plan['inline']
+    if inline.strip():
+        tail = content[inner_start:inner_end]
+        tail = tail[len(tail.rstrip()):]
+        style = content[start:inner_start] + inline.rstrip() + tail + content[inner_end:end]
+    else:
+        style = ''
+    if plan['href']:
+        link = SITE_CSS_LINK.format(plan['href'][len(f'{CSS_DIR}/site.'):-len('.css')])
+        style = link + ('\n' + indent + style if style else '')
+    if not style:
+        # Remove the emptied <style> along with its line
+        after = end + 1 if content[end:end + 1] == '\n' else end
+        return content[:line_start] + content[after:]
+    return content[:start] + style + content[end:]
+
+
+class CssExtraction:
+    """Per-file transforms for run_batch() from plan_extraction()'s plans"""
+
+    def __init__(self, plans):
+        self.plans = plans
+
+    def __call__(self, filepath):
+        plan = self.plans.get(filepath)
+        return [functools.partial(rewrite_page, plan)] if plan else []
+
+
+def remove_stale(keep, stem='site', pattern=SITE_CSS_PATTERN, directory='.'):
+    """
+    Delete <stem>.*.css files no page in directory links any more.
+
+    pattern finds the links; its first group is the href.
+    """
+    linked = set()
+    for filepath in find_html_files(directory):
+        with open(os.path.join(directory, filepath), 'r', encoding='utf-8') as f:
+            linked.update(m.group(1) for m in pattern.finditer(f.read()))
+    for path in sorted(glob.glob(os.path.join(directory, CSS_DIR, f'{stem}.*.css'))):
+        href = os.path.relpath(path, directory).replace(os.sep, '/')
+        if href != keep and href not in linked:
+            os.remove(path)
+            print(f"- Removed stale {href}")
+
+
+def main():
+    args = parse_args(__doc__)
+    files = args.files or find_html_files()
+
+    css, href, plans = plan_extraction(files)
+    if css:
+        linked = sum(1 for plan in plans.values() if plan['href'])
+        print(f"Shared CSS: {len(css.encode('utf-8'))} bytes in {href}, linked from {linked} pages")
+        if not args.dry_run:
+            os.makedirs(CSS_DIR, exist_ok=True)
+            atomic_write_bytes(href, css.encode('utf-8'))
+    else:
+        print("No CSS shared widely enough to extract")
+
+    # The plan depends on every page, so the per-page cache can't vouch for it
+    run_batch(CssExtraction(plans), files=files, workers=args.workers, cache=None,
+              profile=args.profile, dry_run=args.dry_run,
+              updated='✓ Extracted CSS: {}')
+    if not args.dry_run:
+        remove_stale(href)
+
+
+if __name__ == '__main__':
+    main()
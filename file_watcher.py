@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Filesystem change notification for the watch mode in batch_runner
+
+open_watcher() returns an inotify watcher on Linux (through libc, so no
+extra package is needed) and falls back to polling stat() everywhere else.
+Both yield batches of changed file names: a batch is closed once no new
+event has arrived for DEBOUNCE seconds, or MAX_BATCH seconds after its
+first event if the changes keep coming, so an editor's save (or a git
+checkout touching forty pages) becomes one batch.
+
+Only the directory itself is watched, not subdirectories, matching
+find_html_files().
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from incremental_cache import stat_key
+
+DEBOUNCE = 0.03
+
+MAX_BATCH = 0.5
+
+POLL_INTERVAL = 0.05
+
+# From <sys/inotify.h>: a file opened for writing was closed, or a file
+# was renamed into the directory (how atomic saves, ours included, land)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """Changed names in a directory, from the kernel's inotify events"""
+
+    kind = 'inotify'
+
+    def __init__(self, directory='.'):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f'inotify_add_watch failed for {directory}')
+        self.directory = directory
+
+    def read(self, timeout):
+        """Names with events within timeout seconds (None = wait forever)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped: have the caller check everything
+                    names.update(os.listdir(self.directory))
+                elif name:
+                    names.add(os.fsdecode(name))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Changed names in a directory, by comparing stat() every POLL_INTERVAL"""
+
+    kind = 'polling'
+
+    def __init__(self, directory='.'):
+        self.directory = directory
+        self.stats = self.scan()
+
+    def scan(self):
+        stats = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stats[entry.name] = stat_key(entry.stat())
+                except OSError:
+                    pass
+        return stats
+
+    def read(self, timeout):
+        """Names whose stat changed within timeout seconds (None = wait forever)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            stats = self.scan()
+            names = {name for name, stat in stats.items() if self.stats.get(name) != stat}
+            self.stats = stats
+            if names or (deadline is not None and time.monotonic() >= deadline):
+                return names
+            time.sleep(POLL_INTERVAL if deadline is None else
+                       max(0, min(POLL_INTERVAL, deadline - time.monotonic())))
+
+    def close(self):
+        pass
+
+
+def open_watcher(directory='.', polling=False):
+    """An InotifyWatcher for directory, or a PollingWatcher if inotify isn't available"""
+    if not polling:
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollingWatcher(directory)
+
+
+def batches(watcher, debounce=DEBOUNCE, max_batch=MAX_BATCH):
+    """Yield debounced sets of changed names from a watcher, forever"""
+    while True:
+        names = watcher.read(None)
+        if not names:
+            continue
+        closes = time.monotonic() + max_batch
+        while time.monotonic() < closes:
+            more = watcher.read(min(debounce, closes - time.monotonic()))
+            if not more:
+                break
+            names |= more
+        yield names
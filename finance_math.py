@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+NumPy reference implementation of the calculators' financial math
+
+Vectorized versions of the formulas in the pages' inline JS, for checking
+the pages against many inputs at once and for precomputing results:
+
+    payment()        monthly payment in calculateMortgage / calculateLoan
+    amortization()   their yearly principal / interest / balance rows
+    compound()       calculateCompound in compound-interest.html
+    retirement()     calculateRetirement in retirement-calculator.html
+
+Every function takes scalars or arrays, broadcasts them together and
+returns arrays, so one call covers millions of combinations. Results
+match the JS to floating-point rounding (see TOLERANCE), including its
+edge cases: a 0% loan is NaN, as it is on the pages.
+
+    finance_math.py vectors   golden vectors: inputs keyed by the pages'
+                              element ids, outputs by their JS names
+    finance_math.py tables    rate x term payment grids pages can embed
+    finance_math.py bench     combinations per second on this machine
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+DEFAULT_VECTORS = 'finance-vectors.json'
+
+DEFAULT_TABLES = 'finance-tables.json'
+
+VECTORS_FORMAT = 1
+
+# Difference allowed between these results and the pages' JS, which sums
+# its schedules payment by payment instead of in closed form: relative, or
+# absolute in dollars for values that should cancel to 0 (a paid-off balance)
+TOLERANCE = 1e-9
+ABSOLUTE_TOLERANCE = 1e-6
+
+TABLE_RATES = np.round(np.arange(2.0, 10.0001, 0.125), 3)
+TABLE_TERMS = (10, 15, 20, 25, 30)
+TABLE_PER = 1000
+
+RETIREMENT_STATUS = ('On Track', 'Needs Adjustment', 'Underfunded')
+
+
+def payment(principal, annual_rate, years):
+    """Monthly payment on a loan, annual_rate in percent (the pages' formula)"""
+    principal, annual_rate, years = np.broadcast_arrays(*map(np.asarray, (principal, annual_rate, years)))
+    rate = annual_rate / 100 / 12
+    growth = np.power(1 + rate, years * 12)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return principal * (rate * growth) / (growth - 1)
+
+
+def balance_after(principal, rate, monthly, months):
+    """Loan balance after a number of payments, in closed form"""
+    growth = np.power(1 + rate, months)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return principal * growth - monthly * (growth - 1) / rate
+
+
+def amortization(principal, annual_rate, years):
+    """
+    Yearly amortization rows, as the pages' payment loop builds them.
+
+    Returns a dict of arrays shaped (*inputs, max years): year, principal,
+    interest, balance (floored at 0) and equity, with NaN in rows past the
+    end of a shorter loan. valid marks the real rows.
+    """
+    principal, annual_rate, years = np.broadcast_arrays(*map(np.asarray, (principal, annual_rate, years)))
+    rate = annual_rate / 100 / 12
+    term = years * 12
+    monthly = payment(principal, annual_rate, years)
+    paid = np.floor(term)
+
+    count = int(np.nanmax(np.ceil(paid / 12))) if paid.size else 0
+    year = np.arange(1, count + 1)
+    start = 12 * (year - 1) + np.zeros(paid.shape + (1,))
+    end = np.minimum(12 * year, paid[..., None])
+    # The loop emits a row every 12 payments, and after the last one
+    valid = (start < paid[..., None]) & ((end % 12 == 0) | (end == term[..., None]))
+
+    p, r, m = principal[..., None], rate[..., None], monthly[..., None]
+    opening = balance_after(p, r, m, start)
+    closing = balance_after(p, r, m, end)
+    principal_paid = opening - closing
+    rows = {
+        'year': np.where(valid, np.ceil(end / 12), np.nan),
+        'principal': np.where(valid, principal_paid, np.nan),
+        'interest': np.where(valid, m * (end - start) - principal_paid, np.nan),
+        'balance': np.where(valid, np.maximum(0, closing), np.nan),
+        'equity': np.where(valid, p - closing, np.nan),
+    }
+    rows['valid'] = valid
+    return rows
+
+
+def loan_summary(principal, annual_rate, years):
+    """monthlyPayment, totalPaid, totalInterest and interestPercent, as on the pages"""
+    monthly = payment(principal, annual_rate, years)
+    total = monthly * np.asarray(years) * 12
+    interest = total - principal
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent = interest / principal * 100
+    return {'monthlyPayment': monthly, 'totalPaid': total, 'totalInterest': interest, 'interestPercent': percent}
+
+
+def compound(principal, annual_rate, years, contribution, frequency, schedule=False):
+    """
+    calculateCompound: `frequency` compounding periods a year, with the
+    contribution added every period. Returns finalBalance,
+    totalContributions, totalEarnings and roi, plus yearly balance /
+    contributions / earnings arrays shaped (*inputs, max years) with
+    schedule=True.
+    """
+    principal, annual_rate, years, contribution, frequency = np.broadcast_arrays(
+        *map(np.asarray, (principal, annual_rate, years, contribution, frequency)))
+    rate = annual_rate / 100 / frequency
+
+    def balance_at(periods, principal=principal, rate=rate, contribution=contribution):
+        growth = np.power(1 + rate, periods)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            added = np.where(rate == 0, contribution * periods, contribution * (growth - 1) / rate)
+        return principal * growth + added
+
+    final = balance_at(years * frequency)
+    contributions = principal + contribution * frequency * years
+    earnings = final - contributions
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = earnings / contributions * 100
+    result = {'finalBalance': final, 'totalContributions': contributions, 'totalEarnings': earnings, 'roi': roi}
+
+    if schedule:
+        count = int(np.max(years)) if years.size else 0
+        year = np.arange(1, count + 1)
+        valid = year <= years[..., None]
+        balance = balance_at(year * frequency[..., None], principal[..., None], rate[..., None],
+                             contribution[..., None])
+        paid_in = principal[..., None] + contribution[..., None] * frequency[..., None] * year
+        result['yearly'] = {
+            'year': np.where(valid, year, np.nan),
+            'balance': np.where(valid, balance, np.nan),
+            'contributions': np.where(valid, paid_in, np.nan),
+            'earnings': np.where(valid, balance - paid_in, np.nan),
+            'valid': valid,
+        }
+    return result
+
+
+def retirement(current_age, retirement_age, life_expectancy, current_income, current_savings,
+               monthly_contribution, annual_return, inflation_rate, income_needed, other_income,
+               schedule=False):
+    """
+    calculateRetirement, rates and income_needed in percent.
+
+    Returns the page's results (totalAtRetirement, monthlyIncomeNeeded,
+    monthlyShortfall, yearsOfFunding, totalWithdrawals,
+    recommendedMonthlySavings, and status as an index into
+    RETIREMENT_STATUS), NaN where the page would refuse the inputs. With
+    schedule=True, 'yearly' holds age / contribution / balance / withdrawal
+    arrays shaped (*inputs, max years) and 'retired' marks the retirement
+    phase rows.
+
+    The year-by-year simulation loops over years, not over inputs: each
+    step updates every combination at once.
+    """
+    arrays = np.broadcast_arrays(*map(np.asarray, (
+        current_age, retirement_age, life_expectancy, current_income, current_savings,
+        monthly_contribution, annual_return, inflation_rate, income_needed, other_income)))
+    (current_age, retirement_age, life_expectancy, current_income, current_savings,
+     monthly_contribution, annual_return, inflation_rate, income_needed, other_income) = arrays
+    annual_return = annual_return / 100
+    inflation_rate = inflation_rate / 100
+    income_needed = income_needed / 100
+
+    accumulating = retirement_age - current_age
+    retired_years = life_expectancy - retirement_age
+    valid = (accumulating > 0) & (retired_years > 0)
+
+    fv_savings = current_savings * np.power(1 + annual_return, accumulating)
+    monthly_rate = annual_return / 12
+    months = accumulating * 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(monthly_rate > 0, (np.power(1 + monthly_rate, months) - 1) / monthly_rate, months)
+    total_at_retirement = fv_savings + monthly_contribution * annuity
+
+    future_income = current_income * np.power(1 + inflation_rate, accumulating)
+    monthly_needed = future_income * income_needed / 12
+    shortfall = monthly_needed - other_income
+
+    span = int(np.max(np.where(valid, life_expectancy - current_age, 0))) if valid.size else 0
+    balance = current_savings.astype(float)
+    funded = np.zeros(balance.shape, dtype=int)
+    withdrawals = np.zeros(balance.shape)
+    rows = {name: np.full(balance.shape + (span,), np.nan) for name in ('age', 'contribution', 'balance', 'withdrawal')}
+    retired = np.zeros(balance.shape + (span,), dtype=bool)
+    for offset in range(span):
+        saving = valid & (offset < accumulating)
+        drawing = valid & (offset >= accumulating) & (offset < accumulating + retired_years)
+        grown = balance * (1 + annual_return)
+        withdrawal = shortfall * np.power(1 + inflation_rate, offset - accumulating) * 12
+        drawn = grown - withdrawal
+        funded += drawing & (drawn > 0)
+        withdrawals += np.where(drawing, withdrawal, 0)
+        balance = np.where(saving, grown + monthly_contribution * 12,
+                           np.where(drawing, np.maximum(0, drawn), balance))
+        if schedule:
+            rows['age'][..., offset] = np.where(saving | drawing, current_age + offset, np.nan)
+            rows['contribution'][..., offset] = np.where(saving, monthly_contribution * 12,
+                                                         np.where(drawing, 0, np.nan))
+            rows['balance'][..., offset] = np.where(saving | drawing, balance, np.nan)
+            rows['withdrawal'][..., offset] = np.where(saving, 0, np.where(drawing, withdrawal, np.nan))
+            retired[..., offset] = drawing
+
+    needed_simple = shortfall * 12 * retired_years
+    deficit = needed_simple - total_at_retirement
+    with np.errstate(divide='ignore', invalid='ignore'):
+        catch_up = np.where(monthly_rate > 0, deficit / annuity, deficit / months)
+    recommended = np.where((funded < retired_years) & (deficit > 0), catch_up, monthly_contribution)
+    status = np.where(funded >= retired_years, 0, np.where(funded >= retired_years * 0.75, 1, 2))
+
+    def checked(values):
+        return np.where(valid, values, np.nan)
+
+    result = {
+        'totalAtRetirement': checked(total_at_retirement),
+        'monthlyIncomeNeeded': checked(monthly_needed),
+        'monthlyShortfall': checked(shortfall),
+        'yearsOfFunding': checked(funded),
+        'totalWithdrawals': checked(withdrawals),
+        'recommendedMonthlySavings': checked(recommended),
+        'status': checked(status),
+    }
+    if schedule:
+        result['yearly'] = rows
+        result['retired'] = retired
+    return result
+
+
+def payment_table(rates=TABLE_RATES, terms=TABLE_TERMS, per=TABLE_PER):
+    """Monthly payment per `per` borrowed, for every rate (rows) and term (columns)"""
+    grid = payment(per, np.asarray(rates)[:, None], np.asarray(terms)[None, :])
+    return {
+        'per': per,
+        'rates': [float(rate) for rate in rates],
+        'terms': [int(term) for term in terms],
+        'payments': np.round(grid, 6).tolist(),
+    }
+
+
+def plain(value):
+    """A NumPy scalar as JSON: float, int, or None for NaN"""
+    value = float(value)
+    if np.isnan(value):
+        return None
+    return int(value) if value.is_integer() and abs(value) < 2 ** 53 else value
+
+
+def case_rows(rows, index, names):
+    """The valid rows of one case's schedule as a list of dicts"""
+    valid = rows['valid'][index] if 'valid' in rows else ~np.isnan(rows[names[0]][index])
+    return [{name: plain(rows[name][index][i]) for name in names} for i in np.flatnonzero(valid)]
+
+
+def sample_inputs(rng, count):
+    """Plausible page inputs, rounded the way a visitor would type them"""
+    def pick(values):
+        return rng.choice(np.asarray(values), count)
+
+    rates = np.round(rng.uniform(0.5, 12, count) * 8) / 8
+    inputs = {
+        'mortgage': {
+            'homePrice': np.round(rng.uniform(80_000, 2_000_000, count), -3),
+            'downPercent': pick([0, 3.5, 5, 10, 20, 25]),
+            'interestRate': rates,
+            'loanTerm': pick([10, 15, 20, 25, 30, 40]),
+        },
+        'loan': {
+            'loanAmount': np.round(rng.uniform(1_000, 150_000, count), -2),
+            'interestRate': np.round(rng.uniform(1, 30, count) * 4) / 4,
+            'loanTerm': pick([1, 2, 3, 4, 5, 7, 10, 15]).astype(float),
+        },
+        'compound': {
+            'principal': np.round(rng.uniform(0, 100_000, count), -2),
+            'rate': np.round(rng.uniform(0, 15, count) * 4) / 4,
+            'years': rng.integers(1, 51, count),
+            'contribution': np.round(rng.uniform(0, 2_000, count), -1),
+            'frequency': pick([1, 4, 12, 26, 52]),
+        },
+        'retirement': {
+            'currentAge': rng.integers(18, 66, count),
+            'retirementAge': rng.integers(40, 76, count),
+            'lifeExpectancy': rng.integers(70, 106, count),
+            'currentIncome': np.round(rng.uniform(20_000, 400_000, count), -3),
+            'currentSavings': np.round(rng.uniform(0, 2_000_000, count), -3),
+            'monthlyContribution': np.round(rng.uniform(0, 5_000, count), -1),
+            'annualReturn': np.round(rng.uniform(0, 12, count) * 4) / 4,
+            'inflationRate': np.round(rng.uniform(0, 6, count) * 4) / 4,
+            'incomeNeeded': pick([60, 70, 80, 90, 100]),
+            'otherIncome': np.round(rng.uniform(0, 4_000, count), -2),
+        },
+    }
+    # Lead with the cases the pages treat specially: 0% rates (NaN for a
+    # loan, the no-growth branches elsewhere) and a term ending mid-year
+    inputs['mortgage']['interestRate'][:1] = 0
+    inputs['loan']['loanTerm'][:1] = 2.5
+    inputs['loan']['interestRate'][1:2] = 0
+    inputs['compound']['rate'][:1] = 0
+    inputs['retirement']['annualReturn'][:1] = 0
+    inputs['retirement']['currentAge'][:1] = 30
+    inputs['retirement']['retirementAge'][:1] = 65
+    inputs['retirement']['lifeExpectancy'][:1] = 90
+    return inputs
+
+
+def golden_vectors(count=200, seed=0):
+    """Golden vectors for each calculator, from seeded random page inputs"""
+    inputs = sample_inputs(np.random.default_rng(seed), count)
+    vectors = {'format': VECTORS_FORMAT, 'seed': seed, 'tolerance': TOLERANCE,
+               'absolute_tolerance': ABSOLUTE_TOLERANCE}
+
+    m = inputs['mortgage']
+    down = np.round(m['homePrice'] * m.pop('downPercent') / 100, 2)
+    m['downPayment'] = down
+    amount = m['homePrice'] - down
+    summary = loan_summary(amount, m['interestRate'], m['loanTerm'])
+    rows = amortization(amount, m['interestRate'], m['loanTerm'])
+    vectors['mortgage'] = {
+        'page': 'mortgage-calculator.html', 'function': 'calculateMortgage',
+        'cases': [{
+            'inputs': {name: plain(values[i]) for name, values in m.items()},
+            'outputs': {
+                'loanAmount': plain(amount[i]),
+                'monthlyPayment': plain(summary['monthlyPayment'][i]),
+                'totalPaid': plain(summary['totalPaid'][i]),
+                'totalInterest': plain(summary['totalInterest'][i]),
+                'yearlyData': case_rows(rows, i, ('year', 'principal', 'interest', 'balance', 'equity')),
+            },
+        } for i in range(count)],
+    }
+
+    loan = inputs['loan']
+    summary = loan_summary(loan['loanAmount'], loan['interestRate'], loan['loanTerm'])
+    rows = amortization(loan['loanAmount'], loan['interestRate'], loan['loanTerm'])
+    vectors['loan'] = {
+        'page': 'loan-calculator.html', 'function': 'calculateLoan',
+        'cases': [{
+            'inputs': {name: plain(values[i]) for name, values in loan.items()},
+            'outputs': dict({name: plain(values[i]) for name, values in summary.items()},
+                            yearlyData=case_rows(rows, i, ('year', 'principal', 'interest', 'balance'))),
+        } for i in range(count)],
+    }
+
+    c = inputs['compound']
+    result = compound(c['principal'], c['rate'], c['years'], c['contribution'], c['frequency'], schedule=True)
+    vectors['compound'] = {
+        'page': 'compound-interest.html', 'function': 'calculateCompound',
+        'cases': [{
+            'inputs': {name: plain(values[i]) for name, values in c.items()},
+            'outputs': dict({name: plain(result[name][i])
+                             for name in ('finalBalance', 'totalContributions', 'totalEarnings', 'roi')},
+                            yearlyData=case_rows(result['yearly'], i, ('year', 'balance', 'contributions', 'earnings'))),
+        } for i in range(count)],
+    }
+
+    r = inputs['retirement']
+    result = retirement(r['currentAge'], r['retirementAge'], r['lifeExpectancy'], r['currentIncome'],
+                        r['currentSavings'], r['monthlyContribution'], r['annualReturn'], r['inflationRate'],
+                        r['incomeNeeded'], r['otherIncome'], schedule=True)
+    cases = []
+    for i in range(count):
+        if np.isnan(result['status'][i]):
+            # The page alerts and stops; there is nothing to compare
+            continue
+        yearly = result['yearly']
+        steps = np.flatnonzero(~np.isnan(yearly['age'][i]))
+        outputs = {name: plain(result[name][i]) for name in result if name not in ('yearly', 'retired', 'status')}
+        outputs['status'] = RETIREMENT_STATUS[int(result['status'][i])]
+        outputs['yearByYearData'] = [
+            dict({name: plain(yearly[name][i][step]) for name in ('age', 'contribution', 'balance', 'withdrawal')},
+                 phase='retirement' if result['retired'][i][step] else 'accumulation')
+            for step in steps
+        ]
+        cases.append({'inputs': {name: plain(values[i]) for name, values in r.items()}, 'outputs': outputs})
+    vectors['retirement'] = {'page': 'retirement-calculator.html', 'function': 'calculateRetirement',
+                             'cases': cases}
+    return vectors
+
+
+def bench(count=1_000_000, seed=0):
+    """Combinations per second for each calculator's summary results"""
+    inputs = sample_inputs(np.random.default_rng(seed), count)
+    m, c, r = inputs['mortgage'], inputs['compound'], inputs['retirement']
+    runs = {
+        'payment': lambda: loan_summary(m['homePrice'], m['interestRate'], m['loanTerm']),
+        'amortization': lambda: amortization(m['homePrice'][:count // 10], m['interestRate'][:count // 10],
+                                             m['loanTerm'][:count // 10]),
+        'compound': lambda: compound(c['principal'], c['rate'], c['years'], c['contribution'], c['frequency']),
+        'retirement': lambda: retirement(*(r[name] for name in (
+            'currentAge', 'retirementAge', 'lifeExpectancy', 'currentIncome', 'currentSavings',
+            'monthlyContribution', 'annualReturn', 'inflationRate', 'incomeNeeded', 'otherIncome'))),
+    }
+    for name, run in runs.items():
+        size = count // 10 if name == 'amortization' else count
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        print(f"✓ {name:<13} {size:>9} combinations  {seconds:>7.3f}s  {size / seconds:>13,.0f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('vectors', 'tables', 'bench'))
+    parser.add_argument('-o', '--output', help=f'output file (default: {DEFAULT_VECTORS} / {DEFAULT_TABLES})')
+    parser.add_argument('--count', type=int, default=None,
+                        help='cases per calculator (vectors, default 200) or combinations (bench, default 1000000)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the sampled inputs (default: 0)')
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        bench(args.count or 1_000_000, args.seed)
+        return
+    if args.command == 'vectors':
+        output = args.output or DEFAULT_VECTORS
+        data = golden_vectors(args.count or 200, args.seed)
+        summary = ', '.join(f"{len(data[name]['cases'])} {name}" for name in ('mortgage', 'loan', 'compound', 'retirement'))
+    else:
+        output = args.output or DEFAULT_TABLES
+        data = {'payment': payment_table()}
+        summary = f"{len(TABLE_RATES)} rates x {len(TABLE_TERMS)} terms"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    print(f"Wrote {output}: {summary}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,9 @@
 """
 Comprehensive chart color updates
 """
-import re
-import os
+from batch_runner import main_for
+from color_rewriter import compile_palette
+from page_index import scoped
 
 # All color mappings for charts
 CHART_COLORS = {
@@ -33,54 +34,19 @@ CHART_COLORS = {
     '#6B7280': '#8B8589',  # Gray to Warm Gray (for data series only, not labels)
 }
 
+# One token scan of the inline <style> blocks, Chart.js scripts and the
+# tailwind.config theme script; every notation of a palette color (quotes,
+# hex case, shorthand, rgb/rgba) matches
+CHART_REWRITER = compile_palette(CHART_COLORS, name='fix_all_chart_colors')
+
+@scoped('style', 'chart_script', 'tailwind_config')
 def update_chart_colors(content):
     """Update all chart colors"""
-
-    for old_color, new_color in CHART_COLORS.items():
-        # Handle single quotes
-        content = content.replace(f"'{old_color}'", f"'{new_color}'")
-        content = content.replace(f'"{old_color}"', f'"{new_color}"')
-
-        # Handle direct color assignments
-        content = content.replace(f': {old_color}', f': {new_color}')
-        content = content.replace(f':{old_color}', f':{new_color}')
-
-        # Handle rgba/rgb conversions
-        if old_color == '#2563EB':
-            content = content.replace('rgba(37, 99, 235', 'rgba(44, 95, 111')
-        elif old_color == '#3B82F6':
-            content = content.replace('rgba(59, 130, 246', 'rgba(44, 95, 111')
-
-    return content
-
-def process_file(filepath):
-    """Process a single HTML file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        original = content
-        content = update_chart_colors(content)
-
-        if content != original:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            return True
-        return False
-    except Exception as e:
-        print(f"Error processing {filepath}: {e}")
-        return False
+    return CHART_REWRITER.apply(content)
 
 def main():
-    html_files = [f for f in os.listdir('.') if f.endswith('.html')]
-
-    updated = 0
-    for filename in sorted(html_files):
-        if process_file(filename):
-            print(f"✓ Updated chart colors: {filename}")
-            updated += 1
-
-    print(f"\nCompleted: {updated}/{len(html_files)} files updated")
+    main_for([update_chart_colors], __doc__,
+             updated='✓ Updated chart colors: {}')
 
 if __name__ == '__main__':
     main()
@@ -2,48 +2,24 @@
 """
 Fix label colors that should remain as gray
 """
-import re
-import os
+from batch_runner import main_for
+from rewrite_engine import compile_rules
+from rule_files import load_rule_file, rule_path
 
-def fix_labels(content):
-    """Revert label colors from warm gray back to original gray"""
-
-    # Fix category headers and other labels
-    content = content.replace('color: #8B8589;', 'color: #6B7280;')
-
-    # Fix in inline styles
-    content = content.replace('color:#8B8589', 'color:#6B7280')
-
-    return content
+# Label colors that should stay gray rather than warm gray
+LABEL_RULES = load_rule_file(rule_path('fix_labels.toml'))['rules']
 
-def process_file(filepath):
-    """Process a single HTML file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+LABEL_REWRITER = compile_rules(LABEL_RULES, name='fix_labels')
 
-        original = content
-        content = fix_labels(content)
+def fix_labels(content):
+    """Revert label colors from warm gray back to original gray"""
+    return LABEL_REWRITER.apply(content)
 
-        if content != original:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            return True
-        return False
-    except Exception as e:
-        print(f"Error processing {filepath}: {e}")
-        return False
+fix_labels.triggers = LABEL_REWRITER.triggers
 
 def main():
-    html_files = [f for f in os.listdir('.') if f.endswith('.html')]
-
-    updated = 0
-    for filename in sorted(html_files):
-        if process_file(filename):
-            print(f"✓ Fixed labels: {filename}")
-            updated += 1
-
-    print(f"\nCompleted: {updated}/{len(html_files)} files updated")
+    main_for([fix_labels], __doc__,
+             updated='✓ Fixed labels: {}')
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Persistent manifest of pages already clean for a given transform set
+
+Each entry records a file's size, mtime and content hash, plus the transform
+set versions that are known to leave that exact content unchanged. A file is
+skipped when its stat still matches (no read at all), or when the stat moved
+but the content hash did not.
+"""
+import hashlib
+import json
+import os
+import sys
+
+from page_io import atomic_write_bytes
+
+MANIFEST_FORMAT = 1
+
+DEFAULT_MANIFEST = '.rewrite-cache.json'
+
+# Clean versions remembered per file (one per script, plus a few old ones)
+MAX_VERSIONS = 16
+
+# Data files (rule files) the loaded transforms were built from
+DATA_SOURCES = set()
+
+
+def content_hash(data):
+    """Hash of a file's raw bytes"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def local_sources():
+    """Source files of every loaded module that lives next to this one"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    sources = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and path.endswith('.py') and os.path.dirname(os.path.abspath(path)) == here:
+            sources.add(os.path.abspath(path))
+    return sorted(sources)
+
+
+def register_source(path):
+    """Make a data file part of every transform set version from now on"""
+    DATA_SOURCES.add(os.path.abspath(path))
+
+
+def transform_set_version(transforms):
+    """
+    Version string for a transform set.
+
+    Combines the transforms' names with the source of every local module the
+    run has loaded, and every registered rule file, so editing any rule table
+    or helper invalidates the cache.
+    """
+    if callable(transforms):
+        transforms = [transforms]
+    digest = hashlib.blake2b(digest_size=16)
+    for transform in transforms:
+        name = getattr(transform, '__qualname__', type(transform).__name__)
+        digest.update(f"{getattr(transform, '__module__', '')}.{name}\n".encode())
+    for path in local_sources() + sorted(DATA_SOURCES):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    """Load the manifest, or start a fresh one if missing or unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') == MANIFEST_FORMAT:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'format': MANIFEST_FORMAT, 'files': {}}
+
+
+def save_manifest(path, manifest):
+    """Write the manifest atomically so it is never left half-written"""
+    atomic_write_bytes(path, json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+
+
+def stat_key(st):
+    """The parts of os.stat() used for the fast check"""
+    return [st.st_size, st.st_mtime_ns]
+
+
+def is_clean_by_stat(manifest, filepath, version):
+    """True if the file's stat is unchanged since it was recorded clean"""
+    entry = manifest['files'].get(filepath)
+    if not entry or version not in entry['clean']:
+        return False
+    try:
+        return stat_key(os.stat(filepath)) == entry['stat']
+    except OSError:
+        return False
+
+
+def clean_hash(manifest, filepath, version):
+    """Content hash the file had when last recorded clean, if any"""
+    entry = manifest['files'].get(filepath)
+    if entry and version in entry['clean']:
+        return entry['hash']
+    return None
+
+
+def record(manifest, filepath, version, stat, digest, clean):
+    """Store a file's current stat/hash and whether it is clean for version"""
+    entry = manifest['files'].get(filepath)
+    if not entry or entry['hash'] != digest:
+        entry = {'hash': digest, 'clean': []}
+        manifest['files'][filepath] = entry
+    entry['stat'] = stat
+    if clean and version not in entry['clean']:
+        entry['clean'].append(version)
+        del entry['clean'][:-MAX_VERSIONS]
@@ -484,6 +484,10 @@ class ReportGenerator {
    * Generate chart image for embedding in PDF
    */
   async generateChartImage(vizConfig) {
+    // Chart.js may be lazy-loaded; the image is read from the canvas below
+    if (window.loadLibrary) {
+      await window.loadLibrary('Chart');
+    }
     return new Promise((resolve, reject) => {
       try {
         // Create temporary canvas
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Load Chart.js and marked on first use instead of blocking the page
+
+Replaces the synchronous <script src> tags for the libraries in LIBRARIES
+with one small inline loader and a preconnect hint for their CDN. The
+loader fetches a library the first time it is needed:
+
+    Chart   a stand-in constructor: `new Chart(...)` returns an object that
+            builds the real chart once chart.js arrives, queuing update()
+            and friends until then (destroy() before that cancels it)
+    marked  the chat renderer functions are wrapped so their first call
+            waits for marked; js/ai-renderer.js falls back to its own
+            renderer if the fetch fails
+
+Both start downloading on the visitor's first click, tap or key press, so
+they are usually there by the time Calculate is pressed. Re-running merges
+new tags into a page's existing loader.
+"""
+import json
+import re
+from urllib.parse import urlsplit
+
+from batch_runner import main_for
+
+LIBRARIES = {
+    'Chart': {
+        'pattern': re.compile(r'https://cdn\.jsdelivr\.net/npm/chart\.js(?:@[^/"]+)?/dist/chart\.umd(?:\.min)?\.js'),
+        'stub': True,
+    },
+    'marked': {
+        'pattern': re.compile(r'https://cdn\.jsdelivr\.net/npm/marked(?:@[^/"]+)?/marked\.min\.js'),
+        'wrap': ['renderAIResponse', 'renderCollapsibleAIResponse'],
+    },
+}
+
+SCRIPT_TAG = re.compile(r'[ \t]*<script src="(?P<src>[^"]+)"></script>[ \t]*\n?')
+
+PRECONNECT = '<link rel="preconnect" href="{}">'
+
+# Each line ends in punctuation, so the lines are joined without spaces
+LOADER_JS = """
+(function(w,d,libs){
+var pending={};
+function load(name){
+if(!pending[name]){
+pending[name]=new Promise(function(resolve,reject){
+var s=d.createElement('script');
+s.src=libs[name].src;s.onload=resolve;s.onerror=reject;
+d.head.appendChild(s);
+});
+}
+return pending[name];
+}
+w.loadLibrary=load;
+var events=['pointerdown','keydown','touchstart'];
+function warm(){
+events.forEach(function(e){w.removeEventListener(e,warm,true);});
+Object.keys(libs).forEach(function(name){load(name).catch(function(){});});
+}
+events.forEach(function(e){w.addEventListener(e,warm,true);});
+if(libs.Chart&&libs.Chart.stub){
+var Lazy=function(item,config){
+var self=this;
+self.config=config;self.data=config.data;self.options=config.options;self.calls=[];
+load('Chart').then(function(){
+if(self.gone)return;
+self.chart=new w.Chart(item,config);
+self.calls.forEach(function(c){self.chart[c[0]].apply(self.chart,c[1]);});
+});
+};
+['update','resize','reset','render','stop','clear'].forEach(function(m){
+Lazy.prototype[m]=function(){
+if(this.chart)return this.chart[m].apply(this.chart,arguments);
+this.calls.push([m,arguments]);
+};
+});
+Lazy.prototype.destroy=function(){
+this.gone=true;
+if(this.chart)this.chart.destroy();
+};
+Lazy.prototype.toBase64Image=function(){
+return this.chart?this.chart.toBase64Image.apply(this.chart,arguments):'';
+};
+w.Chart=Lazy;
+}
+d.addEventListener('DOMContentLoaded',function(){
+Object.keys(libs).forEach(function(name){
+(libs[name].wrap||[]).forEach(function(fn){
+var f=w[fn];
+if(typeof f!=='function')return;
+w[fn]=function(){
+var self=this,args=arguments,call=function(){return f.apply(self,args);};
+return load(name).then(call,call);
+};
+});
+});
+});
+})(window,document,"""
+
+LOADER_CODE = ''.join(line.strip() for line in LOADER_JS.strip().splitlines())
+
+LOADER_TAG = '<script data-lazy-libraries>{}{});</script>'
+
+LOADER_PATTERN = re.compile(
+    r'[ \t]*<script data-lazy-libraries>.*?\(window,document,(?P<config>\{.*?\})\);</script>[ \t]*\n?',
+    re.DOTALL
+)
+
+
+def library_for(src):
+    """Name of the LIBRARIES entry a script src loads, or None"""
+    for name, library in LIBRARIES.items():
+        if library['pattern'].fullmatch(src):
+            return name
+    return None
+
+
+def loader_config(srcs):
+    """The loader's {name: {src, stub?, wrap?}} for the libraries a page loads"""
+    config = {}
+    for name in LIBRARIES:
+        if name in srcs:
+            entry = {'src': srcs[name]}
+            if LIBRARIES[name].get('stub'):
+                entry['stub'] = 1
+            if LIBRARIES[name].get('wrap'):
+                entry['wrap'] = LIBRARIES[name]['wrap']
+            config[name] = entry
+    return config
+
+
+def origins(srcs):
+    """scheme://host of each src, in first-seen order"""
+    return list(dict.fromkeys('{0.scheme}://{0.netloc}'.format(urlsplit(src)) for src in srcs.values()))
+
+
+def lazy_load_libraries(content):
+    """Swap synchronous library <script> tags for the lazy loader"""
+    srcs = {}
+    removed = []
+    for match in SCRIPT_TAG.finditer(content):
+        name = library_for(match.group('src'))
+        if name:
+            srcs.setdefault(name, match.group('src'))
+            removed.append(match.span())
+    if not removed:
+        return content
+
+    loader = LOADER_PATTERN.search(content)
+    if loader:
+        existing = {name: entry['src'] for name, entry in json.loads(loader.group('config')).items()}
+        srcs = dict(existing, **srcs)
+        removed.append(loader.span())
+    removed.sort()
+
+    at = removed[0][0]
+    indent = re.match(r'[ \t]*', content[at:]).group(0)
+    lines = []
+    head_end = content.find('</head>')
+    if 0 <= at < head_end:
+        lines.extend(PRECONNECT.format(origin) for origin in origins(srcs)
+                     if PRECONNECT.format(origin) not in content)
+    config = json.dumps(loader_config(srcs), separators=(',', ':'))
+    lines.append(LOADER_TAG.format(LOADER_CODE, config))
+    insert = ''.join(f'{indent}{line}\n' for line in lines)
+
+    pieces = []
+    last = 0
+    for start, end in removed:
+        pieces.append(content[last:start])
+        if start == at:
+            pieces.append(insert)
+        last = end
+    pieces.append(content[last:])
+    content = ''.join(pieces)
+
+    if not 0 <= at < head_end:
+        # The tags were in <body>: the hints still belong in <head>
+        hints = [PRECONNECT.format(origin) for origin in origins(srcs)
+                 if PRECONNECT.format(origin) not in content]
+        if hints:
+            head_end = content.find('</head>')
+            content = content[:head_end] + ''.join(f'    {hint}\n' for hint in hints) + content[head_end:]
+    return content
+
+lazy_load_libraries.triggers = ('chart.js', 'marked')
+
+def main():
+    main_for([lazy_load_libraries], __doc__,
+             updated='✓ Lazy-loading libraries: {}',
+             unchanged='- No synchronous library tags: {}')
+
+if __name__ == '__main__':
+    main()
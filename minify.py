@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Whitespace and comment minifiers for HTML, CSS and JavaScript
+
+Deliberately conservative, so the output always means the same as the
+input:
+    CSS   comments (except /*! */) and whitespace CSS doesn't need go
+    JS    comments and indentation go, but line breaks stay wherever
+          automatic semicolon insertion could depend on them; strings,
+          template literals and regex literals are never touched
+    HTML  comments (except conditional ones) go, whitespace runs collapse
+          to one space and disappear between block-level tags; inline
+          <style> and <script> are minified, <pre> and <textarea> are kept
+"""
+import json
+import re
+
+CSS_TOKEN = re.compile(r'(?P<string>"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(?P<comment>/\*(?!!).*?\*/)|\s+', re.DOTALL)
+
+# After one of these, a '/' starts a regex literal rather than a division
+REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^') | {''}
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                  'throw', 'instanceof', 'yield', 'await'}
+
+# A line break after/before these can never end a statement
+JOIN_AFTER = set('{;,([=:&|')
+JOIN_BEFORE = set(')]},;.:?')
+
+HTML_TOKEN = re.compile(
+    r'(?P<comment><!--.*?-->)'
+    r'|(?P<raw><(?P<raw_tag>pre|textarea|script|style)\b[^>]*>.*?</(?P=raw_tag)\s*>)'
+    r'|(?P<tag><[!/]?[a-zA-Z][^>]*>)'
+    r'|(?P<text>[^<]+|<)',
+    re.DOTALL | re.IGNORECASE
+)
+
+TAG_NAME = re.compile(r'<[!/]?([a-zA-Z][\w-]*)')
+
+TAG_SPACE = re.compile(r'("[^"]*"|\'[^\']*\')|\s+')
+
+SCRIPT_TYPE = re.compile(r'\stype\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+
+JS_TYPES = {'', 'text/javascript', 'application/javascript', 'module'}
+JSON_TYPES = {'application/ld+json', 'application/json'}
+
+# Whitespace next to one of these never renders
+BLOCK_TAGS = {
+    '!doctype', 'html', 'head', 'body', 'div', 'p', 'ul', 'ol', 'li', 'dl', 'dt', 'dd', 'nav', 'header', 'footer', 'main', 'section',
+    'article', 'aside', 'form', 'fieldset', 'legend', 'table', 'thead', 'tbody', 'tfoot', 'tr',
+    'td', 'th', 'caption', 'colgroup', 'col', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'br',
+    'blockquote', 'figure', 'figcaption', 'details', 'summary', 'option', 'optgroup',
+    'path', 'circle', 'rect', 'line', 'polyline', 'polygon', 'g', 'defs',
+}
+
+# Never rendered, so whitespace is judged by what lies beyond them
+HIDDEN_TAGS = {'title', 'meta', 'link', 'script', 'style', 'noscript', 'template', 'source', 'base'}
+
+
+def minify_css(css):
+    """Strip comments (except /*! */) and any whitespace CSS doesn't need"""
+    def squeeze(match):
+        if match.group('string'):
+            return match.group('string')
+        if match.group('comment'):
+            return ''
+        before = css[match.start() - 1:match.start()]
+        after = css[match.end():match.end() + 1]
+        if not before or not after or before in '{};,>:(' or after in '{};,>)!':
+            return ''
+        return ' '
+    return CSS_TOKEN.sub(squeeze, css).replace(';}', '}').strip()
+
+
+def is_word(char):
+    """Part of an identifier, keyword or number"""
+    return char.isalnum() or char in '_$' or ord(char) > 127
+
+
+def needs_space(before, after):
+    """Whether dropping the whitespace between two characters would merge tokens"""
+    if is_word(before) and is_word(after):
+        return True
+    if before in '+-' and after in '+-':
+        return True
+    if before.isdigit() and after == '.':
+        return True
+    return before == '/' and after == '/'
+
+
+def scan_quoted(js, i, quote):
+    """End of the string literal starting at js[i]"""
+    i += 1
+    while i < len(js):
+        if js[i] == '\\':
+            i += 2
+        elif js[i] == quote:
+            return i + 1
+        elif js[i] == '\n':
+            raise ValueError("unterminated string literal")
+        else:
+            i += 1
+    raise ValueError("unterminated string literal")
+
+
+def scan_template(js, i):
+    """
+    End of a template literal chunk starting at js[i] (just after ` or }).
+
+    Returns (end, opens) where opens is True if the chunk ends in '${'.
+    """
+    while i < len(js):
+        if js[i] == '\\':
+            i += 2
+        elif js[i] == '`':
+            return i + 1, False
+        elif js.startswith('${', i):
+            return i + 2, True
+        else:
+            i += 1
+    raise ValueError("unterminated template literal")
+
+
+def scan_regex(js, i):
+    """End of the regex literal (with flags) starting at js[i]"""
+    i += 1
+    in_class = False
+    while i < len(js):
+        char = js[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '\n':
+            raise ValueError("unterminated regex literal")
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            while i < len(js) and is_word(js[i]):
+                i += 1
+            return i
+        i += 1
+    raise ValueError("unterminated regex literal")
+
+
+def minify_js(js):
+    """Drop comments and needless whitespace from JavaScript (see module doc)"""
+    out = []
+    last = ''
+    depth = 0
+    templates = []
+    space = newline = False
+    i = 0
+    length = len(js)
+    while i < length:
+        char = js[i]
+        if char == '\n':
+            newline = True
+            i += 1
+            continue
+        if char.isspace():
+            space = True
+            i += 1
+            continue
+        if js.startswith('//', i):
+            end = js.find('\n', i)
+            i = length if end < 0 else end
+            continue
+        if js.startswith('/*', i):
+            end = js.find('*/', i + 2)
+            if end < 0:
+                raise ValueError("unterminated comment")
+            if '\n' in js[i:end]:
+                newline = True
+            else:
+                space = True
+            i = end + 2
+            continue
+
+        previous = out[-1][-1] if out else ''
+        if newline and out and previous not in JOIN_AFTER and char not in JOIN_BEFORE:
+            out.append('\n')
+        elif (space or newline) and out and needs_space(previous, char):
+            out.append(' ')
+        space = newline = False
+
+        if char in '"\'':
+            end = scan_quoted(js, i, char)
+            last = '"'
+        elif char == '`' or (char == '}' and templates and templates[-1] == depth):
+            if char == '}':
+                templates.pop()
+            end, opens = scan_template(js, i + 1)
+            if opens:
+                templates.append(depth)
+            last = '`' if not opens else '{'
+        elif char == '/' and (last in REGEX_AFTER or last in REGEX_KEYWORDS):
+            end = scan_regex(js, i)
+            last = 'regex'
+        elif is_word(char):
+            end = i + 1
+            while end < length and (is_word(js[end]) or (js[end] == '.' and js[i].isdigit())):
+                end += 1
+            last = js[i:end]
+        else:
+            end = i + 1
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+            last = char
+        out.append(js[i:end])
+        i = end
+    return ''.join(out)
+
+
+def minify_script(attributes, body):
+    """An inline <script>'s body minified for its type, or unchanged"""
+    match = SCRIPT_TYPE.search(attributes)
+    kind = match.group(1).lower() if match else ''
+    try:
+        if kind in JS_TYPES:
+            return minify_js(body)
+        if kind in JSON_TYPES:
+            return json.dumps(json.loads(body), separators=(',', ':'), ensure_ascii=False).replace('</', '<\\/')
+    except ValueError:
+        pass
+    return body
+
+
+def minify_raw(token, tag):
+    """A <script>, <style>, <pre> or <textarea> element, minified if possible"""
+    open_end = token.index('>') + 1
+    close_start = token.rindex('<')
+    attributes, body = token[:open_end], token[open_end:close_start]
+    if tag == 'style':
+        body = minify_css(body)
+    elif tag == 'script' and 'src=' not in attributes.lower():
+        body = minify_script(attributes, body)
+    return minify_tag(attributes) + body + token[close_start:]
+
+
+def minify_tag(tag):
+    """Collapse whitespace inside a tag, leaving attribute values alone"""
+    tag = TAG_SPACE.sub(lambda m: m.group(1) or ' ', tag)
+    return re.sub(r'\s*(/?>)$', r'\1', tag)
+
+
+def tag_name(token):
+    """Lower-case element name of a tag token"""
+    match = TAG_NAME.match(token)
+    return match.group(1).lower() if match else ''
+
+
+def neighbour(tokens, index, step):
+    """
+    Name of the nearest rendered tag beside tokens[index], looking past
+    hidden elements and whitespace; '' if it is text, '!doctype' at an end.
+    """
+    index += step
+    while 0 <= index < len(tokens):
+        kind, text, name = tokens[index]
+        if kind == 'text':
+            if text.strip():
+                return ''
+        elif name not in HIDDEN_TAGS:
+            return name
+        index += step
+    return '!doctype'
+
+
+def minify_html(html):
+    """Minify a page (see module doc)"""
+    tokens = []
+    for match in HTML_TOKEN.finditer(html):
+        if match.group('comment'):
+            comment = match.group('comment')
+            if comment.startswith('<!--[if') or comment.startswith('<![endif'):
+                tokens.append(('tag', comment, ''))
+        elif match.group('raw'):
+            tag = match.group('raw_tag').lower()
+            keep = tag in ('pre', 'textarea')
+            tokens.append(('tag', match.group('raw') if keep else minify_raw(match.group('raw'), tag), tag))
+        elif match.group('tag'):
+            tokens.append(('tag', minify_tag(match.group('tag')), tag_name(match.group('tag'))))
+        elif tokens and tokens[-1][0] == 'text':
+            # Text on both sides of a dropped comment
+            tokens[-1] = ('text', tokens[-1][1] + match.group('text'), '')
+        else:
+            tokens.append(('text', match.group('text'), ''))
+
+    out = []
+    for index, (kind, text, name) in enumerate(tokens):
+        if kind == 'tag':
+            out.append(text)
+            continue
+        collapsed = re.sub(r'\s+', ' ', text)
+        if collapsed == ' ':
+            if neighbour(tokens, index, -1) in BLOCK_TAGS or neighbour(tokens, index, 1) in BLOCK_TAGS:
+                continue
+        out.append(collapsed)
+    return ''.join(out)
+
+
+MINIFIERS = {
+    '.html': minify_html,
+    '.htm': minify_html,
+    '.css': minify_css,
+    '.js': minify_js,
+}
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Navigation manifest - the single source of truth for the mobile menu
+
+Each category lists its calculators as (slug, label). Slugs are the page
+names used in sitemap.xml (no .html); a slug of None is a placeholder for a
+calculator that doesn't exist yet. Adding a calculator is one line here, then
+a run of update_navigation.py to splice the new menu into every page.
+
+Every menu has the same layout, but pages don't all link the same entries:
+MENU_VARIANTS lists each version's categories and the entries it leaves
+out, and MENU_PAGES says which page carries which. Pages not listed get
+DEFAULT_VARIANT.
+"""
+import re
+
+SITEMAP = 'sitemap.xml'
+
+AI_LINK_STYLE = ('background: linear-gradient(135deg, #2C5F6F 0%, #1E40AF 100%); color: white; '
+                 'font-weight: 700; border-left-color: #1E40AF; box-shadow: 0 4px 12px rgba(44, 95, 111, 0.3); '
+                 'margin-bottom: 15px;')
+
+NAV_MANIFEST = [
+    {
+        'key': 'ai',
+        'comment': 'AI Calculator',
+        'title': None,
+        'style': AI_LINK_STYLE,
+        'items': [
+            ('index', '⚡ AI Calculator Assistant'),
+        ],
+    },
+    {
+        'key': 'financial',
+        'comment': 'Financial Calculators',
+        'title': 'Financial',
+        'items': [
+            ('mortgage-calculator', 'Mortgage Calculator'),
+            ('loan-calculator', 'Loan Calculator'),
+            ('auto-loan-calculator', 'Auto Loan Calculator'),
+            ('compound-interest', 'Savings Calculator'),
+            ('payment-calculator', 'Payment Calculator'),
+            ('retirement-calculator', 'Retirement Calculator'),
+            ('amortization-calculator', 'Amortization Calculator'),
+            ('investment-calculator', 'Investment Calculator'),
+            ('inflation-calculator', 'Inflation Calculator'),
+            ('roi-calculator', 'ROI Calculator'),
+            ('savings-calculator', 'Income Tax Calculator'),
+        ],
+    },
+    {
+        'key': 'health',
+        'comment': 'Fitness & Health',
+        'title': 'Fitness & Health',
+        'items': [
+            ('bmi-calculator', 'BMI Calculator'),
+            ('calorie-calculator', 'Calorie Calculator'),
+            ('body-fat-calculator', 'Body Fat Calculator'),
+            ('bmr-calculator', 'BMR Calculator'),
+            ('ideal-weight-calculator', 'Ideal Weight Calculator'),
+            ('pace-calculator', 'Pace Calculator'),
+            ('pregnancy-calculator', 'Pregnancy Calculator'),
+            ('due-date-calculator', 'Due Date Calculator'),
+            ('macro-calculator', 'Macro Calculator'),
+            ('body-type-calculator', 'Body Type Calculator'),
+        ],
+    },
+    {
+        'key': 'math',
+        'comment': 'Math Calculators',
+        'title': 'Math',
+        'items': [
+            ('scientific-calculator', 'Scientific Calculator'),
+            ('fraction-calculator', 'Fraction Calculator'),
+            ('percentage-calculator', 'Percentage Calculator'),
+            ('random-number-generator', 'Random Number Generator'),
+            ('triangle-calculator', 'Triangle Calculator'),
+            ('standard-deviation-calculator', 'Standard Deviation Calculator'),
+            ('square-root-calculator', 'Square Root Calculator'),
+            ('exponent-calculator', 'Exponent Calculator'),
+            ('log-calculator', 'Log Calculator'),
+            ('algebra-calculator', 'Algebra Calculator'),
+        ],
+    },
+    {
+        'key': 'other',
+        'comment': 'Other Calculators',
+        'title': 'Other',
+        'items': [
+            (None, 'Age Calculator'),
+            (None, 'Date Calculator'),
+            (None, 'Time Calculator'),
+            (None, 'Hours Calculator'),
+            (None, 'GPA Calculator'),
+            (None, 'Grade Calculator'),
+            (None, 'Concrete Calculator'),
+            (None, 'Password Generator'),
+            (None, 'Conversion Calculator'),
+            ('salary-calculator', 'Salary Calculator'),
+        ],
+    },
+]
+
+CALCULATORS = ('financial', 'health', 'math', 'other')
+
+# Placeholders the pages without a full Other category leave out
+OTHER_PLACEHOLDERS = ('Date Calculator', 'Time Calculator', 'Hours Calculator', 'GPA Calculator',
+                      'Grade Calculator', 'Concrete Calculator', 'Password Generator',
+                      'Conversion Calculator')
+
+# categories: what the menu lists, in order; omit: labels of entries it leaves out
+MENU_VARIANTS = {
+    'standard': {'categories': CALCULATORS},
+    'assistant': {'categories': ('ai', 'financial', 'health', 'math')},
+    'health-short': {'categories': CALCULATORS, 'omit': OTHER_PLACEHOLDERS},
+    'math': {'categories': CALCULATORS,
+             'omit': ('Income Tax Calculator', 'Age Calculator') + OTHER_PLACEHOLDERS},
+}
+
+DEFAULT_VARIANT = 'standard'
+
+MENU_PAGES = {
+    'index.html': 'assistant',
+    'mortgage-calculator.html': 'assistant',
+    'body-fat-calculator.html': 'health-short',
+    'macro-calculator.html': 'health-short',
+    'algebra-calculator.html': 'math',
+    'exponent-calculator.html': 'math',
+    'fraction-calculator.html': 'math',
+    'log-calculator.html': 'math',
+    'percentage-calculator.html': 'math',
+    'random-number-generator.html': 'math',
+    'scientific-calculator.html': 'math',
+    'square-root-calculator.html': 'math',
+    'standard-deviation-calculator.html': 'math',
+    'triangle-calculator.html': 'math',
+}
+
+MENU_OPEN = '''<div class="mobile-menu" id="mobileMenu" onclick="closeMobileMenu()">
+        <div class="mobile-menu-content" onclick="event.stopPropagation()">'''
+
+SEARCH_INPUT = ('<input type="text" id="searchInput" class="search-input" placeholder="Search calculators..." '
+                'onkeyup="filterCalculators()">')
+
+MENU_CLOSE = '''        </div>
+    </div>'''
+
+ITEM_INDENT = ' ' * 12
+
+
+def menu_link(slug, label, style=None):
+    """One menu entry; placeholders link nowhere"""
+    if slug is None:
+        return f'<a href="#" class="mobile-menu-item placeholder">{label}</a>'
+    if style:
+        return f'<a href="{slug}.html" class="mobile-menu-item" style="{style}">{label}</a>'
+    return f'<a href="{slug}.html" class="mobile-menu-item">{label}</a>'
+
+
+def search_lines():
+    """The search box"""
+    return [f'{ITEM_INDENT}<!-- Search Bar -->',
+            f'{ITEM_INDENT}<div class="search-container">',
+            f'{ITEM_INDENT}    {SEARCH_INPUT}',
+            f'{ITEM_INDENT}</div>']
+
+
+def page_variant(page):
+    """The MENU_VARIANTS entry for a page file name"""
+    return MENU_VARIANTS[MENU_PAGES.get(page, DEFAULT_VARIANT)]
+
+
+def render_menu(variant=MENU_VARIANTS[DEFAULT_VARIANT], manifest=NAV_MANIFEST):
+    """Render the whole <div class="mobile-menu"> fragment for one variant"""
+    categories = {category['key']: category for category in manifest}
+    omit = set(variant.get('omit', ()))
+    lines = search_lines()
+    for i, key in enumerate(variant['categories']):
+        category = categories[key]
+        if i:
+            lines.extend(['', f'{ITEM_INDENT}<div class="category-divider"></div>'])
+        lines.extend(['', f"{ITEM_INDENT}<!-- {category['comment']} -->"])
+        if category['title']:
+            lines.append(f'{ITEM_INDENT}<div class="category-header">{category["title"]}</div>')
+        lines.extend(ITEM_INDENT + menu_link(slug, label, category.get('style'))
+                     for slug, label in category['items'] if label not in omit)
+    return MENU_OPEN + '\n' + '\n'.join(lines) + '\n' + MENU_CLOSE
+
+
+def manifest_slugs(manifest=NAV_MANIFEST):
+    """Every calculator page the menu links to, in menu order"""
+    return [slug for category in manifest if category['title']
+            for slug, _ in category['items'] if slug]
+
+
+def sitemap_slugs(path=SITEMAP):
+    """Page slugs listed in sitemap.xml (the home page excluded)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        locs = re.findall(r'<loc>\s*https?://[^/<]+/([^<\s]*)\s*</loc>', f.read())
+    return [loc.rstrip('/') for loc in locs if loc.rstrip('/')]
+
+
+def sitemap_drift(manifest=NAV_MANIFEST, path=SITEMAP):
+    """Return (in menu but not sitemap, in sitemap but not menu)"""
+    menu = manifest_slugs(manifest)
+    sitemap = sitemap_slugs(path)
+    return ([s for s in menu if s not in sitemap],
+            sorted(set(s for s in sitemap if s not in menu)))
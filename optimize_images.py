@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Recompress the site's images and serve them at the size they are shown
+
+    PNGs        every published PNG is recompressed in place, losslessly
+                (the result is decoded and compared pixel for pixel, and
+                only kept if it is smaller)
+    <img>       tags pointing at a local PNG or JPEG are wrapped in a
+                <picture> offering AVIF and WebP copies, with a srcset of
+                1x/2x/3x copies of each at the size the image is displayed
+                (from the tag's width/height, its inline style, or the
+                height the page's <style> gives its class)
+    icon links  browsers can't negotiate formats for <link rel=icon>, so
+                these keep their PNGs and just get correct sizes="WxH"
+
+Resized copies go to img/<name>-<width>w.<hash>.<ext>, where the hash
+covers the source's content and the encoder settings, so an existing file
+is never encoded twice. Copies no page uses any more are deleted; other
+files in img/ (anything not named like a copy) are left alone. Source
+hashes and sizes are kept in .image-cache.json, so a repeat run only reads
+the images whose files changed.
+
+Needs Pillow; AVIF copies need Pillow 11.2+ or the pillow-avif-plugin
+package, and are skipped without them.
+"""
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from batch_runner import find_html_files, parse_args, run_batch
+from build_dist import find_publish_files
+from incremental_cache import content_hash, stat_key
+from page_io import atomic_write_bytes
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+else:
+    try:
+        import pillow_avif  # noqa: F401 - registers AVIF on older Pillow
+    except ImportError:
+        pass
+
+IMAGE_DIR = 'img'
+
+IMAGE_CACHE = '.image-cache.json'
+
+CACHE_FORMAT = 1
+
+SOURCE_FORMATS = {'.png': 'png', '.jpg': 'jpeg', '.jpeg': 'jpeg'}
+
+# Offered in <picture>, best first; the source's own format is the fallback
+MODERN_FORMATS = ('avif', 'webp')
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+
+# File names variant_path() generates, the only files remove_stale() deletes
+VARIANT_NAME = re.compile(r'.+-\d+w\.[0-9a-f]{12}\.(?:%s)' % '|'.join(sorted(set(EXTENSIONS.values()))))
+
+DENSITIES = (1, 2, 3)
+
+# Encoder settings for photos (JPEG sources) and for icons and flat artwork
+# (PNG sources), which are kept lossless wherever the format allows
+PHOTO_SETTINGS = {
+    'avif': {'quality': 60},
+    'webp': {'quality': 80, 'method': 6},
+    'jpeg': {'quality': 85, 'optimize': True, 'progressive': True},
+}
+ICON_SETTINGS = {
+    'avif': {'quality': 90},
+    'webp': {'lossless': True, 'quality': 100, 'method': 6},
+    'png': {'optimize': True},
+}
+
+# Display heights of images sized by a class, for pages whose <style> doesn't set one
+CSS_HEIGHTS = {'logo': 40}
+
+IMAGE_PATTERN = re.compile(
+    r'<picture>(?:\s*<source\b[^>]*>)*\s*(?P<wrapped><img\b[^>]*>)\s*</picture>|(?P<img><img\b[^>]*>)'
+)
+
+ICON_PATTERN = re.compile(r'<link rel="(?:icon|apple-touch-icon)"[^>]*>')
+
+ATTRIBUTE = re.compile(r'\s([\w-]+)="([^"]*)"')
+
+STYLE_SIZE = re.compile(r'(?<![\w-])(width|height)\s*:\s*(\d+(?:\.\d+)?)px')
+
+STYLE_BLOCK = re.compile(r'<style\b[^>]*>(.*?)</style>', re.DOTALL | re.IGNORECASE)
+
+CLASS_RULE = re.compile(r'\.([\w-]+)\s*\{([^}]*)\}')
+
+
+def image_path(src):
+    """The local file a src/href refers to, or None for remote and data URLs"""
+    if not src or re.match(r'[a-z][a-z0-9+.-]*:|//', src, re.IGNORECASE):
+        return None
+    path = os.path.normpath(src.split('?')[0].split('#')[0].lstrip('/'))
+    return path.replace(os.sep, '/')
+
+
+def settings_for(source_format, fmt):
+    """Encoder keyword arguments for a copy of a source_format image as fmt"""
+    return (PHOTO_SETTINGS if source_format == 'jpeg' else ICON_SETTINGS)[fmt]
+
+
+def variant_path(image, fmt, width, height):
+    """Where the copy of an image (a scanned images entry) in fmt at width x height lives"""
+    key = json.dumps([image['hash'], fmt, width, height, settings_for(image['format'], fmt)])
+    stem = os.path.splitext(os.path.basename(image['path']))[0]
+    return f"{IMAGE_DIR}/{stem}-{width}w.{content_hash(key.encode())[:12]}.{EXTENSIONS[fmt]}"
+
+
+def css_heights(content):
+    """
+    {class: height} for the classes a page's <style> blocks size in px.
+
+    A class sized at several breakpoints gets its largest height: one
+    srcset has to cover them all, and the smaller ones pick their copy
+    by density. Classes the page doesn't size keep CSS_HEIGHTS.
+    """
+    heights = dict(CSS_HEIGHTS)
+    found = {}
+    for block in STYLE_BLOCK.findall(content):
+        for name, declarations in CLASS_RULE.findall(block):
+            for prop, value in STYLE_SIZE.findall(declarations):
+                if prop == 'height':
+                    found[name] = max(found.get(name, 0), float(value))
+    heights.update(found)
+    return heights
+
+
+def display_size(attributes, image, heights=CSS_HEIGHTS):
+    """(width, height) in CSS pixels an <img> is shown at, from its attributes"""
+    width = height = None
+    for name, value in STYLE_SIZE.findall(attributes.get('style', '')):
+        if name == 'width':
+            width = float(value)
+        else:
+            height = float(value)
+    if width is None and attributes.get('width', '').isdigit():
+        width = int(attributes['width'])
+    if height is None and attributes.get('height', '').isdigit():
+        height = int(attributes['height'])
+    if width is None and height is None:
+        for name in attributes.get('class', '').split():
+            if name in heights:
+                height = heights[name]
+                break
+
+    source_width, source_height = image['size']
+    if width is None and height is None:
+        return source_width, source_height
+    if width is None:
+        width = height * source_width / source_height
+    if height is None:
+        height = width * source_height / source_width
+    return width, height
+
+
+def densities(size, image):
+    """[(density, width, height)] of the copies worth making for a display size"""
+    width, height = size
+    source_width = image['size'][0]
+    found = [(density, round(width * density), round(height * density))
+             for density in DENSITIES if round(width * density) <= source_width]
+    return found or [(1, image['size'][0], image['size'][1])]
+
+
+def srcset(image, fmt, copies, prefix=''):
+    """srcset value for the copies of an image in fmt"""
+    return ', '.join(f"{prefix}{variant_path(image, fmt, w, h)} {density}x" for density, w, h in copies)
+
+
+def picture_for(tag, images, formats, heights=CSS_HEIGHTS):
+    """
+    A <picture> element for an <img> tag, and the variants it uses.
+
+    Returns (html, [(path, source, fmt, width, height)]), or (None, []) if the tag
+    isn't for a scanned image. heights are the page's css_heights().
+    """
+    attributes = dict(ATTRIBUTE.findall(tag))
+    image = images.get(image_path(attributes.get('src')))
+    if image is None:
+        return None, []
+
+    copies = densities(display_size(attributes, image, heights), image)
+    variants = [(variant_path(image, fmt, w, h), image['path'], fmt, w, h)
+                for fmt in formats + (image['format'],) for _, w, h in copies]
+    prefix = '/' if attributes['src'].startswith('/') else ''
+    sources = ''.join(f'<source type="{MIME_TYPES[fmt]}" srcset="{srcset(image, fmt, copies, prefix)}">'
+                      for fmt in formats)
+    fallback = srcset(image, image['format'], copies, prefix)
+    img = re.sub(r'\ssrcset="[^"]*"', '', tag)
+    img = re.sub(r'(\ssrc="[^"]*")', lambda m: f'{m.group(1)} srcset="{fallback}"', img, count=1)
+    return f'<picture>{sources}{img}</picture>', variants
+
+
+def icon_link(tag, images):
+    """An icon <link> with sizes= matching the image it points at"""
+    attributes = dict(ATTRIBUTE.findall(tag))
+    image = images.get(image_path(attributes.get('href')))
+    if image is None or 'sizes' not in attributes:
+        return tag
+    width, height = image['size']
+    return tag.replace(f'sizes="{attributes["sizes"]}"', f'sizes="{width}x{height}"')
+
+
+def rewrite_images(content, images, formats):
+    """content with its images rewritten, and the variants the page uses"""
+    used = []
+    heights = css_heights(content)
+
+    def replace(match):
+        tag = match.group('wrapped') or match.group('img')
+        html, variants = picture_for(tag, images, formats, heights)
+        used.extend(variants)
+        return html if html else match.group(0)
+
+    content = IMAGE_PATTERN.sub(replace, content)
+    content = ICON_PATTERN.sub(lambda m: icon_link(m.group(0), images), content)
+    return content, used
+
+
+class ResponsiveImages:
+    """Rewrite a page's <img> tags and icon links for the scanned images"""
+
+    triggers = ('<img', 'icon"')
+
+    def __init__(self, images, formats):
+        self.images = images
+        self.formats = formats
+
+    def __call__(self, content):
+        return rewrite_images(content, self.images, self.formats)[0]
+
+
+def available_formats():
+    """The MODERN_FORMATS this Pillow can write"""
+    Image.init()
+    return tuple(fmt for fmt in MODERN_FORMATS if fmt.upper() in Image.SAVE)
+
+
+def load_image(path):
+    """An image opened upright and decoded in a mode every encoder accepts"""
+    image = ImageOps.exif_transpose(Image.open(path))
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    return image
+
+
+def encode_variant(path, source, fmt, width, height, settings):
+    """Write one resized copy. Returns (path, bytes written, error)."""
+    try:
+        image = load_image(source)
+        if (width, height) != image.size:
+            image = image.resize((width, height), Image.LANCZOS)
+        if fmt == 'jpeg' and image.mode == 'RGBA':
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, fmt.upper(), **settings)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_bytes(path, buffer.getvalue())
+        return path, len(buffer.getvalue()), None
+    except Exception as e:
+        return path, 0, e
+
+
+def recompress_png(path):
+    """
+    Losslessly recompress a PNG in place, keeping its colour profile.
+
+    Returns (path, old size, new size, error); sizes are equal if the file
+    was left alone.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        image = Image.open(BytesIO(data))
+        image.load()
+        options = {'optimize': True}
+        for key in ('icc_profile', 'transparency', 'dpi'):
+            if key in image.info:
+                options[key] = image.info[key]
+        buffer = BytesIO()
+        image.save(buffer, 'PNG', **options)
+        packed = buffer.getvalue()
+
+        check = Image.open(BytesIO(packed))
+        if len(packed) < len(data) and check.mode == image.mode and check.tobytes() == image.tobytes():
+            atomic_write_bytes(path, packed)
+            return path, len(data), len(packed), None
+        return path, len(data), len(data), None
+    except Exception as e:
+        return path, 0, 0, e
+
+
+def load_cache(path=IMAGE_CACHE):
+    """Source image hashes and sizes from the last run"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('format') == CACHE_FORMAT:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'format': CACHE_FORMAT, 'images': {}}
+
+
+def save_cache(cache, path=IMAGE_CACHE):
+    atomic_write_bytes(path, json.dumps(cache, indent=1, sort_keys=True).encode('utf-8'))
+
+
+def scan_image(cache, path):
+    """
+    The images entry for a source file: {path, format, hash, size, packed}.
+
+    Only opens the file if its stat changed since the cached scan.
+    """
+    stat = stat_key(os.stat(path))
+    entry = cache['images'].get(path)
+    if entry and entry['stat'] == stat:
+        return entry
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = content_hash(data)
+    if entry and entry['hash'] == digest:
+        entry['stat'] = stat
+        return entry
+    with Image.open(BytesIO(data)) as image:
+        size = list(ImageOps.exif_transpose(image).size)
+    entry = {'path': path, 'format': SOURCE_FORMATS[os.path.splitext(path)[1].lower()],
+             'hash': digest, 'size': size, 'stat': stat, 'packed': False}
+    cache['images'][path] = entry
+    return entry
+
+
+def pool_map(function, jobs, workers):
+    """function(*job) for each job, across a process pool unless workers is 1"""
+    if workers == 1 or len(jobs) <= 1:
+        return [function(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(function, *zip(*jobs)))
+
+
+def remove_stale(keep):
+    """Delete generated copies in IMAGE_DIR that aren't in keep"""
+    if not os.path.isdir(IMAGE_DIR):
+        return
+    for name in sorted(os.listdir(IMAGE_DIR)):
+        path = f"{IMAGE_DIR}/{name}"
+        if VARIANT_NAME.fullmatch(name) and path not in keep:
+            os.remove(path)
+            print(f"- Removed stale {path}")
+
+
+def main():
+    args = parse_args(__doc__)
+    if Image is None:
+        raise SystemExit("Error: optimize_images.py needs Pillow (pip install Pillow)")
+    files = args.files or find_html_files()
+    formats = available_formats()
+    if 'avif' not in formats:
+        print("Warning: this Pillow can't write AVIF, offering WebP only")
+
+    cache = load_cache()
+    sources = [path for path in find_publish_files()
+               if os.path.splitext(path)[1].lower() in SOURCE_FORMATS
+               and not path.startswith(f'{IMAGE_DIR}/')]
+    images = {path: scan_image(cache, path) for path in sources}
+
+    pngs = [(path,) for path, image in images.items() if image['format'] == 'png' and not image['packed']]
+    if pngs and not args.dry_run:
+        for path, before, after, error in pool_map(recompress_png, pngs, args.workers):
+            if error is not None:
+                print(f"Error recompressing {path}: {error}")
+                continue
+            if after < before:
+                print(f"✓ Recompressed {path}: {before} -> {after} bytes")
+            images[path] = scan_image(cache, path)
+            images[path]['packed'] = True
+
+    used = {}
+    for filepath in files:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for path, source, fmt, width, height in rewrite_images(f.read(), images, formats)[1]:
+                used[path] = (path, source, fmt, width, height, settings_for(images[source]['format'], fmt))
+
+    jobs = [job for path, job in sorted(used.items()) if not os.path.exists(path)]
+    print(f"Image copies: {len(used)} in use, {len(jobs)} to encode")
+    if jobs and not args.dry_run:
+        for path, size, error in pool_map(encode_variant, jobs, args.workers):
+            if error is not None:
+                # Leave that image's tags alone rather than point them at a missing file
+                print(f"Error encoding {path}: {error}")
+                images.pop(used[path][1], None)
+            else:
+                print(f"✓ Encoded {path}: {size} bytes")
+
+    # The rewrite depends on the images, so the per-page cache can't vouch for it
+    run_batch([ResponsiveImages(images, formats)], files=files, workers=args.workers, cache=None,
+              profile=args.profile, dry_run=args.dry_run,
+              updated='✓ Responsive images: {}')
+    if not args.dry_run:
+        if not args.files:
+            remove_stale(used)
+        save_cache(cache)
+
+
+if __name__ == '__main__':
+    main()
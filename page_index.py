@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Structural index of the regions the rewrite scripts care about
+
+One scan per page records the byte offsets of:
+    style           - each inline <style> block
+    navbar          - <nav class="navbar">
+    search_box      - the navbar search box (or the old search icon)
+    mobile_menu     - the <div class="mobile-menu"> slide-out menu
+    chart_script    - each inline <script> that builds a Chart
+    tailwind_config - the inline <script> that sets tailwind.config
+
+The offsets are kept on disk in .page-index.json, validated by stat, so a
+region-scoped transform (see scoped()) can decode and rewrite just its slice
+of a page instead of the whole 70 KB document.
+"""
+import functools
+import json
+import os
+import re
+
+from incremental_cache import stat_key
+from page_io import atomic_write_bytes, decode_page
+
+INDEX_FORMAT = 2
+
+DEFAULT_INDEX = '.page-index.json'
+
+REGIONS = ('style', 'navbar', 'search_box', 'mobile_menu', 'chart_script', 'tailwind_config')
+
+TAG_SOURCE = r'<(/?)(div|nav|style|script)\b([^>]*)>'
+CLASS_SOURCE = r'''class\s*=\s*["']([^"']*)["']'''
+
+PATTERNS = {
+    bytes: {
+        'tag': re.compile(TAG_SOURCE.encode(), re.IGNORECASE),
+        'class': re.compile(CLASS_SOURCE.encode(), re.IGNORECASE),
+        'src': re.compile(rb'\bsrc\s*=', re.IGNORECASE),
+        'chart': b'new Chart',
+        'tailwind': b'tailwind.config',
+        'gt': b'>',
+        'close': {'style': re.compile(rb'</style', re.IGNORECASE),
+                  'script': re.compile(rb'</script', re.IGNORECASE)},
+    },
+    str: {
+        'tag': re.compile(TAG_SOURCE, re.IGNORECASE),
+        'class': re.compile(CLASS_SOURCE, re.IGNORECASE),
+        'src': re.compile(r'\bsrc\s*=', re.IGNORECASE),
+        'chart': 'new Chart',
+        'tailwind': 'tailwind.config',
+        'gt': '>',
+        'close': {'style': re.compile(r'</style', re.IGNORECASE),
+                  'script': re.compile(r'</script', re.IGNORECASE)},
+    },
+}
+
+# Which region a <div> opens, by class name
+DIV_REGIONS = {
+    'mobile-menu': 'mobile_menu',
+    'search-box': 'search_box',
+    'search-icon': 'search_box',
+}
+
+
+def classes(attrs, patterns):
+    """Class names from a tag's attribute text, as str"""
+    match = patterns['class'].search(attrs)
+    if not match:
+        return []
+    value = match.group(1)
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'replace')
+    return value.split()
+
+
+def scan_regions(data):
+    """
+    Find every indexed region in a page (bytes or str).
+
+    Returns {region: [[start, end], ...]} with offsets in the same units as
+    data. <style> and <script> bodies are skipped, so markup inside JS
+    template strings is never mistaken for page structure.
+    """
+    patterns = PATTERNS[type(data)]
+    regions = {name: [] for name in REGIONS}
+    divs = []
+    nav_start = None
+    pos = 0
+
+    while True:
+        match = patterns['tag'].search(data, pos)
+        if not match:
+            break
+        closing, tag, attrs = match.groups()
+        tag = tag.lower() if isinstance(tag, str) else tag.lower().decode()
+        start, pos = match.span()
+
+        if tag in ('style', 'script'):
+            if closing:
+                continue
+            close = patterns['close'][tag].search(data, pos)
+            if not close:
+                break
+            end_tag = close.start()
+            end = data.find(patterns['gt'], end_tag) + 1
+            body = data[pos:end_tag]
+            if tag == 'style':
+                regions['style'].append([start, end])
+            elif not patterns['src'].search(attrs):
+                if patterns['chart'] in body:
+                    regions['chart_script'].append([start, end])
+                elif patterns['tailwind'] in body:
+                    regions['tailwind_config'].append([start, end])
+            pos = end
+        elif tag == 'nav':
+            if not closing and 'navbar' in classes(attrs, patterns):
+                nav_start = start
+            elif closing and nav_start is not None:
+                regions['navbar'].append([nav_start, pos])
+                nav_start = None
+        elif not closing:
+            region = next((DIV_REGIONS[c] for c in classes(attrs, patterns) if c in DIV_REGIONS), None)
+            divs.append((region, start))
+        elif divs:
+            region, div_start = divs.pop()
+            if region:
+                regions[region].append([div_start, pos])
+
+    for ranges in regions.values():
+        ranges.sort()
+    return regions
+
+
+def apply_in_regions(data, ranges, transform):
+    """
+    Run a str transform over each byte range of data.
+
+    Returns (new_data, edits) where edits is a list of (start, end, new_length)
+    in the original data's offsets, for shift_regions().
+    """
+    edits = []
+    pieces = []
+    last = 0
+    for start, end in ranges:
+        original = decode_page(data[start:end])
+        replaced = transform(original)
+        if replaced == original:
+            continue
+        encoded = replaced.encode('utf-8')
+        pieces.append(data[last:start])
+        pieces.append(encoded)
+        last = end
+        edits.append((start, end, len(encoded)))
+    if not edits:
+        return data, edits
+    pieces.append(data[last:])
+    return b''.join(pieces), edits
+
+
+def shift_regions(regions, edits):
+    """
+    Move region offsets past a set of edits, or None if a rescan is needed.
+
+    Regions after an edit shift, regions around it grow or shrink. A region
+    inside an edited range can't be tracked, so that asks for a rescan.
+    """
+    shifted = {}
+    for name, ranges in regions.items():
+        moved = []
+        for start, end in ranges:
+            new_start, new_end = start, end
+            for edit_start, edit_end, length in edits:
+                delta = length - (edit_end - edit_start)
+                if (edit_start, edit_end) == (start, end):
+                    new_end += delta
+                elif edit_end <= start:
+                    new_start += delta
+                    new_end += delta
+                elif start <= edit_start and edit_end <= end:
+                    new_end += delta
+                elif end <= edit_start:
+                    continue
+                else:
+                    return None
+            moved.append([new_start, new_end])
+        shifted[name] = moved
+    return shifted
+
+
+def region_ranges(regions, names):
+    """The ranges of several region types, merged in page order"""
+    return sorted(r for name in names for r in regions[name])
+
+
+def scoped(*names):
+    """
+    Decorator limiting a str transform to some regions of the page.
+
+    The batch runner uses the on-disk index to hand the transform only those
+    bytes; called directly on a whole page, the wrapper scans for the region
+    itself. The wrapper keeps the function's name so it can still be sent to
+    worker processes.
+    """
+    def decorate(transform):
+        @functools.wraps(transform)
+        def run(content):
+            pieces = []
+            last = 0
+            for start, end in region_ranges(scan_regions(content), names):
+                pieces.append(content[last:start])
+                pieces.append(transform(content[start:end]))
+                last = end
+            pieces.append(content[last:])
+            return ''.join(pieces)
+
+        run.regions = names
+        run.inner = transform
+        return run
+    return decorate
+
+
+def load_index(path):
+    """Load the region index, or start a fresh one if missing or unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('format') == INDEX_FORMAT:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {'format': INDEX_FORMAT, 'files': {}}
+
+
+def save_index(path, index):
+    """Write the index atomically"""
+    atomic_write_bytes(path, json.dumps(index, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+
+
+def lookup(index, filepath):
+    """Recorded regions for a file, if its stat hasn't changed since"""
+    entry = index['files'].get(filepath)
+    if entry is None:
+        return None
+    try:
+        if stat_key(os.stat(filepath)) != entry['stat']:
+            return None
+    except OSError:
+        return None
+    return entry['regions']
+
+
+def store(index, filepath, regions):
+    """Record a file's regions against its current stat"""
+    index['files'][filepath] = {'stat': stat_key(os.stat(filepath)), 'regions': regions}
+
+
+def build_index(files, path=DEFAULT_INDEX):
+    """Index every file that isn't already up to date; returns the index"""
+    index = load_index(path)
+    for filepath in files:
+        if lookup(index, filepath) is None:
+            with open(filepath, 'rb') as f:
+                store(index, filepath, scan_regions(f.read()))
+    save_index(path, index)
+    return index
+
+
+def main():
+    files = sorted(f for f in os.listdir('.') if f.endswith('.html'))
+    index = build_index(files)
+    for filepath in files:
+        regions = index['files'][filepath]['regions']
+        summary = ', '.join(f"{name} {len(regions[name])}" for name in REGIONS if regions[name])
+        print(f"✓ Indexed {filepath}: {summary or 'no regions'}")
+    print(f"\nCompleted: {len(files)} files indexed ({DEFAULT_INDEX})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Shared page I/O for the rewrite scripts
+
+Writes go to a temporary file in the same directory, are fsynced and then
+renamed over the target, so a crash or Ctrl-C never leaves a half-written page
+in the publish directory. Reads can go through mmap, so a page that contains
+none of a rule set's trigger strings is skipped without being decoded.
+"""
+import io
+import mmap
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+# Pages at least this big are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 64 * 1024
+
+
+@contextmanager
+def open_page(filepath):
+    """
+    Yield a read-only buffer over a page's bytes.
+
+    Large pages are memory-mapped; small ones (and empty files, which can't
+    be mapped) are simply read.
+    """
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            yield f.read()
+            return
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield view
+        finally:
+            view.close()
+
+
+def decode_page(data):
+    """Decode page bytes the way open(..., 'r', encoding='utf-8') would"""
+    return io.StringIO(bytes(data).decode('utf-8'), newline=None).read()
+
+
+def read_page(filepath):
+    """Read a page as text"""
+    with open_page(filepath) as data:
+        return decode_page(data)
+
+
+def trigger_regex(triggers):
+    """
+    Compile trigger strings into one bytes regex, or None.
+
+    None means "can't tell", i.e. every page must be processed.
+    """
+    if triggers is None:
+        return None
+    encoded = sorted({t.encode('utf-8') for t in triggers}, key=len, reverse=True)
+    if not encoded:
+        return None
+    return re.compile(b'|'.join(re.escape(t) for t in encoded))
+
+
+def has_trigger(data, regex):
+    """True if the page bytes contain any trigger (or there is no regex)"""
+    return regex is None or regex.search(data) is not None
+
+
+@contextmanager
+def atomic_writer(filepath, mode='wb', encoding=None, newline=None):
+    """
+    Yield a file that replaces filepath once the block completes.
+
+    Written via temp file + fsync + os.replace, so output can be streamed
+    without readers ever seeing it half-written; if the block raises, the
+    original is left as it was. Keeps the original file's permission bits;
+    a new file gets the ones open() would give it, not mkstemp's 0600.
+    """
+    directory = os.path.dirname(os.path.abspath(filepath))
+    try:
+        permissions = os.stat(filepath).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        permissions = 0o666 & ~umask
+
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(filepath)}.",
+                               suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, mode, encoding=encoding, newline=newline) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, permissions)
+        os.replace(tmp, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    fsync_directory(directory)
+
+
+def atomic_write_bytes(filepath, data):
+    """Replace filepath with data, atomically (see atomic_writer)"""
+    with atomic_writer(filepath) as f:
+        f.write(data)
+
+
+def fsync_directory(directory):
+    """Make a rename durable; not every platform can open a directory"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_page(filepath, content, original=None):
+    """
+    Atomically write page text, but only if it differs from original.
+
+    Returns the bytes written, or None when nothing changed.
+    """
+    if original is not None and content == original:
+        return None
+    data = content.encode('utf-8')
+    atomic_write_bytes(filepath, data)
+    return data
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Full theme refresh in one pass per file
+
+Runs the update_design, update_theme, fix_all_chart_colors, fix_buttons and
+fix_labels transforms in that order, in memory, with one read and at most one
+write per page. Consecutive rule tables are fused into a single compiled
+rewriter, and rules that can't affect the result (dead, or undone by a later
+script) are dropped before anything runs.
+"""
+from functools import lru_cache
+
+import fix_all_chart_colors
+import fix_buttons
+import fix_labels
+import update_design
+import update_theme
+from batch_runner import find_html_files, parse_args, run_or_watch
+from rewrite_engine import compile_rules, describe_findings, prune_rules, regex_rules
+
+
+def step(name, rules=None, transform=None, include=None, exclude=()):
+    """
+    Describe one pipeline step.
+
+    A step has either a rule table (fused with its neighbours) or a plain
+    transform function. include/exclude limit which files it applies to.
+    """
+    return {
+        'name': name,
+        'rules': rules,
+        'transform': transform,
+        'include': set(include) if include is not None else None,
+        'exclude': set(exclude),
+    }
+
+
+THEME_EXCLUDE = ('bmi-calculator.html',)
+
+# Same order as running the scripts one after another
+THEME_REFRESH = [
+    step('update_design', rules=update_design.DESIGN_RULES,
+         include=update_design.calculator_files),
+    step('update_theme',
+         rules=regex_rules(update_theme.COLOR_MAPPINGS) + regex_rules(update_theme.CHART_COLOR_MAPPINGS),
+         exclude=THEME_EXCLUDE),
+    step('update_theme.add_smooth_scroll', transform=update_theme.add_smooth_scroll,
+         exclude=THEME_EXCLUDE),
+    step('fix_all_chart_colors', transform=fix_all_chart_colors.update_chart_colors),
+    step('fix_buttons', rules=fix_buttons.BUTTON_RULES),
+    step('fix_labels', rules=fix_labels.LABEL_RULES),
+]
+
+PIPELINES = {
+    'theme': THEME_REFRESH,
+}
+
+
+def applies_to(pipeline_step, filename):
+    """Check a step's include/exclude lists against a file name"""
+    if filename in pipeline_step['exclude']:
+        return False
+    include = pipeline_step['include']
+    return include is None or filename in include
+
+
+def plan_key(steps, filename):
+    """Names of the steps that apply to a file, in order"""
+    return tuple(s['name'] for s in steps if applies_to(s, filename))
+
+
+def build_plan(steps):
+    """
+    Fuse a list of steps into transforms.
+
+    Returns (transforms, findings) where findings is a list of
+    (step_name, rule, reason, other_step_name, other_rule) from prune_rules().
+    """
+    transforms = []
+    findings = []
+    pending = []
+
+    def flush():
+        if not pending:
+            return
+        rules = [rule for _, rule in pending]
+        names = '+'.join(dict.fromkeys(name for name, _ in pending))
+        kept, pruned = prune_rules(rules)
+        for index, reason, other in pruned:
+            name, rule = pending[index]
+            other_name, other_rule = pending[other] if other is not None else (None, None)
+            findings.append((name, rule, reason, other_name, other_rule))
+        transforms.append(compile_rules(kept, name=names).apply)
+        pending.clear()
+
+    for s in steps:
+        if s['rules'] is not None:
+            pending.extend((s['name'], rule) for rule in s['rules'])
+        else:
+            flush()
+            transforms.append(s['transform'])
+    flush()
+    return transforms, findings
+
+
+@lru_cache(maxsize=None)
+def compiled_plan(pipeline, key):
+    """Compile the steps named in key, once per process"""
+    steps = [s for s in PIPELINES[pipeline] if s['name'] in key]
+    transforms, _ = build_plan(steps)
+    return transforms
+
+
+def theme_transforms(filepath):
+    """Transforms for one file in the theme refresh (picklable for the pool)"""
+    return compiled_plan('theme', plan_key(THEME_REFRESH, filepath))
+
+
+def main():
+    args = parse_args(__doc__)
+    files = args.files or find_html_files()
+
+    findings = []
+    for key in sorted({plan_key(THEME_REFRESH, f) for f in files}):
+        findings.extend(build_plan([s for s in THEME_REFRESH if s['name'] in key])[1])
+    if findings:
+        print("Rule analysis:")
+        describe_findings(findings)
+        print()
+
+    run_or_watch(theme_transforms, args, files=files,
+                 updated='✓ Refreshed: {}',
+                 unchanged='- No changes: {}',
+                 found='Found {} HTML files to refresh')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,673 @@
+#!/usr/bin/env python3
+"""
+Compile replacement tables into single-pass rewriters
+
+A table is an ordered list of rules, each one of:
+    ('literal', old, new)     - plain str.replace semantics
+    ('regex', pattern, new)   - re.sub semantics
+
+compile_rules() merges consecutive rules into one alternation regex with a
+dispatch table whenever doing so gives the same result as applying the rules
+one after another. Rules that could interact (one rule's match overlapping
+another's, or a later rule matching text produced by an earlier one) start a
+new stage, so the output matches the sequential order. See literals_conflict()
+for the one relaxation, which strict=True turns off.
+"""
+import re
+import time
+
+WHITESPACE = re.compile(r'\s')
+
+# Escapes that stand for a single literal character in our simple patterns
+LITERAL_ESCAPES = set('()[]{}.*+?^$|\\/\'"-#: ,;%!=<>&@')
+
+
+def literal_rule(old, new):
+    """Build a str.replace rule"""
+    return ('literal', old, new)
+
+
+def regex_rule(pattern, new):
+    """Build a re.sub rule"""
+    return ('regex', pattern, new)
+
+
+def literal_rules(mapping):
+    """Turn an {old: new} dict into an ordered list of literal rules"""
+    return [literal_rule(old, new) for old, new in mapping.items()]
+
+
+def regex_rules(mapping):
+    """Turn a {pattern: new} dict into an ordered list of regex rules"""
+    return [regex_rule(pattern, new) for pattern, new in mapping.items()]
+
+
+def rule_trigger(rule):
+    """
+    A literal string every match of the rule must contain, or None.
+
+    Used to skip pages without decoding them. Newlines are avoided because
+    pages are searched as raw bytes, before \r\n is normalised.
+    """
+    kind, pattern, _ = rule
+    if kind == 'literal':
+        runs = [pattern]
+    else:
+        tokens = tokenize_pattern(pattern)
+        if not tokens:
+            return None
+        runs = ''.join('\0' if t == 'WS' else t for t in tokens).split('\0')
+    runs = [run for run in runs if run and '\n' not in run and '\r' not in run]
+    return max(runs, key=len) if runs else None
+
+
+def tokenize_pattern(pattern):
+    """
+    Split a regex into literal characters and whitespace runs.
+
+    Returns a list of tokens, each either a single literal character or the
+    marker 'WS' for \\s* / \\s+ / \\s. Returns None when the pattern uses any
+    other regex feature, in which case the rule is never merged.
+    """
+    tokens = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            if i + 1 >= len(pattern):
+                return None
+            escaped = pattern[i + 1]
+            if escaped == 's':
+                i += 2
+                if i < len(pattern) and pattern[i] in '*+':
+                    i += 1
+                tokens.append('WS')
+                continue
+            if escaped in LITERAL_ESCAPES:
+                tokens.append(escaped)
+                i += 2
+                continue
+            return None
+        if char in '()[]{}.*+?^$|':
+            return None
+        tokens.append(char)
+        i += 1
+    return tokens
+
+
+def rule_shape(rule):
+    """
+    Describe what a rule can match and produce, for conflict checks.
+
+    Returns None for rules that are too general to analyse.
+    """
+    kind, pattern, replacement = rule
+    if kind == 'literal':
+        tokens = list(pattern)
+    else:
+        if '\\' in replacement:
+            return None
+        tokens = tokenize_pattern(pattern)
+    if not tokens:
+        return None
+
+    def is_space(token):
+        return token == 'WS' or token.isspace()
+
+    stripped = ''.join(t for t in tokens if t != 'WS' and not t.isspace())
+    if not stripped or not replacement:
+        return None
+
+    return {
+        'stripped': stripped,
+        'starts_ws': is_space(tokens[0]),
+        'ends_ws': is_space(tokens[-1]),
+        'has_ws': any(is_space(t) for t in tokens),
+        'output': WHITESPACE.sub('', replacement),
+        'output_starts_ws': replacement[0].isspace(),
+        'output_ends_ws': replacement[-1].isspace(),
+        'output_all_ws': replacement.isspace(),
+    }
+
+
+def strings_overlap(a, b):
+    """True if a and b can share characters when placed in the same text"""
+    if not a or not b:
+        return False
+    if a in b or b in a:
+        return True
+    for size in range(1, min(len(a), len(b))):
+        if a.endswith(b[:size]) or b.endswith(a[:size]):
+            return True
+    return False
+
+
+def self_overlaps(text):
+    """True if two occurrences of text can overlap (e.g. 'aa' in 'aaa')"""
+    return any(text.endswith(text[:size]) for size in range(1, len(text)))
+
+
+def kept_overlap(first, first_new, second, second_new):
+    """
+    True if `first` ending where `second` starts can only share characters
+    that both rules write back unchanged (e.g. the quote in '#A'#B').
+    """
+    for size in range(1, min(len(first), len(second))):
+        if not first.endswith(second[:size]):
+            continue
+        shared = second[:size]
+        if not (first_new.endswith(shared) and second_new.startswith(shared)):
+            return False
+    return True
+
+
+def literals_overlap(old_a, new_a, old_b, new_b, strict):
+    """
+    Overlap test for literal rules, optionally ignoring kept delimiters.
+
+    A shared edge is ignored when it appears in old_a/new_a and old_b/new_b
+    alike, i.e. neither rule changes it.
+    """
+    if not strings_overlap(old_a, old_b):
+        return False
+    if strict or old_a in old_b or old_b in old_a:
+        return True
+    return not (kept_overlap(old_a, new_a, old_b, new_b)
+                and kept_overlap(old_b, new_b, old_a, new_a))
+
+
+def literals_conflict(earlier, later, strict=False):
+    """
+    Conflict check for two str.replace rules.
+
+    Outside strict mode, matches that only share a delimiter both rules keep
+    (the quote in '#A'#B') are allowed to merge. Sequential calls would rewrite
+    both colours there and the merged pass only the first, but that text
+    cannot occur in valid CSS or JS.
+    """
+    _, old_a, new_a = earlier
+    _, old_b, new_b = later
+    if not old_a or not old_b or not new_a:
+        return True
+    if literals_overlap(old_a, new_a, old_b, new_b, strict):
+        return True
+    # The later rule matching inside or across the earlier rule's output is
+    # only safe where it would also have matched the original text
+    return literals_overlap(new_a, old_a, old_b, new_b, strict)
+
+
+def rules_conflict(earlier, later, strict=False):
+    """
+    True if applying `earlier` then `later` could differ from one merged pass.
+
+    Matches are compared with whitespace stripped, which is conservative: two
+    matches that overlap in the text always overlap once whitespace is removed,
+    except when the shared part is pure whitespace, which is checked separately.
+    """
+    if earlier[0] == later[0] == 'literal':
+        return literals_conflict(earlier, later, strict)
+
+    a = rule_shape(earlier)
+    b = rule_shape(later)
+    if a is None or b is None:
+        return True
+
+    # The two matches could overlap in the input
+    if strings_overlap(a['stripped'], b['stripped']):
+        return True
+    if (a['ends_ws'] and b['starts_ws']) or (b['ends_ws'] and a['starts_ws']):
+        return True
+
+    # The later rule could match text written by the earlier one
+    if strings_overlap(b['stripped'], a['output']):
+        return True
+    if a['output_ends_ws'] and b['starts_ws']:
+        return True
+    if a['output_starts_ws'] and b['ends_ws']:
+        return True
+    if a['output_all_ws'] and b['has_ws']:
+        return True
+
+    return False
+
+
+def plan_stages(rules, strict=False):
+    """Group rules into stages that can each run as a single pass"""
+    stages = []
+    current = []
+    for rule in rules:
+        if any(rules_conflict(previous, rule, strict) for previous in current):
+            stages.append(current)
+            current = []
+        current.append(rule)
+    if current:
+        stages.append(current)
+    return stages
+
+
+def split_stages(rules, sizes):
+    """Cut a rule list into consecutive stages of the given sizes"""
+    if sum(sizes) != len(rules):
+        raise ValueError(f"stage plan covers {sum(sizes)} rules, table has {len(rules)}")
+    stages = []
+    start = 0
+    for size in sizes:
+        stages.append(rules[start:start + size])
+        start += size
+    return stages
+
+
+def rule_regex(rule):
+    """Regex source for a single rule"""
+    kind, pattern, _ = rule
+    return re.escape(pattern) if kind == 'literal' else pattern
+
+
+def branch_regex(rule):
+    """
+    One alternation branch for a rule, wrapped in a group for dispatch.
+
+    The first literal character is kept outside the group: when every branch
+    starts with a literal, re can skip ahead on that character set instead of
+    trying every branch at every position, which is many times faster.
+    """
+    source = rule_regex(rule)
+    tokens = rule_tokens(rule)
+    if tokens and tokens[0] != 'WS':
+        size = 2 if source[0] == '\\' else 1
+        return f'{source[:size]}({source[size:]})'
+    return f'({source})'
+
+
+def compile_stage(stage):
+    """
+    Compile one stage into two functions taking content.
+
+    The first returns the rewritten content; the second, used when profiling,
+    returns (content, substitutions per rule in the stage).
+    """
+    if len(stage) == 1:
+        kind, pattern, replacement = stage[0]
+        if kind == 'literal':
+            def counted(content):
+                hits = content.count(pattern)
+                return (content.replace(pattern, replacement) if hits else content), [hits]
+            return (lambda content: content.replace(pattern, replacement)), counted
+        compiled = re.compile(pattern)
+
+        def counted(content):
+            content, hits = compiled.subn(replacement, content)
+            return content, [hits]
+        return (lambda content: compiled.sub(replacement, content)), counted
+
+    if all(kind == 'literal' for kind, _, _ in stage):
+        table = {pattern: replacement for _, pattern, replacement in stage}
+        position = {pattern: i for i, (_, pattern, _) in enumerate(stage)}
+        compiled = re.compile('|'.join(re.escape(p) for _, p, _ in stage))
+
+        def counted(content):
+            hits = [0] * len(stage)
+
+            def dispatch(m):
+                hits[position[m.group(0)]] += 1
+                return table[m.group(0)]
+            return compiled.sub(dispatch, content), hits
+        return (lambda content: compiled.sub(lambda m: table[m.group(0)], content)), counted
+
+    # Merged stages only hold group-free patterns, so group N is rule N
+    replacements = [None] + [replacement for _, _, replacement in stage]
+    compiled = re.compile('|'.join(branch_regex(rule) for rule in stage))
+
+    def counted(content):
+        hits = [0] * len(stage)
+
+        def dispatch(m):
+            hits[m.lastindex - 1] += 1
+            return replacements[m.lastindex]
+        return compiled.sub(dispatch, content), hits
+    return (lambda content: compiled.sub(lambda m: replacements[m.lastindex], content)), counted
+
+
+# Every Rewriter built by compile_rules(), for the profile table
+REGISTRY = []
+
+PROFILING = {'enabled': False}
+
+
+def enable_profiling():
+    """Count substitutions and time every pass from now on (per process)"""
+    PROFILING['enabled'] = True
+
+
+class Rewriter:
+    """
+    A rule table compiled into as few passes as possible.
+
+    Patterns are compiled once, here. stage_sizes, if given, is a stage plan
+    saved from an earlier plan_stages() call on the same rules (see
+    rule_files), so the conflict analysis is skipped. When profiling is
+    enabled, apply() also keeps per-rule substitution and file counts and
+    per-pass timings in self.stats.
+    """
+
+    def __init__(self, rules, strict=False, name=None, stage_sizes=None):
+        self.name = name or 'rules'
+        self.rules = list(rules)
+        if stage_sizes is None:
+            self.stages = plan_stages(self.rules, strict)
+        else:
+            self.stages = split_stages(self.rules, stage_sizes)
+        compiled = [compile_stage(stage) for stage in self.stages]
+        self.passes = [fast for fast, _ in compiled]
+        self.counted_passes = [counted for _, counted in compiled]
+        triggers = [rule_trigger(rule) for rule in self.rules]
+        self.triggers = None if None in triggers else triggers
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the profiling counters"""
+        self.calls = 0
+        # One [substitutions, files, seconds] entry per rule, in stage order
+        self.stats = [[0, 0, 0.0] for stage in self.stages for _ in stage]
+
+    def apply(self, content):
+        """Rewrite content, equivalent to applying every rule in order"""
+        if PROFILING['enabled']:
+            return self.apply_profiled(content)
+        for rewrite in self.passes:
+            content = rewrite(content)
+        return content
+
+    def apply_profiled(self, content):
+        """apply(), recording hits and time; rules sharing a pass share its time"""
+        self.calls += 1
+        offset = 0
+        for stage, rewrite in zip(self.stages, self.counted_passes):
+            started = time.perf_counter()
+            content, hits = rewrite(content)
+            elapsed = time.perf_counter() - started
+            for i, count in enumerate(hits):
+                entry = self.stats[offset + i]
+                entry[0] += count
+                entry[1] += 1 if count else 0
+                entry[2] += elapsed
+            offset += len(stage)
+        return content
+
+    def rule_stats(self):
+        """(rule, pass size, substitutions, files, seconds) for every rule"""
+        rows = []
+        rules = [(rule, len(stage)) for stage in self.stages for rule in stage]
+        for (rule, shared), (hits, files, seconds) in zip(rules, self.stats):
+            rows.append((rule, shared, hits, files, seconds))
+        return rows
+
+    def __call__(self, content):
+        return self.apply(content)
+
+    def __repr__(self):
+        return f"<Rewriter {self.name}: {len(self.rules)} rules in {len(self.stages)} passes>"
+
+
+def compile_rules(rules, strict=False, name=None, stage_sizes=None):
+    """Compile an ordered rule list into a Rewriter and register it"""
+    rewriter = Rewriter(rules, strict, name, stage_sizes)
+    REGISTRY.append(rewriter)
+    return rewriter
+
+
+def transform_triggers(transforms):
+    """
+    Trigger strings for a list of transforms, or None if any is unknown.
+
+    Rewriter.apply knows its own; plain functions may declare a `triggers`
+    attribute listing strings without which they never change a page.
+    """
+    triggers = []
+    for transform in transforms:
+        owner = getattr(transform, '__self__', None)
+        found = owner.triggers if isinstance(owner, Rewriter) else getattr(transform, 'triggers', None)
+        if found is None:
+            return None
+        triggers.extend(found)
+    return triggers
+
+
+def collect_stats(reset=False, one_file=False):
+    """
+    Snapshot the counters of every registered Rewriter.
+
+    Returns {(name, kind, pattern): [substitutions, files, seconds, shared]},
+    a plain dict that can be sent back from a worker process and merged.
+    one_file says the counters cover a single page, so a rule counts as one
+    file even when a scoped transform ran it once per region.
+    """
+    totals = {}
+    for rewriter in REGISTRY:
+        if not rewriter.calls:
+            continue
+        for (kind, pattern, _), shared, hits, files, seconds in rewriter.rule_stats():
+            entry = totals.setdefault((rewriter.name, kind, pattern), [0, 0, 0.0, shared])
+            entry[0] += hits
+            entry[1] += min(files, 1) if one_file else files
+            entry[2] += seconds
+            entry[3] = max(entry[3], shared)
+        if reset:
+            rewriter.reset_stats()
+    return totals
+
+
+def merge_stats(totals, more):
+    """Add one collect_stats() snapshot into another"""
+    for key, (hits, files, seconds, shared) in more.items():
+        entry = totals.setdefault(key, [0, 0, 0.0, shared])
+        entry[0] += hits
+        entry[1] += files
+        entry[2] += seconds
+        entry[3] = max(entry[3], shared)
+    return totals
+
+
+def print_profile(totals, width=60):
+    """Print the per-rule profile table, slowest first"""
+    if not totals:
+        return
+    print(f"\n{'Rule':<{width}} {'Subs':>7} {'Files':>6} {'ms':>9}  Pass")
+    print("-" * (width + 34))
+    rows = sorted(totals.items(), key=lambda item: (-item[1][2], item[0]))
+    for (name, kind, pattern), (hits, files, seconds, shared) in rows:
+        label = f"{name}: {pattern}".replace('\n', ' ')
+        if len(label) > width:
+            label = label[:width - 3] + '...'
+        shared_note = f"shared x{shared}" if shared > 1 else "own"
+        dead = "  (no hits)" if not hits else ""
+        print(f"{label:<{width}} {hits:>7} {files:>6} {seconds * 1000:>9.2f}  {shared_note}{dead}")
+    unused = sum(1 for hits, _, _, _ in totals.values() if not hits)
+    print(f"\n{len(totals)} rules, {unused} with no hits this run")
+
+
+def print_rule_counts(totals, width=60):
+    """Print substitutions and files per rule, for rules that matched"""
+    rows = sorted(((key, entry) for key, entry in totals.items() if entry[0]),
+                  key=lambda item: (-item[1][0], item[0]))
+    if not rows:
+        return
+    print(f"\n{'Rule':<{width}} {'Subs':>7} {'Files':>6}")
+    print("-" * (width + 15))
+    for (name, kind, pattern), (hits, files, _, _) in rows:
+        label = f"{name}: {pattern}".replace('\n', ' ')
+        if len(label) > width:
+            label = label[:width - 3] + '...'
+        print(f"{label:<{width}} {hits:>7} {files:>6}")
+
+
+def apply_sequentially(rules, content):
+    """Reference implementation: apply each rule one after another"""
+    for kind, pattern, replacement in rules:
+        if kind == 'literal':
+            content = content.replace(pattern, replacement)
+        else:
+            content = re.sub(pattern, replacement, content)
+    return content
+
+
+def leaves_no_matches(rule):
+    """True if, after the rule has run, no text it matches can remain"""
+    shape = rule_shape(rule)
+    if shape is None:
+        return False
+    if strings_overlap(shape['stripped'], shape['output']):
+        return False
+    if shape['output_ends_ws'] and shape['starts_ws']:
+        return False
+    if shape['output_starts_ws'] and shape['ends_ws']:
+        return False
+    return not shape['output_all_ws']
+
+
+def may_produce(rule, target):
+    """True if rule's output could create a new match for target"""
+    return rules_conflict(rule, target, strict=True)
+
+
+def rule_tokens(rule):
+    """Token list for a rule, or None if it is not a simple pattern"""
+    kind, pattern, _ = rule
+    return list(pattern) if kind == 'literal' else tokenize_pattern(pattern)
+
+
+def contains_tokens(tokens, needle):
+    """True if every match of `tokens` contains a match of `needle`"""
+    size = len(needle)
+    for start in range(len(tokens) - size + 1):
+        window = tokens[start:start + size]
+        if all(token_covers(n, t) for n, t in zip(needle, window)):
+            return True
+    return False
+
+
+def token_covers(needle, token):
+    """True if whatever `token` matches is also matched by `needle`"""
+    if needle == 'WS':
+        return token == 'WS' or token.isspace()
+    return needle == token
+
+
+def is_dead(rules, index):
+    """
+    Find an earlier rule that removes everything rules[index] needs.
+
+    Returns the index of that rule, or None. A rule is dead when each of its
+    matches must contain a match of an earlier rule that leaves none behind,
+    and nothing in between could write that text back.
+    """
+    tokens = rule_tokens(rules[index])
+    if not tokens:
+        return None
+    for earlier in range(index - 1, -1, -1):
+        needle = rule_tokens(rules[earlier])
+        if (needle and contains_tokens(tokens, needle)
+                and leaves_no_matches(rules[earlier])
+                and not any(may_produce(rules[k], rules[earlier])
+                            for k in range(earlier + 1, index))):
+            return earlier
+    return None
+
+
+def undone_by(rules, index):
+    """
+    Find a later literal rule that exactly reverts rules[index].
+
+    A then its inverse B is the same as B alone, provided nothing between
+    them interacts with either. Returns the index of B, or None.
+    """
+    kind, old, new = rules[index]
+    if kind != 'literal' or strings_overlap(old, new):
+        return None
+    if self_overlaps(old) or self_overlaps(new):
+        return None
+    for later in range(index + 1, len(rules)):
+        if rules[later] == ('literal', new, old):
+            between = rules[index + 1:later]
+            if all(not rules_conflict(rules[index], c, strict=True)
+                   and not rules_conflict(c, rules[index], strict=True)
+                   and not rules_conflict(c, rules[later], strict=True)
+                   for c in between):
+                return later
+            return None
+    return None
+
+
+def partially_reverted_by(rules, index):
+    """
+    Find later literal rules that put back what rules[index] changed, in
+    some context. These can't be dropped, but they are worth knowing about.
+    """
+    kind, old, new = rules[index]
+    if kind != 'literal' or not new:
+        return []
+    found = []
+    for later in range(index + 1, len(rules)):
+        kind_b, old_b, new_b = rules[later]
+        if kind_b != 'literal' or (old_b, new_b) == (new, old):
+            continue
+        if new in old_b and old_b.replace(new, old) == new_b:
+            found.append(later)
+    return found
+
+
+def prune_rules(rules):
+    """
+    Drop rules that can't affect the result.
+
+    Returns (kept_rules, findings) where findings is a list of
+    (index, reason, other_index) tuples; reason is 'no-op', 'dead' (an earlier
+    rule already removed everything it matches), 'undone' (a later rule
+    reverts it exactly) or 'partly-undone' (kept, reported only).
+    """
+    rules = list(rules)
+    findings = []
+    dropped = set()
+    for index, (kind, old, new) in enumerate(rules):
+        if kind == 'literal' and old == new:
+            findings.append((index, 'no-op', None))
+            dropped.add(index)
+            continue
+        earlier = is_dead(rules, index)
+        if earlier is not None:
+            findings.append((index, 'dead', earlier))
+            dropped.add(index)
+            continue
+        later = undone_by(rules, index)
+        if later is not None:
+            findings.append((index, 'undone', later))
+            dropped.add(index)
+            continue
+        for later in partially_reverted_by(rules, index):
+            findings.append((index, 'partly-undone', later))
+
+    kept = [rule for index, rule in enumerate(rules) if index not in dropped]
+    return kept, findings
+
+
+def describe_findings(findings):
+    """
+    Print what rule analysis dropped or flagged.
+
+    findings are (name, rule, reason, other_name, other_rule) tuples, where
+    name says which table (script, rule file) a rule came from.
+    """
+    seen = set()
+    for name, rule, reason, other_name, other_rule in findings:
+        line = (name, rule[1], reason)
+        if line in seen:
+            continue
+        seen.add(line)
+        if reason == 'no-op':
+            print(f"  dropped {name} {rule[1]!r}: replaces text with itself")
+        elif reason == 'dead':
+            print(f"  dropped {name} {rule[1]!r}: never matches after {other_name} {other_rule[1]!r}")
+        elif reason == 'undone':
+            print(f"  dropped {name} {rule[1]!r}: reverted by {other_name} {other_rule[1]!r}")
+        else:
+            print(f"  warning: {other_name} {other_rule[1]!r} partly reverts {name} {rule[1]!r}")
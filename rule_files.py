@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Declarative rule files for the rewrite engine
+
+A rule file (TOML or JSON) holds one ordered rule set:
+
+    name = "fix_labels"
+    description = "Fix label colors that should remain as gray"
+    order = 50                          # rule sets run in (order, name) order
+    include = ["*.html"]                # file globs, default every page
+    exclude = ["bmi-calculator.html"]
+
+    [[rules]]
+    literal = "color: #8B8589;"
+    new = "color: #6B7280;"
+
+    [[rules]]
+    regex = 'box-shadow:\\s*0\\s+4px'
+    new = "box-shadow: 0 4px"
+
+For each page, the rule sets that apply to it are concatenated, pruned and
+compiled into one Rewriter. The rule analysis (pruning and the stage plan) is
+the slow part of compiling, so its result is cached in .rule-cache.json keyed
+by a hash of the rule files and the engine source; later runs only compile
+the final regexes.
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import tomllib
+from functools import lru_cache
+
+import rewrite_engine
+from incremental_cache import register_source
+from page_io import atomic_write_bytes
+from rewrite_engine import compile_rules, plan_stages, prune_rules
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules')
+
+RULE_CACHE_FORMAT = 1
+
+DEFAULT_RULE_CACHE = '.rule-cache.json'
+
+# Cached plans kept per cache file (one per rule set combination in use)
+MAX_PLANS = 64
+
+RULE_EXTENSIONS = ('.toml', '.json')
+
+
+def rule_path(filename):
+    """Path of a rule file shipped in rules/"""
+    return os.path.join(RULES_DIR, filename)
+
+
+def parse_rule(entry, where):
+    """Turn one [[rules]] entry into a ('literal'|'regex', old, new) tuple"""
+    kinds = [kind for kind in ('literal', 'regex') if kind in entry]
+    if len(kinds) != 1 or 'new' not in entry:
+        raise ValueError(f"{where}: a rule needs exactly one of 'literal' or 'regex', plus 'new'")
+    unknown = set(entry) - {'literal', 'regex', 'new'}
+    if unknown:
+        raise ValueError(f"{where}: unknown rule keys {sorted(unknown)}")
+    kind = kinds[0]
+    if kind == 'regex':
+        try:
+            re.compile(entry['regex'])
+        except re.error as e:
+            raise ValueError(f"{where}: bad regex {entry['regex']!r}: {e}") from None
+    return (kind, entry[kind], entry['new'])
+
+
+def load_rule_file(path):
+    """
+    Read and validate one rule file.
+
+    Returns a dict with name, description, order, include, exclude, rules,
+    path and digest (hash of the file's bytes). Errors are ValueError.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        if path.endswith('.json'):
+            data = json.loads(raw)
+        else:
+            data = tomllib.loads(raw.decode('utf-8'))
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+    rules = [parse_rule(entry, f"{path} rule {i + 1}")
+             for i, entry in enumerate(data.get('rules', []))]
+    register_source(path)
+    return {
+        'name': data.get('name') or os.path.splitext(os.path.basename(path))[0],
+        'description': data.get('description', ''),
+        'order': data.get('order', 0),
+        'include': list(data.get('include', ['*'])),
+        'exclude': list(data.get('exclude', [])),
+        'rules': rules,
+        'path': path,
+        'digest': hashlib.blake2b(raw, digest_size=16).hexdigest(),
+    }
+
+
+def find_rule_files(paths):
+    """Expand directories into the rule files they contain"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(os.path.join(path, f) for f in sorted(os.listdir(path))
+                         if f.endswith(RULE_EXTENSIONS))
+        else:
+            found.append(path)
+    return found
+
+
+def load_rule_sets(paths):
+    """Load rule files (or directories of them) in run order"""
+    rule_sets = [load_rule_file(path) for path in find_rule_files(paths)]
+    return sorted(rule_sets, key=lambda rule_set: (rule_set['order'], rule_set['name']))
+
+
+def applies_to(rule_set, filepath):
+    """Check a rule set's include/exclude globs against a file name"""
+    filename = os.path.basename(filepath)
+    if any(fnmatch.fnmatch(filename, pattern) for pattern in rule_set['exclude']):
+        return False
+    return any(fnmatch.fnmatch(filename, pattern) for pattern in rule_set['include'])
+
+
+def engine_version():
+    """Hash of the engine source, so a changed planner invalidates the cache"""
+    with open(rewrite_engine.__file__, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def plan_cache_key(rule_sets):
+    """Cache key for a combination of rule sets"""
+    digest = hashlib.blake2b(engine_version().encode(), digest_size=16)
+    for rule_set in rule_sets:
+        digest.update(rule_set['digest'].encode())
+    return digest.hexdigest()
+
+
+def load_rule_cache(path):
+    """Load cached rule plans, or start fresh if missing, unreadable or None"""
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get('format') == RULE_CACHE_FORMAT:
+                return cache
+        except (OSError, ValueError):
+            pass
+    return {'format': RULE_CACHE_FORMAT, 'plans': {}}
+
+
+def save_rule_cache(path, cache):
+    """Write the rule cache atomically, keeping the newest MAX_PLANS plans"""
+    plans = cache['plans']
+    for key in list(plans)[:-MAX_PLANS]:
+        del plans[key]
+    atomic_write_bytes(path, json.dumps(cache, separators=(',', ':')).encode('utf-8'))
+
+
+def analyse(rule_sets):
+    """
+    Prune and plan the concatenated rules of some rule sets.
+
+    Returns a JSON-friendly plan: {'rules', 'stages', 'findings'} where
+    stages are the stage sizes and findings are describe_findings() tuples.
+    """
+    pending = [(rule_set['name'], rule) for rule_set in rule_sets for rule in rule_set['rules']]
+    kept, pruned = prune_rules([rule for _, rule in pending])
+    findings = []
+    for index, reason, other in pruned:
+        name, rule = pending[index]
+        other_name, other_rule = pending[other] if other is not None else (None, None)
+        findings.append((name, rule, reason, other_name, other_rule))
+    stages = [len(stage) for stage in plan_stages(kept)]
+    return {'rules': kept, 'stages': stages, 'findings': findings}
+
+
+def plan_for(rule_sets, cache):
+    """A rule set combination's plan, from cache or freshly analysed"""
+    key = plan_cache_key(rule_sets)
+    plan = cache['plans'].get(key)
+    if plan is None:
+        plan = analyse(rule_sets)
+        cache['plans'][key] = plan
+    else:
+        # Keep recently used plans at the end, away from eviction
+        cache['plans'][key] = cache['plans'].pop(key)
+    return plan
+
+
+def compile_plan(rule_sets, plan):
+    """Build the Rewriter for a plan without redoing the analysis"""
+    rules = [tuple(rule) for rule in plan['rules']]
+    name = '+'.join(rule_set['name'] for rule_set in rule_sets)
+    return compile_rules(rules, name=name, stage_sizes=plan['stages'])
+
+
+@lru_cache(maxsize=None)
+def loaded_rule_sets(paths, cache_path):
+    """Rule sets, plan cache and compiled rewriters, once per process"""
+    return {
+        'rule_sets': load_rule_sets(paths),
+        'cache': load_rule_cache(cache_path),
+        'rewriters': {},
+        'findings': {},
+    }
+
+
+class RuleSetTransforms:
+    """
+    Per-file transforms for run_batch() from a list of rule files.
+
+    Picklable: workers get the paths and load the rule sets once per process,
+    reading the plans the parent saved in prepare().
+    """
+
+    def __init__(self, paths, cache=DEFAULT_RULE_CACHE):
+        self.paths = tuple(paths)
+        self.cache_path = cache
+
+    def load(self):
+        """This process's loaded state for these rule files"""
+        return loaded_rule_sets(self.paths, self.cache_path)
+
+    def rule_sets_for(self, filepath):
+        """Indices of the rule sets that apply to a file, in run order"""
+        rule_sets = self.load()['rule_sets']
+        return tuple(i for i, rule_set in enumerate(rule_sets) if applies_to(rule_set, filepath))
+
+    def rewriter(self, key):
+        """The compiled Rewriter for a combination of rule sets"""
+        loaded = self.load()
+        rewriter = loaded['rewriters'].get(key)
+        if rewriter is None:
+            rule_sets = [loaded['rule_sets'][i] for i in key]
+            plan = plan_for(rule_sets, loaded['cache'])
+            rewriter = compile_plan(rule_sets, plan)
+            loaded['rewriters'][key] = rewriter
+            loaded['findings'][key] = plan['findings']
+        return rewriter
+
+    def prepare(self, files):
+        """
+        Analyse every rule set combination the files need, once, and save
+        the plans so worker processes only load them. Returns the findings.
+        """
+        findings = []
+        for key in sorted({self.rule_sets_for(f) for f in files}):
+            if key:
+                self.rewriter(key)
+                findings.extend(self.load()['findings'][key])
+        if self.cache_path:
+            save_rule_cache(self.cache_path, self.load()['cache'])
+        return findings
+
+    def __call__(self, filepath):
+        key = self.rule_sets_for(filepath)
+        return [self.rewriter(key).apply] if key else []
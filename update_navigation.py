@@ -1,64 +1,49 @@
 #!/usr/bin/env python3
 """
-Update navigation links to point to new calculator pages
+Regenerate the mobile menu on every page from nav_manifest.py
+
+Each page gets the menu of its variant in nav_manifest.MENU_PAGES.
 """
+import functools
 import os
-import re
 
-# Navigation link updates - from placeholder to actual pages
-NAV_UPDATES = {
-    '<a href="#" class="mobile-menu-item placeholder">Auto Loan Calculator</a>':
-        '<a href="auto-loan-calculator.html" class="mobile-menu-item">Auto Loan Calculator</a>',
+from batch_runner import main_for
+from nav_manifest import MENU_PAGES, SITEMAP, DEFAULT_VARIANT, MENU_VARIANTS, render_menu, sitemap_drift
+from page_index import scoped
 
-    '<a href="#" class="mobile-menu-item placeholder">Payment Calculator</a>':
-        '<a href="payment-calculator.html" class="mobile-menu-item">Payment Calculator</a>',
 
-    '<a href="#" class="mobile-menu-item placeholder">Amortization Calculator</a>':
-        '<a href="amortization-calculator.html" class="mobile-menu-item">Amortization Calculator</a>',
+@functools.lru_cache(maxsize=None)
+def menu_transform(variant):
+    """A transform replacing the mobile menu with the variant's, once per process"""
+    menu = render_menu(MENU_VARIANTS[variant])
 
-    '<a href="#" class="mobile-menu-item placeholder">Inflation Calculator</a>':
-        '<a href="inflation-calculator.html" class="mobile-menu-item">Inflation Calculator</a>',
-}
+    @scoped('mobile_menu')
+    def update_navigation(content):
+        """Replace the mobile menu with the one rendered from the manifest"""
+        return menu
+    return update_navigation
 
-def update_navigation(content):
-    """Update navigation links from placeholders to actual pages"""
-    for old_link, new_link in NAV_UPDATES.items():
-        content = content.replace(old_link, new_link)
-    return content
 
-def process_file(filepath):
-    """Process a single HTML file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+class PageMenus:
+    """Per-file transforms for run_batch(): each page's menu variant"""
 
-        original = content
-        content = update_navigation(content)
+    def __call__(self, filepath):
+        return [menu_transform(MENU_PAGES.get(os.path.basename(filepath), DEFAULT_VARIANT))]
 
-        if content != original:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            return True
-        return False
-    except Exception as e:
-        print(f"Error processing {filepath}: {e}")
-        return False
 
 def main():
-    # Get all HTML files in current directory
-    html_files = [f for f in os.listdir('.') if f.endswith('.html')]
-
-    print(f"Found {len(html_files)} HTML files to update")
-
-    updated = 0
-    for filename in sorted(html_files):
-        if process_file(filename):
-            print(f"✓ Updated navigation: {filename}")
-            updated += 1
-        else:
-            print(f"- No changes needed: {filename}")
-
-    print(f"\nCompleted: {updated}/{len(html_files)} files updated")
+    if os.path.exists(SITEMAP):
+        missing, unlisted = sitemap_drift()
+        for slug in missing:
+            print(f"Warning: {slug} is in the menu but not in {SITEMAP}")
+        for slug in unlisted:
+            print(f"Warning: {slug} is in {SITEMAP} but not in the menu")
+        print()
+
+    main_for(PageMenus(), __doc__,
+             updated='✓ Updated navigation: {}',
+             unchanged='- No changes needed: {}',
+             found='Found {} HTML files to update')
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Update sitemap.xml from the published pages, moving lastmod only on real changes
+
+Each page's lastmod comes from a hash of its <body> with comments and all
+whitespace removed, so re-indenting, minifying or re-wrapping a page (what
+most of the batch scripts do) leaves its date alone, while a changed word,
+link or attribute moves it to today (or --date).
+
+The hashes and dates live in .sitemap-state.json; commit it alongside
+sitemap.xml. It holds nothing machine-specific, so it only changes when a
+page does. Without it, the first run records the current hashes and keeps
+the dates already in the sitemap.
+
+sitemap.xml is rewritten in one streamed pass: comments, ordering and each
+entry's changefreq and priority are kept, entries for pages that no longer
+exist (and repeated entries) are dropped, and published pages missing from
+it are added at the end. Drafts and fragments in check_links.UNLISTED are
+never listed.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import re
+
+from build_dist import find_publish_files
+from check_links import UNLISTED
+from incremental_cache import content_hash
+from nav_manifest import SITEMAP
+from page_io import atomic_write_bytes, atomic_writer
+
+SITE_URL = 'https://www.zencalcs.com'
+
+SITEMAP_STATE = '.sitemap-state.json'
+
+STATE_FORMAT = 1
+
+# For pages added to the sitemap; existing entries keep their own
+DEFAULT_CHANGEFREQ = 'monthly'
+DEFAULT_PRIORITY = '0.8'
+
+ENTRY_INDENT = '  '
+
+BODY = re.compile(rb'<body\b.*</body\s*>', re.DOTALL | re.IGNORECASE)
+
+COMMENT = re.compile(rb'<!--.*?-->', re.DOTALL)
+
+WHITESPACE = re.compile(rb'\s+')
+
+LOC = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>')
+
+LASTMOD = re.compile(r'<lastmod>[^<]*</lastmod>')
+
+EMPTY_SITEMAP = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+                 '</urlset>\n')
+
+
+def page_url(path):
+    """The URL sitemap.xml lists a page under: extensionless, / for index.html"""
+    served = path.replace(os.sep, '/')
+    if served == 'index.html' or served.endswith('/index.html'):
+        served = served[:-len('index.html')]
+    elif served.endswith('.html'):
+        served = served[:-len('.html')]
+    return f'{SITE_URL}/{served}'
+
+
+def meaningful_hash(data):
+    """Hash of a page's <body>, ignoring comments and whitespace"""
+    body = BODY.search(data)
+    text = COMMENT.sub(b'', body.group(0) if body else data)
+    return content_hash(WHITESPACE.sub(b'', text))
+
+
+def load_state(path=SITEMAP_STATE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('format') == STATE_FORMAT:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {'format': STATE_FORMAT, 'pages': {}}
+
+
+def save_state(state, path=SITEMAP_STATE):
+    atomic_write_bytes(path, (json.dumps(state, indent=1, sort_keys=True) + '\n').encode('utf-8'))
+
+
+def current_lastmods(path=SITEMAP):
+    """{url: lastmod} as listed in an existing sitemap"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    lastmods = {}
+    for entry in re.findall(r'<url>.*?</url>', content, re.DOTALL):
+        loc, lastmod = LOC.search(entry), re.search(r'<lastmod>\s*([^<\s]+)\s*</lastmod>', entry)
+        if loc and lastmod:
+            lastmods.setdefault(loc.group(1), lastmod.group(1))
+    return lastmods
+
+
+def refresh(pages, state, today, listed):
+    """
+    Bring state up to date with the pages, returning the ones whose content
+    changed. A page state hasn't seen keeps its listed lastmod, if any.
+    """
+    changed = []
+    for path in pages:
+        with open(path, 'rb') as f:
+            digest = meaningful_hash(f.read())
+        entry = state['pages'].get(path)
+        if entry is not None and entry['hash'] == digest:
+            continue
+        if entry is None and page_url(path) in listed:
+            lastmod = listed[page_url(path)]
+        else:
+            lastmod = today
+            changed.append(path)
+        state['pages'][path] = {'hash': digest, 'lastmod': lastmod}
+    for path in set(state['pages']) - set(pages):
+        del state['pages'][path]
+    return changed
+
+
+def entry_lines(url, lastmod):
+    """A new <url> entry, in the sitemap's layout"""
+    return [f'{ENTRY_INDENT}<url>\n',
+            f'{ENTRY_INDENT * 2}<loc>{url}</loc>\n',
+            f'{ENTRY_INDENT * 2}<lastmod>{lastmod}</lastmod>\n',
+            f'{ENTRY_INDENT * 2}<changefreq>{DEFAULT_CHANGEFREQ}</changefreq>\n',
+            f'{ENTRY_INDENT * 2}<priority>{DEFAULT_PRIORITY}</priority>\n',
+            f'{ENTRY_INDENT}</url>\n']
+
+
+def updated_entry(lines, lastmod):
+    """A <url> entry's lines with its lastmod set, adding one after <loc> if missing"""
+    text = ''.join(lines)
+    if LASTMOD.search(text):
+        return LASTMOD.sub(f'<lastmod>{lastmod}</lastmod>', text, count=1)
+    loc_line = next(i for i, line in enumerate(lines) if '</loc>' in line)
+    indent = lines[loc_line][:len(lines[loc_line]) - len(lines[loc_line].lstrip())]
+    lines = list(lines)
+    lines.insert(loc_line + 1, f'{indent}<lastmod>{lastmod}</lastmod>\n')
+    return ''.join(lines)
+
+
+def rewrite_entries(source, lastmods, report):
+    """
+    Yield the sitemap's text from its lines, one <url> entry at a time.
+
+    lastmods maps each URL that belongs in the sitemap to its date; entries
+    for anything else, and repeats, are dropped, and URLs not seen by the
+    closing </urlset> are added before it. report collects what was done.
+    """
+    seen = set()
+    entry = None
+    for line in source:
+        if entry is None and '<url>' in line:
+            entry = []
+        if entry is None:
+            if '</urlset>' in line:
+                for url, lastmod in lastmods.items():
+                    if url not in seen:
+                        report['added'].append(url)
+                        yield ''.join(entry_lines(url, lastmod))
+            yield line
+            continue
+
+        entry.append(line)
+        if '</url>' not in line:
+            continue
+        loc = LOC.search(''.join(entry))
+        url = loc.group(1) if loc else None
+        if url not in lastmods:
+            report['removed'].append(url)
+        elif url in seen:
+            report['duplicates'].append(url)
+        else:
+            seen.add(url)
+            text = updated_entry(entry, lastmods[url])
+            if text != ''.join(entry):
+                report['updated'].append(url)
+            yield text
+        entry = None
+
+
+class Unchanged(Exception):
+    """Raised to discard a rewrite that came out identical"""
+
+
+def update_sitemap(lastmods, path=SITEMAP, dry_run=False):
+    """
+    Stream path through rewrite_entries() into its replacement.
+
+    Returns the report. An unchanged sitemap isn't replaced, so it keeps its
+    mtime; a missing one is created.
+    """
+    report = {'updated': [], 'added': [], 'removed': [], 'duplicates': []}
+    try:
+        source = open(path, 'r', encoding='utf-8', newline='')
+    except FileNotFoundError:
+        source = io.StringIO(EMPTY_SITEMAP)
+    with source:
+        if dry_run:
+            for _ in rewrite_entries(source, lastmods, report):
+                pass
+            return report
+        try:
+            with atomic_writer(path, 'w', encoding='utf-8', newline='') as out:
+                out.writelines(rewrite_entries(source, lastmods, report))
+                if not any(report.values()):
+                    raise Unchanged
+        except Unchanged:
+            pass
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--date', default=datetime.date.today().isoformat(),
+                        help='lastmod for changed pages (default: today)')
+    parser.add_argument('--sitemap', default=SITEMAP, help=f'sitemap to update (default: {SITEMAP})')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='report changes without writing anything')
+    args = parser.parse_args()
+    try:
+        datetime.date.fromisoformat(args.date)
+    except ValueError:
+        raise SystemExit(f"Error: --date must be YYYY-MM-DD, not {args.date!r}")
+
+    pages = [path for path in find_publish_files() if path.endswith('.html') and path not in UNLISTED]
+    state = load_state()
+    listed = current_lastmods(args.sitemap) if not state['pages'] else {}
+    changed = refresh(pages, state, args.date, listed)
+    lastmods = {page_url(path): state['pages'][path]['lastmod'] for path in pages}
+    report = update_sitemap(lastmods, args.sitemap, args.dry_run)
+
+    for path in changed:
+        print(f"✓ Changed: {path}")
+    for url in report['added']:
+        print(f"✓ Added: {url}")
+    for url in report['removed']:
+        print(f"- Removed (no such page): {url}")
+    for url in report['duplicates']:
+        print(f"- Removed repeated entry: {url}")
+    verb = 'would update' if args.dry_run else 'updated'
+    print(f"\n{len(pages)} pages, {len(changed)} changed; {verb} {len(report['updated'])} lastmod entries in {args.sitemap}")
+    if not args.dry_run:
+        save_state(state)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,9 @@
 Script to update all calculator pages with new color theme and features
 """
 import re
-import os
+
+from batch_runner import main_for
+from rewrite_engine import compile_rules, regex_rules
 
 # Color mappings - old color to new color
 COLOR_MAPPINGS = {
@@ -58,17 +60,23 @@ SCROLL_CODE = """
 
 """
 
+# Compiled once; each table is rewritten in as few passes as its rules allow
+COLOR_REWRITER = compile_rules(regex_rules(COLOR_MAPPINGS), name='update_theme.colors')
+CHART_COLOR_REWRITER = compile_rules(regex_rules(CHART_COLOR_MAPPINGS), name='update_theme.chart_colors')
+
+SCROLL_PATTERN = re.compile(r"(resultDiv\.style\.display\s*=\s*['\"]block['\"];)\s*\n")
+SCROLL_REPLACEMENT = r"\1\n" + SCROLL_CODE
+
 def update_colors(content):
     """Apply color theme updates"""
-    for old_pattern, new_value in COLOR_MAPPINGS.items():
-        content = re.sub(old_pattern, new_value, content)
-    return content
+    return COLOR_REWRITER.apply(content)
 
 def update_chart_colors(content):
     """Update chart colors to new palette"""
-    for old_pattern, new_value in CHART_COLOR_MAPPINGS.items():
-        content = re.sub(old_pattern, new_value, content)
-    return content
+    return CHART_COLOR_REWRITER.apply(content)
+
+update_colors.triggers = COLOR_REWRITER.triggers
+update_chart_colors.triggers = CHART_COLOR_REWRITER.triggers
 
 def add_smooth_scroll(content):
     """Add smooth scroll animation after results display"""
@@ -78,50 +86,19 @@ def add_smooth_scroll(content):
     if 'scrollIntoView' in content:
         return content  # Already has scroll
 
-    pattern = r"(resultDiv\.style\.display\s*=\s*['\"]block['\"];)\s*\n"
-    replacement = r"\1\n" + SCROLL_CODE
-    content = re.sub(pattern, replacement, content)
+    content = SCROLL_PATTERN.sub(SCROLL_REPLACEMENT, content)
 
     return content
 
-def process_file(filepath):
-    """Process a single HTML file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        original = content
-
-        # Apply updates
-        content = update_colors(content)
-        content = update_chart_colors(content)
-        content = add_smooth_scroll(content)
-
-        # Only write if changes were made
-        if content != original:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
-            return True
-        return False
-    except Exception as e:
-        print(f"Error processing {filepath}: {e}")
-        return False
+# Pages without these never change, so the runner can skip them undecoded
+add_smooth_scroll.triggers = ('resultDiv.style.display',)
 
 def main():
-    # Get all HTML files in current directory
-    html_files = [f for f in os.listdir('.') if f.endswith('.html') and f != 'bmi-calculator.html']
-
-    print(f"Found {len(html_files)} HTML files to update (excluding bmi-calculator.html)")
-
-    updated = 0
-    for filename in sorted(html_files):
-        if process_file(filename):
-            print(f"✓ Updated: {filename}")
-            updated += 1
-        else:
-            print(f"- No changes: {filename}")
-
-    print(f"\nCompleted: {updated}/{len(html_files)} files updated")
+    main_for([update_colors, update_chart_colors, add_smooth_scroll], __doc__,
+             exclude=('bmi-calculator.html',),
+             updated='✓ Updated: {}',
+             unchanged='- No changes: {}',
+             found='Found {} HTML files to update (excluding bmi-calculator.html)')
 
 if __name__ == '__main__':
     main()